@@ -133,7 +133,7 @@ install_python_deps() {
         log_info "Creating requirements.txt..."
         cat > requirements.txt << EOF
 # Google ADK for multi-agent system
-google-adk>=1.0.0
+google-adk>=1.15.0
 
 # Data processing and analysis
 pandas>=1.3.0
@@ -250,8 +250,8 @@ SCREENSHOT_PATH=./automation-state-captures
 DEBUG=false
 LOG_LEVEL=info
 
-# Node.js path (update if different)
-NODE_PATH=/Users/\$USER/.nvm/versions/node/v18.20.8/bin/node
+# Node.js executable for the MCP servers (detected at install time)
+MCP_NODE_PATH=$(command -v node)
 EOF
         log_success ".env file created"
     else
@@ -3,6 +3,29 @@
 import { Server } from '@modelcontextprotocol/sdk/server/index.js';
 import { StdioServerTransport } from '@modelcontextprotocol/sdk/server/stdio.js';
 import { CallToolRequestSchema, ListToolsRequestSchema } from '@modelcontextprotocol/sdk/types.js';
+import fs from 'fs/promises';
+import net from 'net';
+import { pathToFileURL } from 'url';
+
+/**
+ * Stdio transport that coalesces the messages sent within one event-loop tick
+ * (e.g. results of concurrent tool calls and their progress notifications) into
+ * a single write on the output stream instead of one write per message.
+ */
+export class BatchingStdioServerTransport extends StdioServerTransport {
+    constructor(stdin = process.stdin, stdout = process.stdout) {
+        super(stdin, stdout);
+        this.output = stdout;
+    }
+
+    send(message) {
+        if (!this.output.writableCorked) {
+            this.output.cork();
+            process.nextTick(() => this.output.uncork());
+        }
+        return super.send(message);
+    }
+}
 
 /**
  * Base MCP Server class that provides common functionality for all MCP servers
@@ -47,11 +70,12 @@ export class BaseMCPServer {
         // Handle tool calls
         this.server.setRequestHandler(CallToolRequestSchema, async (request) => {
             const { name, arguments: args } = request.params;
+            const progress = this.createProgressReporter(request.params._meta?.progressToken);
 
             try {
-                if (this.toolHandlers.has(name)) {
-                    const handler = this.toolHandlers.get(name);
-                    return await handler(args);
+                const handler = await this.getToolHandler(name);
+                if (handler) {
+                    return await handler(args, { progress });
                 }
                 throw new Error(`Unknown tool: ${name}`);
             } catch (error) {
@@ -64,19 +88,79 @@ export class BaseMCPServer {
                     ],
                     isError: true,
                 };
+            } finally {
+                await progress.flush();
             }
         });
     }
 
+    /**
+     * Create a progress reporter for a tool call.
+     * Partial output passed to report() is coalesced and sent as MCP progress
+     * notifications at most once per flush interval, so chatty tools (test runs,
+     * long commands) stream output without one notification per chunk.
+     * Reporting is a no-op when the client did not request progress.
+     * @param {string|number|undefined} progressToken - Token from the request _meta
+     * @param {number} flushIntervalMs - Coalescing window in milliseconds
+     */
+    createProgressReporter(progressToken, flushIntervalMs = 50) {
+        if (progressToken === undefined || progressToken === null) {
+            return { report() {}, async flush() {} };
+        }
+
+        let buffer = '';
+        let sequence = 0;
+        let timer = null;
+
+        const flush = async () => {
+            if (timer) {
+                clearTimeout(timer);
+                timer = null;
+            }
+            if (!buffer) {
+                return;
+            }
+            const message = buffer;
+            buffer = '';
+            try {
+                await this.server.notification({
+                    method: 'notifications/progress',
+                    params: { progressToken, progress: ++sequence, message },
+                });
+            } catch (error) {
+                this.logError('Failed to send progress notification', error);
+            }
+        };
+
+        return {
+            report(chunk) {
+                buffer += chunk;
+                if (!timer) {
+                    timer = setTimeout(flush, flushIntervalMs);
+                }
+            },
+            flush,
+        };
+    }
+
     /**
      * Register a tool with its handler
      * @param {string} toolName - Name of the tool
-     * @param {Function} handler - Handler function for the tool
+     * @param {Function} handler - Handler function for the tool, called with (args, { progress })
      */
     registerTool(toolName, handler) {
         this.toolHandlers.set(toolName, handler);
     }
 
+    /**
+     * Look up the handler for a tool call
+     * @param {string} toolName - Name of the tool
+     * @returns {Promise<Function|undefined>} Handler, or undefined for an unknown tool
+     */
+    async getToolHandler(toolName) {
+        return this.toolHandlers.get(toolName);
+    }
+
     /**
      * Add a tool definition to the tools array
      * @param {Object} toolDefinition - Tool definition object
@@ -103,7 +187,7 @@ export class BaseMCPServer {
         if (data) {
             response.content.push({
                 type: 'text',
-                text: `\nData: ${JSON.stringify(data, null, 2)}`,
+                text: `\nData: ${JSON.stringify(data)}`,
             });
         }
 
@@ -127,6 +211,18 @@ export class BaseMCPServer {
         };
     }
 
+    /**
+     * Mark a response as a point-in-time snapshot (page source, screenshot analysis)
+     * that goes stale after the next action, so clients need not keep or cache it
+     * @param {Object} response - Tool response
+     */
+    markSnapshot(response) {
+        return {
+            ...response,
+            _meta: { ...response._meta, cache_hint: 'no-cache' },
+        };
+    }
+
     /**
      * Validate required parameters
      * @param {Object} args - Arguments passed to tool
@@ -142,16 +238,74 @@ export class BaseMCPServer {
 
     /**
      * Start the MCP server
+     * Serves over stdio, or over a Unix domain socket when started with `--listen <path>`
      */
     async start() {
-        const transport = new StdioServerTransport();
-        await this.server.connect(transport);
+        const socketPath = getListenPath();
+        if (socketPath) {
+            await this.listen(socketPath);
+        } else {
+            const transport = new BatchingStdioServerTransport();
+            await this.server.connect(transport);
+        }
 
         console.error(`🚀 ${this.serverInfo.name} v${this.serverInfo.version} started`);
         console.error(`📦 ${this.tools.length} tools available`);
         console.error(`🎯 ${this.serverInfo.description}`);
     }
 
+    /**
+     * Serve MCP over a Unix domain socket so the server outlives its clients.
+     * One client is served at a time; a new connection replaces the previous one,
+     * which lets an agent restart and reattach without losing server state
+     * (e.g. an open Appium session). Connects and disconnects are handled one at a
+     * time, and the current transport is always closed before the next client is
+     * connected, whether the client hung up first or was replaced.
+     * @param {string} socketPath - Path of the socket file to listen on
+     */
+    async listen(socketPath) {
+        await fs.rm(socketPath, { force: true });
+
+        let activeSocket = null;
+        let handover = Promise.resolve();
+        const serialize = (task) => {
+            handover = handover.then(task).catch((error) => this.logError('Socket client handover failed', error));
+        };
+        const disconnect = async () => {
+            if (!activeSocket) {
+                return;
+            }
+            const socket = activeSocket;
+            activeSocket = null;
+            await this.server.close();
+            socket.destroy();
+        };
+
+        const socketServer = net.createServer((socket) => {
+            socket.on('close', () => serialize(async () => {
+                if (activeSocket === socket) {
+                    await disconnect();
+                    this.logInfo(`Client disconnected from ${socketPath}`);
+                }
+            }));
+            serialize(async () => {
+                await disconnect();
+                if (socket.destroyed) {
+                    return; // Hung up while waiting for the handover
+                }
+                activeSocket = socket;
+                await this.server.connect(new BatchingStdioServerTransport(socket, socket));
+                this.logInfo(`Client connected on ${socketPath}`);
+            });
+        });
+
+        await new Promise((resolve, reject) => {
+            socketServer.once('error', reject);
+            socketServer.listen(socketPath, resolve);
+        });
+        this.logInfo(`Listening on ${socketPath}`);
+    }
+
     /**
      * Run the MCP server (alias for start)
      */
@@ -202,6 +356,25 @@ export class BaseMCPServer {
     }
 }
 
+/**
+ * Check whether a module is the process entry point (run directly rather than imported)
+ * @param {string} moduleUrl - import.meta.url of the calling module
+ * @returns {boolean} True if the module was started with `node <module>`
+ */
+export function isMainModule(moduleUrl) {
+    return Boolean(process.argv[1]) && pathToFileURL(process.argv[1]).href === moduleUrl;
+}
+
+/**
+ * Get the socket path passed as `--listen <path>`, if any
+ * @param {string[]} argv - Process arguments
+ * @returns {string|null} Socket path or null when serving over stdio
+ */
+export function getListenPath(argv = process.argv) {
+    const index = argv.indexOf('--listen');
+    return index !== -1 && argv[index + 1] ? argv[index + 1] : null;
+}
+
 /**
  * Common tool schemas that can be reused across servers
  */
@@ -10,7 +10,7 @@
 import { promises as fs } from 'fs';
 import path from 'path';
 import { spawn } from 'child_process';
-import { BaseMCPServer } from './base-mcp-server.js';
+import { BaseMCPServer, isMainModule } from './base-mcp-server.js';
 
 class AdvancedToolsServer extends BaseMCPServer {
     constructor() {
@@ -708,6 +708,10 @@ dist/
     }
 }
 
-// Start the server
-const server = new AdvancedToolsServer();
-server.run().catch(console.error);
+// Start the server if this file is run directly
+if (isMainModule(import.meta.url)) {
+    const server = new AdvancedToolsServer();
+    server.run().catch(console.error);
+}
+
+export default AdvancedToolsServer;
@@ -9,15 +9,265 @@
  *        get_page_source
  */
 
+import { createHash } from 'crypto';
 import fs from 'fs/promises';
 import path from 'path';
 import { fileURLToPath } from 'url';
 import { remote } from 'webdriverio';
-import { BaseMCPServer } from './base-mcp-server.js';
+import { inflateSync } from 'zlib';
+import { BaseMCPServer, isMainModule } from './base-mcp-server.js';
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
+// Overlay scan vocabulary, compiled once into a single alternation regex so an element
+// is scanned in one pass instead of one substring search per keyword; dismissal labels
+// are whole values and looked up in a set
+const OVERLAY_KEYWORDS = {
+    native: ['XCUIElementTypeAlert', 'XCUIElementTypeSheet', 'android:id/parentPanel', 'AlertDialog'],
+    modal: ['Modal', 'Dialog', 'Overlay', 'Popup', 'Sheet'],
+    tutorial: ['tutorial', 'onboard', 'intro', 'guide', 'walkthrough'],
+    permission: ['permission', 'allow', 'grant', 'access'],
+    loading: ['loading', 'spinner', 'progress'],
+    blocker: ['blocker', 'mask', 'backdrop', 'curtain'],
+    tooltip: ['tooltip', 'hint', 'tip', 'callout', 'bubble'],
+};
+const DISMISS_KEYWORDS = [
+    'close', '×', '✕', 'dismiss', 'cancel',
+    'skip', 'later', 'not now', 'maybe later',
+    'ok', 'got it', 'continue', 'next', 'allow',
+    'deny', "don't allow", 'block', 'refuse',
+];
+
+const escapeRegExp = (text) => text.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
+const OVERLAY_CATEGORY = new Map(
+    Object.entries(OVERLAY_KEYWORDS).flatMap(([category, keywords]) => keywords.map((keyword) => [keyword.toLowerCase(), category])),
+);
+const OVERLAY_RE = new RegExp(
+    [...OVERLAY_CATEGORY.keys()].sort((a, b) => b.length - a.length).map(escapeRegExp).join('|'),
+    'gi',
+);
+const DISMISS_LABELS = new Set(DISMISS_KEYWORDS.map((keyword) => keyword.toLowerCase()));
+// Symbol labels of close buttons, matched when a target is described as a close button
+const CLOSE_SYMBOLS = new Set(['×', '✕', 'x']);
+const ANDROID_BOUNDS_RE = /^\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]$/;
+
+// Where an overlay without a recognizable control is most likely dismissed, in the order tried:
+// top-right close buttons, then the corners outside a centered dialog (relative coordinates)
+const OVERLAY_DISMISS_POINTS = Object.freeze([
+    [0.9, 0.1], [0.95, 0.05], [0.1, 0.1], [0.9, 0.9], [0.1, 0.9],
+].map((point) => Object.freeze(point)));
+
+// Error scan vocabulary: whole-word phrases in an element's visible text, and class or
+// resource-id markers of error widgets, each compiled once like the overlay keywords
+const ERROR_KEYWORDS = {
+    page_load: ['error', 'failed', 'exception', 'not found', '404', '500', 'timeout', 'timed out'],
+    access: ['access denied', 'unauthorized', 'permission denied', 'invalid credentials', 'login failed', 'account locked', 'session expired'],
+    network: ['no internet', 'connection failed', 'network error', 'server not responding'],
+    service: ['maintenance', 'service unavailable', 'system error'],
+    crash: ['has stopped', 'keeps stopping', "isn't responding", 'not responding'],
+    security: ['captcha', 'security warning', 'verify you are human'],
+};
+// Each error category is one bit of the page's severity mask; errors in the critical
+// categories stop the automation (verdict FAIL), other matches need a look (WARNING)
+const ERROR_CATEGORY_BITS = Object.freeze(Object.fromEntries(
+    [...Object.keys(ERROR_KEYWORDS), 'error_widget'].map((category, index) => [category, 1 << index]),
+));
+const CRITICAL_ERROR_MASK = ['access', 'network', 'service', 'crash', 'security']
+    .reduce((mask, category) => mask | ERROR_CATEGORY_BITS[category], 0);
+const ERROR_MARKERS = ['alert-danger', 'error-message', 'error_message', 'errorMessage', 'notification-error'];
+const ERROR_CATEGORY = new Map(
+    Object.entries(ERROR_KEYWORDS).flatMap(([category, keywords]) => keywords.map((keyword) => [keyword, category])),
+);
+const ERROR_RE = new RegExp(
+    `\\b(?:${[...ERROR_CATEGORY.keys()].sort((a, b) => b.length - a.length).map(escapeRegExp).join('|')})\\b`,
+    'i',
+);
+const ERROR_MARKER_RE = new RegExp(ERROR_MARKERS.map(escapeRegExp).join('|'), 'i');
+const TEXT_ATTRIBUTES = new Set(['text', 'content-desc', 'name', 'label', 'value']);
+// Screen context from three bits set while scanning element types:
+// bit 0 a WebView container, bit 1 a native widget, bit 2 an HTML element
+const CONTEXT_WEBVIEW_TYPE_RE = /^(?:android\.webkit\.WebView|XCUIElementType(?:Web|WK|UIWeb)View|WKWebView|UIWebView)$/;
+const CONTEXT_NATIVE_TYPE_RE = /^(?:android\.widget\.|XCUIElementType)/;
+const CONTEXT_HTML_TYPE_RE = /^(?:html|body|input)$/i;
+const CONTEXT_BY_BITS = Object.freeze(['NATIVE', 'WEBVIEW', 'NATIVE', 'HYBRID', 'WEBVIEW', 'WEBVIEW', 'HYBRID', 'HYBRID']);
+
+const ELEMENT_TAG_RE = /<([A-Za-z][\w.:-]*)([^>]*)>/g;
+const SCANNED_ATTRIBUTE_RE = /\s(class|resource-id|content-desc|text|name|label|value)="([^"]*)"/g;
+const MAX_SCAN_RESULTS = 20;
+const WHITESPACE_BETWEEN_TAGS_RE = />\s+</g;
+
+// Compact page source: one line per element instead of the full XML attribute dump
+const XML_TAG_RE = /<(\/?)([A-Za-z][\w.:-]*)([^>]*?)(\/?)>/g;
+const INTERACTIVE_TYPE_RE = /Button|TextField|EditText|SearchField|Switch|CheckBox|RadioButton|Toggle|Slider|Picker|Cell|Link|Tab|MenuItem|Spinner/;
+const ELEMENT_TYPE_PREFIX_RE = /^(?:XCUIElementType|(?:android|androidx|com)\.(?:[a-z0-9_]+\.)*)/;
+const WEBVIEW_TYPE_RE = /^(?:android\.webkit\.WebView|XCUIElementTypeWebView)$/;
+const COMPRESSED_CHUNK_LINES = 50;
+// Action tools can return the settled screen with their result instead of a separate read
+const OBSERVE_SETTLE_MS = 300;
+const OBSERVE_PROPERTY = {
+    type: 'boolean',
+    description: 'After a successful action, wait briefly for the screen to settle and return its compact page source, hash and error/overlay scan in the same response, instead of a separate get_page_source call',
+    default: false,
+};
+// Screens whose derived views (scans, compact lines, tables) are kept, keyed by page source hash
+const PAGE_ANALYSIS_CACHE_SIZE = 8;
+// Sessions kept open after appium_disconnect for reuse by a matching appium_connect
+const MAX_PARKED_SESSIONS = 4;
+// Simple XPath locators are compiled to native UiSelector / NSPredicate locators, which the
+// driver resolves without the full hierarchy dump that XPath needs
+const XPATH_STRATEGIES = new Set(['xpath', 'text', 'contentDescription']);
+const XPATH_CACHE_SIZE = 512;
+const SIMPLE_XPATH_RE = /^\/\/(\*|[A-Za-z][\w.]*)(?:\[(.+)\])?$/;
+// One @attribute="value" condition and the operator after it; sticky, so conditions are read in sequence
+const XPATH_CONDITION_RE = /\s*@([\w-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')\s*(?:(and|or)\s|$)/y;
+const UI_SELECTOR_METHODS = Object.freeze({
+    text: 'text', 'content-desc': 'description', 'resource-id': 'resourceId', class: 'className',
+});
+const PREDICATE_ATTRIBUTES = new Set(['name', 'label', 'value', 'type']);
+// scroll_into_view sizes its scroll from the page source: page source attribute per strategy,
+// the search swipe range for targets not yet in the hierarchy, and the scrollGesture speed (px/s)
+const SCROLL_TARGET_ATTRIBUTES = Object.freeze({
+    id: 'resource-id', text: 'text', contentDescription: 'content-desc', accessibilityId: 'content-desc', className: 'class',
+});
+const MIN_SEARCH_SWIPES = 3;
+const MAX_SEARCH_SWIPES = 20;
+const DEFAULT_SEARCH_SWIPES = 10;
+const SCROLL_GESTURE_SPEED = 5000;
+const XML_ENTITIES = Object.freeze({ amp: '&', lt: '<', gt: '>', quot: '"', apos: "'" });
+const XML_ENTITY_RE = /&(amp|lt|gt|quot|apos);/g;
+
+/**
+ * Fingerprint a page source: 64 bits of its MD5 (hashed natively), as 16 hex digits.
+ * Equal hashes mean an unchanged screen, so callers compare hashes instead of XML.
+ * @param {string} pageSource - Page source XML from Appium
+ * @returns {string} Hash
+ */
+function hashPageSource(pageSource) {
+    return createHash('md5').update(pageSource).digest('hex').slice(0, 16);
+}
+
+// act_and_diff compares screenshots by difference hash: 9x8 grayscale cells give 64 bits
+const DHASH_COLS = 9;
+const DHASH_ROWS = 8;
+const DHASH_CHANGE_THRESHOLD = 8;
+// PNG color type -> channels (grayscale, RGB, grayscale + alpha, RGBA)
+const PNG_CHANNELS = Object.freeze({ 0: 1, 2: 3, 4: 2, 6: 4 });
+
+/**
+ * Difference hash (dHash) of a PNG screenshot. The rows are unfiltered one at a time
+ * and box-averaged straight into a 9x8 grayscale grid, so no full-size image is kept;
+ * bit i records whether a cell is brighter than its right neighbour.
+ * Supports non-interlaced 8/16-bit grayscale and RGB(A) PNGs, as Appium returns.
+ * @param {Buffer} png - PNG file content
+ * @returns {Uint8Array} 64 bits, one per byte
+ */
+function differenceHash(png) {
+    let header = null;
+    const chunks = [];
+    for (let offset = 8; offset + 8 <= png.length;) {
+        const length = png.readUInt32BE(offset);
+        const type = png.toString('latin1', offset + 4, offset + 8);
+        const body = png.subarray(offset + 8, offset + 8 + length);
+        if (type === 'IHDR') {
+            header = {
+                width: body.readUInt32BE(0),
+                height: body.readUInt32BE(4),
+                depth: body[8],
+                channels: PNG_CHANNELS[body[9]],
+                interlaced: body[12] !== 0,
+            };
+        } else if (type === 'IDAT') {
+            chunks.push(body);
+        } else if (type === 'IEND') {
+            break;
+        }
+        offset += length + 12;
+    }
+    if (!header?.channels || (header.depth !== 8 && header.depth !== 16) || header.interlaced) {
+        throw new Error('Unsupported PNG format');
+    }
+
+    const { width, height, channels } = header;
+    const sampleBytes = header.depth / 8;
+    const pixelBytes = channels * sampleBytes;
+    const stride = width * pixelBytes;
+    const raw = inflateSync(Buffer.concat(chunks));
+    const cellSums = new Float64Array(DHASH_COLS * DHASH_ROWS);
+    const cellCounts = new Uint32Array(DHASH_COLS * DHASH_ROWS);
+    const columnCell = Uint8Array.from({ length: width }, (_, x) => Math.floor((x * DHASH_COLS) / width));
+    let previous = new Uint8Array(stride);
+    let row = new Uint8Array(stride);
+
+    for (let y = 0; y < height; y++) {
+        const start = y * (stride + 1);
+        const filter = raw[start];
+        for (let i = 0; i < stride; i++) {
+            const left = i >= pixelBytes ? row[i - pixelBytes] : 0;
+            const up = previous[i];
+            const upLeft = i >= pixelBytes ? previous[i - pixelBytes] : 0;
+            let predictor = 0;
+            if (filter === 1) {
+                predictor = left;
+            } else if (filter === 2) {
+                predictor = up;
+            } else if (filter === 3) {
+                predictor = (left + up) >> 1;
+            } else if (filter === 4) {
+                const estimate = left + up - upLeft;
+                const toLeft = Math.abs(estimate - left);
+                const toUp = Math.abs(estimate - up);
+                const toUpLeft = Math.abs(estimate - upLeft);
+                predictor = toLeft <= toUp && toLeft <= toUpLeft ? left : toUp <= toUpLeft ? up : upLeft;
+            }
+            row[i] = (raw[start + 1 + i] + predictor) & 0xff;
+        }
+
+        const cellRow = Math.floor((y * DHASH_ROWS) / height) * DHASH_COLS;
+        for (let x = 0, p = 0; x < width; x++, p += pixelBytes) {
+            const gray = channels < 3
+                ? row[p]
+                : 0.299 * row[p] + 0.587 * row[p + sampleBytes] + 0.114 * row[p + 2 * sampleBytes];
+            cellSums[cellRow + columnCell[x]] += gray;
+            cellCounts[cellRow + columnCell[x]]++;
+        }
+        [previous, row] = [row, previous];
+    }
+
+    const bits = new Uint8Array((DHASH_COLS - 1) * DHASH_ROWS);
+    for (let r = 0; r < DHASH_ROWS; r++) {
+        for (let c = 0; c < DHASH_COLS - 1; c++) {
+            const cell = r * DHASH_COLS + c;
+            bits[r * (DHASH_COLS - 1) + c] = cellSums[cell] / cellCounts[cell] > cellSums[cell + 1] / cellCounts[cell + 1] ? 1 : 0;
+        }
+    }
+    return bits;
+}
+
+/**
+ * Count the element (start or empty) tags in a page source by scanning for '<' with
+ * indexOf, instead of matching every tag into an array: long lists and chat histories
+ * give page sources of several MB, where the array of tag strings would be a second copy.
+ * @param {string} pageSource - Page source XML from Appium
+ * @returns {number} Element count
+ */
+function countElements(pageSource) {
+    let count = 0;
+    for (let index = pageSource.indexOf('<'); index !== -1; index = pageSource.indexOf('<', index + 1)) {
+        const next = pageSource.charCodeAt(index + 1);
+        // Skip end tags, the XML declaration, comments and CDATA: '/', '?', '!'
+        if (next !== 47 && next !== 63 && next !== 33) {
+            count++;
+        }
+    }
+    return count;
+}
+
+// Boolean attributes Appium writes on every element (UiAutomator2 and XCUITest); "false" is
+// their default, so dropping them loses nothing. String attributes (text, content-desc,
+// label, value, ...) are kept even when they read "false".
+const FALSE_ATTRIBUTE_RE = /\s(?:checkable|checked|clickable|enabled|focusable|focused|scrollable|long-clickable|password|selected|displayed|visible|accessible)="false"/g;
+
 class AppiumMCPServer extends BaseMCPServer {
     constructor() {
         super({
@@ -30,6 +280,8 @@ class AppiumMCPServer extends BaseMCPServer {
         this.isConnected = false;
         this.currentPlatform = null;
         this.connectionConfig = null;
+        this.sessionKey = null;
+        this.parkedSessions = new Map(); // session key -> driver parked by appium_disconnect
         this.sessionTimeout = 300000; // 5 minutes default session timeout
         this.lastActivity = Date.now();
         
@@ -41,7 +293,33 @@ class AppiumMCPServer extends BaseMCPServer {
             outputDir: './automation-state-captures',
             lastCaptures: [] // Store recent captures for context
         };
-        
+
+        // Snapshot cache: reuse the last capture while the screen is unchanged.
+        // The revision counter is bumped by every command that can mutate the UI,
+        // so a cache hit means no tap/type/swipe/navigation happened since the capture.
+        this.stateSnapshotCache = {
+            enabled: true,
+            maxAgeMs: 3000, // Bound staleness for UI changes we did not cause (animations, async loads)
+            revision: 0,
+            entry: null // { key, capturedAt, capture, pageSource, screenshotBase64 }
+        };
+
+        // Page source cache for repeated reads of an unchanged screen, keyed like the
+        // snapshot cache (foreground screen + UI revision)
+        this.pageSourceCache = {
+            maxAgeMs: 2000,
+            entry: null // { key, fetchedAt, pageSource }
+        };
+
+        // Views derived from a page source (scan results, compact lines, tables) per page source
+        // hash, so re-reading an unchanged screen skips the re-parse even after the TTL above
+        this.pageAnalysis = new Map();
+        this.compiledXPaths = new Map(); // `${platform}|${xpath}` -> native locator or the XPath itself
+
+        // Ranked locators of the rows of the last get_page_source_compressed table,
+        // so smart_find_and_click can target a row by index
+        this.locatorTable = [];
+
         // Screenshot analysis and coordinate-based fallback configuration
         this.coordinateFallback = {
             enabled: true,
@@ -58,7 +336,7 @@ class AppiumMCPServer extends BaseMCPServer {
         // Register tool schemas
         this.addTool({
             name: 'appium_connect',
-            description: 'Connect to iOS or Android device via Appium server (local or remote)',
+            description: 'Connect to iOS or Android device via Appium server (local or remote). Use exactly the hostname and port the user gave ("192.168.1.50:4723", "localhost:4444"); port 4723 only when none was given. iOS needs deviceName, platformVersion, udid and bundleId (derivedDataPath for a custom WebDriverAgent build). On failure, retry once with localhost and 127.0.0.1 swapped, then report the error (server not running, WebDriverAgent not built, device not trusted, network).',
             inputSchema: {
                 type: 'object',
                 properties: {
@@ -137,22 +415,33 @@ class AppiumMCPServer extends BaseMCPServer {
                         type: 'boolean',
                         description: 'Use singleton test manager (iOS only, optional)',
                     },
+                    skipServerInstallation: {
+                        type: 'boolean',
+                        description: 'Skip installing the UiAutomator2 server APKs when they are already on the device; saves several seconds per session (Android only, optional)',
+                    },
                 },
             },
         });
 
         this.addTool({
             name: 'appium_disconnect',
-            description: 'Disconnect from the current Appium session',
+            description: 'Disconnect from the current Appium session. The session stays open on the Appium server and is reused by the next appium_connect with the same settings, unless quit is true.',
             inputSchema: {
                 type: 'object',
-                properties: {},
+                properties: {
+                    quit: {
+                        type: 'boolean',
+                        description: 'End the session on the Appium server instead of keeping it for reuse',
+                        default: false,
+                    },
+                },
             },
         });
 
         this.addTool({
             name: 'appium_status',
             description: 'Get current Appium connection status and device info',
+            annotations: { readOnlyHint: true },
             inputSchema: {
                 type: 'object',
                 properties: {},
@@ -207,6 +496,7 @@ class AppiumMCPServer extends BaseMCPServer {
         this.addTool({
             name: 'find_element',
             description: 'Find a single element on the current screen',
+            annotations: { readOnlyHint: true },
             inputSchema: {
                 type: 'object',
                 properties: {
@@ -232,6 +522,7 @@ class AppiumMCPServer extends BaseMCPServer {
         this.addTool({
             name: 'find_elements',
             description: 'Find multiple elements on the current screen',
+            annotations: { readOnlyHint: true },
             inputSchema: {
                 type: 'object',
                 properties: {
@@ -260,6 +551,7 @@ class AppiumMCPServer extends BaseMCPServer {
             inputSchema: {
                 type: 'object',
                 properties: {
+                    observe: OBSERVE_PROPERTY,
                     strategy: {
                         type: 'string',
                         enum: ['id', 'xpath', 'className', 'text', 'contentDescription', 'accessibilityId', 'iosClassChain', 'iosNsPredicate'],
@@ -285,6 +577,7 @@ class AppiumMCPServer extends BaseMCPServer {
             inputSchema: {
                 type: 'object',
                 properties: {
+                    observe: OBSERVE_PROPERTY,
                     strategy: {
                         type: 'string',
                         enum: ['id', 'xpath', 'className', 'text', 'contentDescription', 'accessibilityId', 'iosClassChain', 'iosNsPredicate'],
@@ -310,10 +603,11 @@ class AppiumMCPServer extends BaseMCPServer {
 
         this.addTool({
             name: 'swipe',
-            description: 'Perform a swipe gesture on the screen',
+            description: 'Perform a manual swipe gesture on the screen (prefer scroll_to_element when looking for an element)',
             inputSchema: {
                 type: 'object',
                 properties: {
+                    observe: OBSERVE_PROPERTY,
                     startX: {
                         type: 'number',
                         description: 'Starting X coordinate',
@@ -343,6 +637,7 @@ class AppiumMCPServer extends BaseMCPServer {
         this.addTool({
             name: 'get_screenshot',
             description: 'Take a screenshot of the current screen',
+            annotations: { readOnlyHint: true },
             inputSchema: {
                 type: 'object',
                 properties: {
@@ -356,14 +651,179 @@ class AppiumMCPServer extends BaseMCPServer {
 
         this.addTool({
             name: 'get_page_source',
-            description: 'Get the XML page source of the current screen',
+            description: 'Get the XML page source of the current screen for popup/error detection and element analysis. Call only when a state change is expected (max 3 per task step).',
+            annotations: { readOnlyHint: true },
             inputSchema: {
                 type: 'object',
-                properties: {},
+                properties: {
+                    refresh: {
+                        type: 'boolean',
+                        description: 'Bypass the cache of the unchanged screen (max 2s old) and fetch from the device',
+                        default: false,
+                    },
+                    attributes: {
+                        type: 'string',
+                        enum: ['trimmed', 'all'],
+                        description: 'trimmed: indentation removed and boolean attributes equal to "false" omitted (absent means false); all: the XML exactly as the device returned it',
+                        default: 'trimmed',
+                    },
+                },
             },
         });
 
         // iOS-specific tools
+        this.addTool({
+            name: 'appium_batch',
+            description: 'Run several Appium tool calls in order in one request (e.g. type_text, type_text, smart_find_and_click for a login form). Stops at the first failing step unless stopOnError is false, and returns every step result plus an optional compact page source snapshot. Use for a planned subtask instead of separate calls; use stopOnError false for best-effort sweeps such as trying several overlay dismiss buttons.',
+            inputSchema: {
+                type: 'object',
+                properties: {
+                    steps: {
+                        type: 'array',
+                        description: 'Steps to run in order',
+                        items: {
+                            type: 'object',
+                            properties: {
+                                tool: { type: 'string', description: 'Name of an Appium tool, e.g. smart_find_and_click' },
+                                args: { type: 'object', description: 'Arguments for the tool' },
+                            },
+                            required: ['tool'],
+                        },
+                    },
+                    stopOnError: {
+                        type: 'boolean',
+                        description: 'Stop at the first failing step; false runs every step and reports each failure',
+                        default: true,
+                    },
+                    stepTimeoutMs: {
+                        type: 'number',
+                        description: 'Fail a step that takes longer than this many milliseconds (0: no limit)',
+                        default: 0,
+                    },
+                    snapshot: {
+                        type: 'object',
+                        description: 'Compact page source to include after the steps',
+                        properties: {
+                            when: {
+                                type: 'string',
+                                enum: ['final', 'each', 'none'],
+                                description: 'final: after the last step run; each: after every step; none: no snapshot',
+                                default: 'final',
+                            },
+                            filter: {
+                                type: 'string',
+                                enum: ['interactive', 'overlays', 'all'],
+                                description: 'Filter passed to get_page_source_compressed',
+                                default: 'interactive',
+                            },
+                        },
+                    },
+                },
+                required: ['steps'],
+            },
+        });
+
+        this.addTool({
+            name: 'get_page_source_compressed',
+            description: 'Get the current screen as a compact element list (one line per visible element: type, label, id, bounds, state) instead of raw XML; typically 5-10x smaller than get_page_source. Prefer this for state analysis and element lookup.',
+            annotations: { readOnlyHint: true },
+            inputSchema: {
+                type: 'object',
+                properties: {
+                    filter: {
+                        type: 'string',
+                        enum: ['interactive', 'overlays', 'all'],
+                        description: 'interactive: actionable and text-bearing elements; overlays: overlay indicators and dismissal controls; all: every visible element',
+                        default: 'interactive',
+                    },
+                    format: {
+                        type: 'string',
+                        enum: ['lines', 'table'],
+                        description: 'lines: indented element lines; table: columns ids, texts, bounds, roles, ctx (webview or native) where index i of each column is element i',
+                        default: 'lines',
+                    },
+                    refresh: {
+                        type: 'boolean',
+                        description: 'Bypass the cache of the unchanged screen (max 2s old) and fetch from the device',
+                        default: false,
+                    },
+                },
+            },
+        });
+
+        this.addTool({
+            name: 'scan_overlays',
+            description: 'Scan the current screen for overlays (alerts, modals, tutorials, permission prompts, loading screens, blockers, tooltips) and for dismissal controls (close, skip, ok, allow, deny...). Returns matched elements with ids, text and bounds; use instead of reading get_page_source for overlay checks.',
+            annotations: { readOnlyHint: true },
+            inputSchema: {
+                type: 'object',
+                properties: {
+                    refresh: {
+                        type: 'boolean',
+                        description: 'Bypass the cache of the unchanged screen (max 2s old) and fetch from the device',
+                        default: false,
+                    },
+                },
+            },
+        });
+
+        this.addTool({
+            name: 'scan_screen',
+            description: 'Check the current screen after an action in one call: scans the page source on the server for error indicators (error, failed, timeout, access denied, network error, maintenance... in element text, and error widget classes) and overlays, and classifies the screen context as NATIVE, WEBVIEW or HYBRID. Returns only the matched elements, so use it instead of reading get_page_source for error checks. Call after every action not sent with observe: true, and after every navigation. Act on the verdict without re-classifying it: FAIL (access, network, service, crash or security error) - stop the automation and report a critical error; WARNING (generic error text or an error widget, e.g. form validation) - report it and ask before continuing; PASS - continue. Context: NATIVE - accessibilityId > resource-id > xpath; WEBVIEW - id > className > tag > xpath, using web form methods; HYBRID - choose per element (native header, web content).',
+            annotations: { readOnlyHint: true },
+            inputSchema: {
+                type: 'object',
+                properties: {
+                    refresh: {
+                        type: 'boolean',
+                        description: 'Bypass the cache of the unchanged screen (max 2s old) and fetch from the device',
+                        default: false,
+                    },
+                },
+            },
+        });
+
+        this.addTool({
+            name: 'ensure_page_ready',
+            description: 'Clear overlays and confirm the screen is ready in one call: scans for overlays, taps their dismissal controls and rescans until none remain (or attempts run out), then checks that the expected elements are present. Returns what was dismissed, what remains, and a compact snapshot of the final screen. Call FIRST after connecting and after every navigation, before interacting, with expect set to the elements the next action needs; use it instead of separate scan_overlays / smart_find_and_click / get_page_source calls. When overlays remain: several dismissal candidates go in one appium_batch with stopOnError false, an overlay without a dismissal control goes to dismiss_overlay_burst; after 5 dismissal attempts continue with a warning.',
+            inputSchema: {
+                type: 'object',
+                properties: {
+                    expect: {
+                        type: 'array',
+                        items: { type: 'string' },
+                        description: 'Texts, accessibility IDs or resource IDs that must be on screen for the page to count as ready',
+                    },
+                    maxAttempts: {
+                        type: 'number',
+                        description: 'Maximum number of dismissal taps',
+                        default: 5,
+                    },
+                    filter: {
+                        type: 'string',
+                        enum: ['interactive', 'overlays', 'all', 'none'],
+                        description: 'Elements in the final snapshot, or none to skip it',
+                        default: 'interactive',
+                    },
+                },
+            },
+        });
+
+        this.addTool({
+            name: 'dismiss_overlay_burst',
+            description: 'Coordinate fallback for an overlay with no dismissal control: taps the likely dismissal points in turn (top-right close positions, then the screen corners) and on Android finally presses back, checking after each tap whether the screen changed and the overlay is gone. Stops at the first tap that clears it. Use instead of planning tap_coordinates calls one by one, when ensure_page_ready or scan_overlays reports an overlay but finds no dismissal control. Only if the overlay remains afterwards, locate it with analyze_screenshot and use tap_coordinates or swipe down yourself.',
+            inputSchema: {
+                type: 'object',
+                properties: {
+                    pressBack: {
+                        type: 'boolean',
+                        description: 'On Android, press back when no tap cleared the overlay',
+                        default: true,
+                    },
+                },
+            },
+        });
+
         this.addTool({
             name: 'handle_alert',
             description: 'Handle iOS alerts by accepting or dismissing (iOS only)',
@@ -407,6 +867,7 @@ class AppiumMCPServer extends BaseMCPServer {
         this.addTool({
             name: 'check_connection',
             description: 'Check if device connection is active and healthy (non-blocking)',
+            annotations: { readOnlyHint: true },
             inputSchema: {
                 type: 'object',
                 properties: {
@@ -489,7 +950,7 @@ class AppiumMCPServer extends BaseMCPServer {
 
         this.addTool({
             name: 'scroll_to_element',
-            description: 'Intelligently scroll to find and display an element on screen with smart detection and container optimization',
+            description: 'Scroll until an element is visible - use when an element is not found or not clickable, instead of manual swipes. Stops when no new content appears.',
             inputSchema: {
                 type: 'object',
                 properties: {
@@ -505,7 +966,7 @@ class AppiumMCPServer extends BaseMCPServer {
                     direction: {
                         type: 'string',
                         enum: ['up', 'down', 'left', 'right'],
-                        description: 'Scroll direction (default: down)',
+                        description: 'Scroll direction (default: down). Down for submit/login/continue/next buttons, form fields, lists and settings; up for back/cancel/close buttons; menus and navigation: try up, then down. When unsure: down, then up, then horizontal.',
                         default: 'down',
                     },
                     maxScrolls: {
@@ -538,6 +999,36 @@ class AppiumMCPServer extends BaseMCPServer {
             },
         });
 
+        this.addTool({
+            name: 'scroll_into_view',
+            description: 'Scroll an element into view in ONE device-side call: UiScrollable.scrollIntoView on Android, mobile: scroll toVisible on iOS. Prefer over scroll_to_element; falls back to it (swipe loop) when the element or container cannot be resolved natively.',
+            inputSchema: {
+                type: 'object',
+                properties: {
+                    strategy: {
+                        type: 'string',
+                        enum: ['id', 'text', 'contentDescription', 'accessibilityId', 'className'],
+                        description: 'Element location strategy',
+                    },
+                    selector: {
+                        type: 'string',
+                        description: 'Element selector',
+                    },
+                    maxSearchSwipes: {
+                        type: 'number',
+                        description: `Maximum swipes the device may perform while searching (Android; default: estimated from the list length, ${MIN_SEARCH_SWIPES}-${MAX_SEARCH_SWIPES})`,
+                    },
+                    direction: {
+                        type: 'string',
+                        enum: ['up', 'down', 'left', 'right'],
+                        description: 'Direction for the scroll_to_element fallback (default: down)',
+                        default: 'down',
+                    },
+                },
+                required: ['strategy', 'selector'],
+            },
+        });
+
         this.addTool({
             name: 'verify_action_result',
             description: 'Advanced verification tool that intelligently checks the result of previous actions using multiple strategies. Can verify element visibility, text presence, enabled/disabled states with smart fallback mechanisms including scrolling and alternative selectors. Supports both new structured format and legacy parameters.',
@@ -649,10 +1140,16 @@ class AppiumMCPServer extends BaseMCPServer {
 
         this.addTool({
             name: 'capture_state',
-            description: 'Manually capture current device state (screenshot and page source) and get state capture context',
+            description: 'Manually capture current device state (screenshot and page source) in one call and get state capture context. Both are saved to disk; include selects what is returned inline. Use once per planned step as report evidence; add "screenshot" to include only when the image itself is needed.',
             inputSchema: {
                 type: 'object',
                 properties: {
+                    include: {
+                        type: 'array',
+                        items: { type: 'string', enum: ['compressed', 'source', 'screenshot'] },
+                        description: 'Content returned inline: compact element list, page source XML (trimmed as by get_page_source), and/or the screenshot as an image',
+                        default: ['compressed'],
+                    },
                     actionName: {
                         type: 'string',
                         description: 'Name to identify this capture (default: manual_capture)',
@@ -663,16 +1160,26 @@ class AppiumMCPServer extends BaseMCPServer {
                         description: 'Whether to include state capture configuration and recent captures in response',
                         default: true,
                     },
+                    forceRefresh: {
+                        type: 'boolean',
+                        description: 'Bypass the snapshot cache and take a fresh screenshot and page source even if the screen is unchanged',
+                        default: false,
+                    },
                 },
             },
         });
 
         this.addTool({
             name: 'smart_find_and_click',
-            description: 'Advanced element interaction tool that intelligently finds and clicks elements using a multi-layered fallback system. Combines traditional element selectors with smart scrolling, AI-powered screenshot analysis, and coordinate-based clicking. Automatically handles overlays, popups, and dynamic content. Ideal for complex mobile automation scenarios where simple element finding may fail due to UI changes, loading states, or accessibility issues.',
+            description: 'PRIMARY interaction tool - use this FIRST instead of click_element. Finds and clicks an element with a built-in fallback chain, in order: primary selector (accessibilityId, then id, xpath, text, contentDescription), alternative selectors from the same page source, smart scrolling (up to 3 scrolls, retrying the selector after each), screenshot analysis correlated with page source, heuristic positioning from common UI patterns, then coordinate hints. Automatically handles overlays, popups, and dynamic content.',
             inputSchema: {
                 type: 'object',
                 properties: {
+                    observe: OBSERVE_PROPERTY,
+                    element: {
+                        type: 'number',
+                        description: 'Row index in the last get_page_source_compressed table (format "table"); replaces strategy and selector, and the row\'s other locators (resource-id, content description, text, XPath) are tried before scrolling',
+                    },
                     strategy: {
                         type: 'string',
                         enum: ['id', 'xpath', 'className', 'text', 'contentDescription', 'accessibilityId', 'iosClassChain', 'iosNsPredicate'],
@@ -742,13 +1249,12 @@ class AppiumMCPServer extends BaseMCPServer {
                         default: 8,
                     },
                 },
-                required: ['strategy', 'selector'],
             },
         });
 
         this.addTool({
             name: 'analyze_screenshot',
-            description: 'Analyze screenshot to find elements and suggest coordinates',
+            description: 'Analyze screenshot to find elements and suggest coordinates when selectors and scrolling fail. Elements with a matching label (textToFind, or Close/Skip/OK/× named in targetDescription) are located from the page source bounds without taking a screenshot.',
             inputSchema: {
                 type: 'object',
                 properties: {
@@ -780,12 +1286,42 @@ class AppiumMCPServer extends BaseMCPServer {
             }
         });
 
+        this.addTool({
+            name: 'act_and_diff',
+            description: 'Run one action tool (e.g. smart_find_and_click, tap_coordinates, swipe) and report whether the screen visibly changed: screenshots before and after the action are compared on the server by perceptual hash, and the after screenshot is returned only when it changed. Use instead of capturing screenshots around an action and calling analyze_screenshot, to assert a step whose effect is visual (a tap that should open a screen or dialog). An unchanged screen means the step failed: check scan_screen, then continue with the smart_find_and_click fallbacks.',
+            inputSchema: {
+                type: 'object',
+                properties: {
+                    tool: {
+                        type: 'string',
+                        description: 'Name of the Appium action tool to run, e.g. smart_find_and_click'
+                    },
+                    args: {
+                        type: 'object',
+                        description: 'Arguments for the tool'
+                    },
+                    threshold: {
+                        type: 'number',
+                        description: `Hash distance (0-64) from which the screen counts as changed (default: ${DHASH_CHANGE_THRESHOLD})`,
+                        default: DHASH_CHANGE_THRESHOLD
+                    },
+                    includeImage: {
+                        type: 'boolean',
+                        description: 'Return the after screenshot when the screen changed',
+                        default: true
+                    }
+                },
+                required: ['tool']
+            }
+        });
+
         this.addTool({
             name: 'tap_coordinates',
-            description: 'Tap at specific coordinates with various coordinate systems',
+            description: 'Tap at specific coordinates (absolute, relative 0.0-1.0, or element-relative) - last-resort fallback after smart_find_and_click and scroll_to_element',
             inputSchema: {
                 type: 'object',
                 properties: {
+                    observe: OBSERVE_PROPERTY,
                     x: {
                         type: 'number',
                         description: 'X coordinate'
@@ -832,6 +1368,12 @@ class AppiumMCPServer extends BaseMCPServer {
         this.registerTool('swipe', this.handleSwipe.bind(this));
         this.registerTool('get_screenshot', this.handleGetScreenshot.bind(this));
         this.registerTool('get_page_source', this.handleGetPageSource.bind(this));
+        this.registerTool('appium_batch', this.handleBatch.bind(this));
+        this.registerTool('get_page_source_compressed', this.handleGetPageSourceCompressed.bind(this));
+        this.registerTool('scan_overlays', this.handleScanOverlays.bind(this));
+        this.registerTool('scan_screen', this.handleScanScreen.bind(this));
+        this.registerTool('ensure_page_ready', this.handleEnsurePageReady.bind(this));
+        this.registerTool('dismiss_overlay_burst', this.handleDismissOverlayBurst.bind(this));
         this.registerTool('handle_alert', this.handleAlert.bind(this));
         this.registerTool('press_home', this.handlePressHome.bind(this));
         this.registerTool('activate_app', this.handleActivateApp.bind(this));
@@ -839,11 +1381,13 @@ class AppiumMCPServer extends BaseMCPServer {
         this.registerTool('wait_for_element', this.handleWaitForElement.bind(this));
         this.registerTool('wait_for_text', this.handleWaitForText.bind(this));
         this.registerTool('scroll_to_element', this.handleScrollToElement.bind(this));
+        this.registerTool('scroll_into_view', this.handleScrollIntoView.bind(this));
         this.registerTool('verify_action_result', this.handleVerifyActionResult.bind(this));
         this.registerTool('smart_wait', this.handleSmartWait.bind(this));
         this.registerTool('capture_state', this.handleCaptureState.bind(this));
         this.registerTool('smart_find_and_click', this.handleSmartFindAndClick.bind(this));
         this.registerTool('analyze_screenshot', this.handleAnalyzeScreenshot.bind(this));
+        this.registerTool('act_and_diff', this.handleActAndDiff.bind(this));
         this.registerTool('tap_coordinates', this.handleTapCoordinates.bind(this));
     }
 
@@ -875,6 +1419,62 @@ class AppiumMCPServer extends BaseMCPServer {
         }
     }
 
+    /**
+     * Find an open session for the given connection settings, so appium_connect can skip
+     * session start-up (UiAutomator2 server install, WDA launch). The current session is
+     * returned when it matches; otherwise it is parked and a matching parked session is
+     * taken out of the pool. Sessions that no longer respond are dropped.
+     * @param {string} key - Serialized connection options
+     * @returns {Promise<Object|null>} Live driver, or null when a new session is needed
+     */
+    async acquireSession(key) {
+        let driver = null;
+        if (this.driver && this.sessionKey === key) {
+            driver = this.driver;
+        } else {
+            if (this.driver) {
+                await this.parkSession();
+            }
+            driver = this.parkedSessions.get(key) || null;
+            this.parkedSessions.delete(key);
+        }
+        if (!driver) {
+            return null;
+        }
+
+        try {
+            await driver.getWindowSize();
+            return driver;
+        } catch (error) {
+            console.warn('Open session no longer responds, starting a new one:', error.message);
+            if (driver === this.driver) {
+                this.driver = null;
+                this.isConnected = false;
+            }
+            return null;
+        }
+    }
+
+    /**
+     * Keep the current session open for reuse instead of ending it. Up to
+     * MAX_PARKED_SESSIONS are kept; the oldest one is ended to make room.
+     */
+    async parkSession() {
+        const previous = this.parkedSessions.get(this.sessionKey);
+        this.parkedSessions.delete(this.sessionKey);
+        if (previous && previous !== this.driver) {
+            await previous.deleteSession().catch(() => {});
+        }
+        this.parkedSessions.set(this.sessionKey, this.driver);
+        if (this.parkedSessions.size > MAX_PARKED_SESSIONS) {
+            const [oldestKey, oldest] = this.parkedSessions.entries().next().value;
+            this.parkedSessions.delete(oldestKey);
+            await oldest.deleteSession().catch(() => {});
+        }
+        this.driver = null;
+        this.isConnected = false;
+    }
+
     async reconnect() {
         if (!this.connectionConfig) {
             throw new Error('No connection configuration stored for reconnection');
@@ -884,6 +1484,7 @@ class AppiumMCPServer extends BaseMCPServer {
         this.driver = await remote(this.connectionConfig);
         this.isConnected = true;
         this.lastActivity = Date.now();
+        this.markStateDirty();
     }
 
     // Add session keepalive functionality
@@ -937,7 +1538,8 @@ class AppiumMCPServer extends BaseMCPServer {
                 wdaStartupRetries,
                 autoAcceptAlerts,
                 autoDismissAlerts,
-                shouldUseSingletonTestManager
+                shouldUseSingletonTestManager,
+                skipServerInstallation
             } = args;
 
             const opts = {
@@ -1003,15 +1605,32 @@ class AppiumMCPServer extends BaseMCPServer {
                 if (appActivity) {
                     opts.capabilities.alwaysMatch['appium:appActivity'] = appActivity;
                 }
+
+                if (skipServerInstallation !== undefined) {
+                    opts.capabilities.alwaysMatch['appium:skipServerInstallation'] = skipServerInstallation;
+                }
             }
 
             if (udid) {
                 opts.capabilities.alwaysMatch['appium:udid'] = udid;
             }
 
-            this.driver = await remote(opts);
+            const key = JSON.stringify(opts);
+            const reusedDriver = await this.acquireSession(key);
+            this.driver = reusedDriver || await remote(opts);
+            this.sessionKey = key;
             this.isConnected = true;
             this.currentPlatform = platform;
+            this.markStateDirty();
+
+            // A reused session may have left the app in the background
+            if (reusedDriver && (appPackage || bundleId)) {
+                try {
+                    await this.driver.activateApp(platform === 'iOS' ? bundleId : appPackage);
+                } catch (error) {
+                    console.warn('Could not activate app on reused session:', error.message);
+                }
+            }
             
             // Store connection config for auto-reconnect
             this.connectionConfig = opts;
@@ -1040,8 +1659,9 @@ class AppiumMCPServer extends BaseMCPServer {
             }
 
             return this.createSuccessResponse(
-                `Connected to ${platform} device: ${deviceName}`,
+                `Connected to ${platform} device: ${deviceName}${reusedDriver ? ' (reused open session)' : ''}`,
                 {
+                    reusedSession: Boolean(reusedDriver),
                     platform,
                     hostname,
                     port,
@@ -1063,16 +1683,23 @@ class AppiumMCPServer extends BaseMCPServer {
         try {
             // Stop keepalive first
             this.stopSessionKeepalive();
-            
+
+            const parked = Boolean(this.driver) && !args.quit;
             if (this.driver) {
-                await this.driver.deleteSession();
+                if (parked) {
+                    await this.parkSession();
+                } else {
+                    await this.driver.deleteSession();
+                }
                 this.driver = null;
+                this.sessionKey = null;
                 this.isConnected = false;
                 this.currentPlatform = null;
                 this.connectionConfig = null;
             }
+            this.markStateDirty();
 
-            return this.createSuccessResponse('Disconnected from device');
+            return this.createSuccessResponse(parked ? 'Disconnected from device (session kept open for reuse)' : 'Disconnected from device');
         } catch (error) {
             return this.createErrorResponse('appium_disconnect', error);
         }
@@ -1166,6 +1793,7 @@ class AppiumMCPServer extends BaseMCPServer {
             const { appPath } = args;
 
             await this.driver.installApp(appPath);
+            this.markStateDirty();
 
             return this.createSuccessResponse(`App installed: ${appPath}`);
         } catch (error) {
@@ -1181,6 +1809,7 @@ class AppiumMCPServer extends BaseMCPServer {
             const { packageName } = args;
 
             await this.driver.activateApp(packageName);
+            this.markStateDirty();
             await this.driver.pause(2000);
 
             const currentActivity = await this.driver.getCurrentActivity();
@@ -1204,6 +1833,7 @@ class AppiumMCPServer extends BaseMCPServer {
             const { packageName } = args;
 
             await this.driver.terminateApp(packageName);
+            this.markStateDirty();
 
             return this.createSuccessResponse(`App closed: ${packageName}`);
         } catch (error) {
@@ -1441,52 +2071,698 @@ class AppiumMCPServer extends BaseMCPServer {
                 );
             }, args);
         } catch (error) {
-            return this.createErrorResponse('swipe', error);
+            return this.createErrorResponse('swipe', error);
+        }
+    }
+
+    async handleGetScreenshot(args) {
+        try {
+            await this.ensureConnection();
+
+            let filename = args.filename || `screenshot-${Date.now()}.png`;
+            
+            // Add .jpg extension if filename doesn't have an extension
+            if (filename && !path.extname(filename)) {
+                filename = `${filename}.jpg`;
+            }
+            
+            const tempDir = path.join(__dirname, 'temp');
+            const filepath = path.join(tempDir, filename);
+
+            await fs.mkdir(tempDir, { recursive: true });
+
+            const screenshot = await this.driver.takeScreenshot();
+            await fs.writeFile(filepath, screenshot, 'base64');
+
+            return this.createSuccessResponse(`Screenshot saved: ${filepath}`, {
+                filepath,
+                filename,
+            });
+        } catch (error) {
+            return this.createErrorResponse('get_screenshot', error);
+        }
+    }
+
+    async handleGetPageSource(args) {
+        try {
+            await this.ensureConnection();
+
+            const { pageSource, cached, hash } = await this.getCachedPageSource({ refresh: args.refresh });
+            const elementCount = countElements(pageSource);
+            const xml = args.attributes === 'all' ? pageSource : this.analyzePage(hash, 'trimmed', () => this.trimPageSource(pageSource));
+
+            // The XML goes in its own text part: inside the JSON data every quote would be escaped
+            const response = this.createSuccessResponse(
+                `Page source retrieved (${elementCount} elements, ${xml.length} of ${pageSource.length} chars, hash ${hash}${cached ? ', cached' : ''})`,
+            );
+            response.content.push({ type: 'text', text: xml });
+            return this.markSnapshot(response);
+        } catch (error) {
+            return this.createErrorResponse('get_page_source', error);
+        }
+    }
+
+    /**
+     * Shrink page source XML without losing information: drop indentation between
+     * tags and boolean attributes (FALSE_ATTRIBUTE_RE) left at their "false" default.
+     * @param {string} pageSource - Page source XML from Appium
+     * @returns {string} Trimmed XML
+     */
+    trimPageSource(pageSource) {
+        return pageSource.replace(WHITESPACE_BETWEEN_TAGS_RE, '><').replace(FALSE_ATTRIBUTE_RE, '');
+    }
+
+    async handleBatch(args, { progress } = {}) {
+        try {
+            this.validateRequiredParams(args, ['steps']);
+            if (!Array.isArray(args.steps) || args.steps.length === 0) {
+                throw new Error('steps must be a non-empty array');
+            }
+
+            const when = args.snapshot?.when || 'final';
+            const filter = args.snapshot?.filter || 'interactive';
+            const snapshot = async () => {
+                try {
+                    await this.ensureConnection();
+                    const { pageSource, hash } = await this.getCachedPageSource();
+                    return this.analyzePage(hash, `lines:${filter}`, () => this.compressPageSource(pageSource, filter)).join('\n');
+                } catch (error) {
+                    return `(snapshot unavailable: ${error.message})`;
+                }
+            };
+
+            const stopOnError = args.stopOnError !== false;
+            const runStep = async (step) => {
+                const handler = step.tool !== 'appium_batch' && this.toolHandlers.get(step.tool);
+                if (!handler) {
+                    return this.createErrorResponse(step.tool, new Error('Unknown or unsupported tool in batch'));
+                }
+                let timer;
+                try {
+                    const call = handler(step.args || {}, { progress });
+                    if (!(args.stepTimeoutMs > 0)) {
+                        return await call;
+                    }
+                    const timeout = new Promise((_, reject) => {
+                        timer = setTimeout(() => reject(new Error(`Timed out after ${args.stepTimeoutMs}ms`)), args.stepTimeoutMs);
+                    });
+                    return await Promise.race([call, timeout]);
+                } catch (error) {
+                    return this.createErrorResponse(step.tool, error);
+                } finally {
+                    clearTimeout(timer);
+                }
+            };
+
+            const sections = [];
+            let ran = 0;
+            let failures = 0;
+            let stopped = false;
+
+            for (const [index, step] of args.steps.entries()) {
+                const result = await runStep(step);
+                const text = result.content.map((item) => item.text).filter(Boolean).join('');
+                const failed = Boolean(result.isError);
+
+                ran++;
+                sections.push(`${failed ? '❌' : '✅'} Step ${index + 1} ${step.tool}: ${text}`);
+                progress?.report(`${sections[sections.length - 1].split('\n')[0]}\n`);
+                if (failed) {
+                    failures++;
+                    if (stopOnError) {
+                        stopped = true;
+                        break;
+                    }
+                }
+
+                if (when === 'each' && index < args.steps.length - 1) {
+                    sections.push(`📄 Screen after step ${index + 1}:\n${await snapshot()}`);
+                }
+            }
+
+            if (when !== 'none') {
+                sections.push(`📄 Screen after step ${ran}:\n${await snapshot()}`);
+            }
+
+            let summary = `Batch completed ${ran} step(s)`;
+            if (stopped) {
+                summary = `Batch stopped at step ${ran} of ${args.steps.length}`;
+            } else if (failures) {
+                summary = `Batch ran ${ran} step(s), ${failures} failed`;
+            }
+            return {
+                content: [{ type: 'text', text: `${summary}\n\n${sections.join('\n\n')}` }],
+                isError: stopped,
+            };
+        } catch (error) {
+            return this.createErrorResponse('appium_batch', error);
+        }
+    }
+
+    async handleGetPageSourceCompressed(args, { progress } = {}) {
+        try {
+            await this.ensureConnection();
+
+            const filter = args.filter || 'interactive';
+            if (!['interactive', 'overlays', 'all'].includes(filter)) {
+                throw new Error(`Unknown filter: ${filter}`);
+            }
+
+            const { pageSource, cached, hash } = await this.getCachedPageSource({ refresh: args.refresh });
+            if (args.format === 'table') {
+                const { table, locators } = this.analyzePage(hash, `table:${filter}`, () => this.tabulatePageSource(pageSource, filter));
+                this.locatorTable = locators;
+                return this.markSnapshot(
+                    this.createSuccessResponse(
+                        `Page source table (${filter}, ${table.ids.length} elements, ${pageSource.length} chars of XML, hash ${hash}${cached ? ', cached' : ''})`,
+                        table,
+                    ),
+                );
+            }
+            const lines = this.analyzePage(hash, `lines:${filter}`, () => this.compressPageSource(pageSource, filter, progress));
+
+            return this.markSnapshot(
+                this.createSuccessResponse(
+                    `Page source (${filter}, ${lines.length} elements, ${pageSource.length} chars of XML, hash ${hash}${cached ? ', cached' : ''}):\n${lines.join('\n')}`,
+                ),
+            );
+        } catch (error) {
+            return this.createErrorResponse('get_page_source_compressed', error);
+        }
+    }
+
+    /**
+     * Convert page source XML into one compact line per element, e.g.
+     * `  Button "Log in" id=login_button @[42,900][1038,1020]`.
+     * Invisible subtrees are dropped and indentation follows the kept ancestors.
+     * Lines are streamed through the progress reporter as they are produced.
+     * @param {string} pageSource - Page source XML from Appium
+     * @param {string} filter - 'interactive', 'overlays' or 'all'
+     * @param {Object} progress - Progress reporter from the tool call context
+     * @returns {string[]} Compact element lines
+     */
+    compressPageSource(pageSource, filter, progress) {
+        const lines = [];
+        this.visitVisibleElements(pageSource, (type, attributes, { depth }) => {
+            const line = this.compressElement(type, attributes, filter);
+            if (line) {
+                lines.push(`${'  '.repeat(depth)}${line}`);
+                if (progress && lines.length % COMPRESSED_CHUNK_LINES === 0) {
+                    progress.report(`${lines.slice(-COMPRESSED_CHUNK_LINES).join('\n')}\n`);
+                }
+            }
+            return Boolean(line);
+        });
+        return lines;
+    }
+
+    /**
+     * Convert page source XML into a columnar element table: one array per column,
+     * row i of every column describing element i. Smaller than the line format for
+     * large screens, and a row index names an element without repeating its attributes.
+     * @param {string} pageSource - Page source XML from Appium
+     * @param {string} filter - 'interactive', 'overlays' or 'all'
+     * @returns {Object} { table, locators }: table holds { ids, texts, bounds, roles, ctx } with
+     *                   ctx 'webview' or 'native' per row; locators holds the ranked locators per row
+     */
+    tabulatePageSource(pageSource, filter) {
+        const table = { ids: [], texts: [], bounds: [], roles: [], ctx: [] };
+        const locators = [];
+        this.visitVisibleElements(pageSource, (type, attributes, { webview }) => {
+            const element = this.describeElement(type, attributes, filter);
+            if (element) {
+                table.ids.push(element.id);
+                table.texts.push(element.label);
+                table.bounds.push(element.bounds);
+                table.roles.push(element.role);
+                table.ctx.push(webview ? 'webview' : 'native');
+                locators.push(this.buildLocators(type, attributes));
+            }
+            return Boolean(element);
+        });
+        return { table, locators };
+    }
+
+    /**
+     * Rank the selectors that identify an element, most reliable first: accessibility id
+     * (iOS name / Android content-desc), resource-id, content description, visible text,
+     * then an XPath on its type and one identifying attribute
+     * @param {string} type - Element tag (class name)
+     * @param {string} attributes - Raw attribute string
+     * @returns {Array} Frozen list of [strategy, selector] pairs, duplicates removed
+     */
+    buildLocators(type, attributes) {
+        const attribute = (name) => {
+            const match = attributes.match(new RegExp(`\\s${name}="([^"]*)"`));
+            return match && match[1] ? match[1] : null;
+        };
+
+        const contentDesc = attribute('content-desc');
+        const resourceId = attribute('resource-id');
+        const text = attribute('text') || attribute('label') || attribute('value');
+        const candidates = [
+            ['accessibilityId', contentDesc || attribute('name')],
+            ['id', resourceId],
+            ['contentDescription', contentDesc],
+            ['text', text],
+        ];
+        const xpathAttribute = [['resource-id', resourceId], ['text', attribute('text')], ['label', attribute('label')],
+            ['name', attribute('name')], ['content-desc', contentDesc]].find(([, value]) => value && !value.includes('"'));
+        if (xpathAttribute) {
+            candidates.push(['xpath', `//${type}[@${xpathAttribute[0]}="${xpathAttribute[1]}"]`]);
+        }
+
+        const seen = new Set();
+        return Object.freeze(candidates.filter(([strategy, selector]) => {
+            const key = `${strategy}\n${selector}`;
+            if (!selector || seen.has(key)) {
+                return false;
+            }
+            seen.add(key);
+            return true;
+        }));
+    }
+
+    /**
+     * Walk the visible elements of a page source in document order, skipping invisible
+     * subtrees in the same pass.
+     * @param {string} pageSource - Page source XML from Appium
+     * @param {Function} visit - Called with (type, attributes, { depth, webview }), where depth
+     *                           counts the ancestors visit kept and webview is true inside a
+     *                           WebView; returns whether the element was kept
+     */
+    visitVisibleElements(pageSource, visit) {
+        const openStack = []; // One entry per open element: { kept, webview }
+        let hiddenDepth = 0; // > 0 while inside an invisible subtree
+        let keptDepth = 0;
+        let webviewDepth = 0;
+
+        for (const [, closing, type, attributes, selfClosing] of pageSource.matchAll(XML_TAG_RE)) {
+            if (closing) {
+                if (hiddenDepth > 0) {
+                    hiddenDepth--;
+                } else {
+                    const open = openStack.pop();
+                    keptDepth -= open?.kept ? 1 : 0;
+                    webviewDepth -= open?.webview ? 1 : 0;
+                }
+                continue;
+            }
+
+            if (hiddenDepth > 0 || /\s(?:visible|displayed)="false"/.test(attributes)) {
+                if (!selfClosing) {
+                    hiddenDepth++;
+                }
+                continue;
+            }
+
+            const webview = WEBVIEW_TYPE_RE.test(type);
+            const kept = visit(type, attributes, { depth: keptDepth, webview: webview || webviewDepth > 0 });
+            if (!selfClosing) {
+                openStack.push({ kept, webview });
+                keptDepth += kept ? 1 : 0;
+                webviewDepth += webview ? 1 : 0;
+            }
+        }
+    }
+
+    /**
+     * Build the compact line for one element, or null if the filter drops it
+     * @param {string} type - Element tag (class name)
+     * @param {string} attributes - Raw attribute string
+     * @param {string} filter - 'interactive', 'overlays' or 'all'
+     */
+    compressElement(type, attributes, filter) {
+        const element = this.describeElement(type, attributes, filter);
+        if (!element) {
+            return null;
+        }
+
+        const { role, id, label, bounds } = element;
+        let line = role;
+        if (label) {
+            line += ` "${label.length > 80 ? `${label.slice(0, 77)}...` : label}"`;
+        }
+        if (id && id !== label) {
+            line += ` id=${id}`;
+        }
+        if (bounds) {
+            line += ` @${bounds}`;
+        }
+        if (element.disabled) {
+            line += ' disabled';
+        }
+        if (element.selected) {
+            line += ' selected';
+        }
+        return line;
+    }
+
+    /**
+     * Extract the identifying fields of one element, or null if the filter drops it
+     * @param {string} type - Element tag (class name)
+     * @param {string} attributes - Raw attribute string
+     * @param {string} filter - 'interactive', 'overlays' or 'all'
+     * @returns {Object|null} { role, id, label, bounds, disabled, selected }
+     */
+    describeElement(type, attributes, filter) {
+        const attribute = (name) => {
+            const match = attributes.match(new RegExp(`\\s${name}="([^"]*)"`));
+            return match && match[1] ? match[1] : null;
+        };
+
+        const id = attribute('resource-id') || attribute('name');
+        const label = attribute('text') || attribute('label') || attribute('content-desc') || attribute('value');
+        const role = type.replace(ELEMENT_TYPE_PREFIX_RE, '') || type;
+
+        if (filter === 'interactive') {
+            const actionable = attribute('clickable') === 'true' || attribute('checkable') === 'true' ||
+                               INTERACTIVE_TYPE_RE.test(role);
+            if (!actionable && !label) {
+                return null;
+            }
+        } else if (filter === 'overlays') {
+            const values = [type, id, label, attribute('class')].filter(Boolean);
+            if (!this.findOverlayKeyword(values) && !(label && DISMISS_LABELS.has(label.trim().toLowerCase()))) {
+                return null;
+            }
+        }
+
+        const x = attribute('x');
+        const y = attribute('y');
+        return {
+            role,
+            id,
+            label,
+            bounds: attribute('bounds') ||
+                    (x !== null && y !== null ? `[${x},${y}][${attribute('width')}x${attribute('height')}]` : null),
+            disabled: attribute('enabled') === 'false',
+            selected: attribute('checked') === 'true' || attribute('selected') === 'true',
+        };
+    }
+
+    async handleScanOverlays(args) {
+        try {
+            await this.ensureConnection();
+
+            const { pageSource, hash } = await this.getCachedPageSource({ refresh: args.refresh });
+            const { overlayDetected, overlayCount, dismissCount, overlays, dismissCandidates } =
+                this.analyzePage(hash, 'scan', () => this.scanScreen(pageSource));
+
+            return this.createSuccessResponse(
+                this.describeOverlays({ overlayDetected, overlayCount, dismissCount, overlays }),
+                { overlayDetected, overlayCount, dismissCount, overlays, dismissCandidates },
+            );
+        } catch (error) {
+            return this.createErrorResponse('scan_overlays', error);
+        }
+    }
+
+    async handleScanScreen(args) {
+        try {
+            await this.ensureConnection();
+
+            const { pageSource, hash } = await this.getCachedPageSource({ refresh: args.refresh });
+            const scan = this.analyzePage(hash, 'scan', () => this.scanScreen(pageSource));
+            const message = [
+                `Verdict: ${scan.verdict}`,
+                scan.errorDetected
+                    ? `🚨 ${scan.errorCount} error indicator(s) found (${scan.errorCategories.join(', ')})`
+                    : 'No error indicators found',
+                this.describeOverlays(scan),
+                `Context: ${scan.context}`,
+            ].join('\n');
+
+            return this.markSnapshot(this.createSuccessResponse(message, { ...scan, pageSourceHash: hash }));
+        } catch (error) {
+            return this.createErrorResponse('scan_screen', error);
+        }
+    }
+
+    async handleDismissOverlayBurst(args, { progress } = {}) {
+        try {
+            await this.ensureConnection();
+
+            const { pressBack = true } = args;
+            let { pageSource, hash } = await this.getCachedPageSource();
+            let scan = this.analyzePage(hash, 'scan', () => this.scanScreen(pageSource));
+            if (!scan.overlayDetected) {
+                return this.createSuccessResponse('No overlay indicators found; nothing to dismiss');
+            }
+
+            const { width, height } = await this.driver.getWindowSize();
+            const attempts = [
+                ...OVERLAY_DISMISS_POINTS.map(([x, y]) => ({
+                    label: `tap ${x},${y}`,
+                    run: () => this.performCoordinateClick(x * width, y * height),
+                })),
+                ...(pressBack && this.currentPlatform !== 'iOS' ? [{ label: 'back', run: () => this.driver.back() }] : []),
+            ];
+
+            const tried = [];
+            for (const attempt of attempts) {
+                const previousHash = hash;
+                await attempt.run();
+                this.markStateDirty();
+                await this.driver.pause(OBSERVE_SETTLE_MS);
+                ({ pageSource, hash } = await this.getCachedPageSource());
+                // An unchanged screen cannot have lost its overlay, so only a new hash is rescanned
+                if (hash !== previousHash) {
+                    scan = this.analyzePage(hash, 'scan', () => this.scanScreen(pageSource));
+                }
+                tried.push(`${attempt.label}: ${hash === previousHash ? 'no change' : scan.overlayDetected ? 'overlay remains' : 'cleared'}`);
+                progress?.report(`${tried[tried.length - 1]}\n`);
+                if (!scan.overlayDetected) {
+                    break;
+                }
+            }
+
+            const message = `${scan.overlayDetected ? 'Overlay remains' : 'Overlay cleared'} after ${tried.length} attempt(s):\n${tried.join('\n')}`;
+            return this.markSnapshot(this.createSuccessResponse(`${message}\n${this.describeOverlays(scan)}`));
+        } catch (error) {
+            return this.createErrorResponse('dismiss_overlay_burst', error);
+        }
+    }
+
+    /**
+     * Summarize the overlay part of a screen scan in one line
+     * @param {Object} scan - Result of scanScreen
+     */
+    describeOverlays(scan) {
+        const categories = [...new Set(scan.overlays.map((overlay) => overlay.category))];
+        return scan.overlayDetected
+            ? `${scan.overlayCount} overlay indicator(s) found (${categories.join(', ')}), ${scan.dismissCount} dismissal control(s)`
+            : 'No overlay indicators found';
+    }
+
+    async handleEnsurePageReady(args, { progress } = {}) {
+        try {
+            await this.ensureConnection();
+
+            const { expect = [], maxAttempts = 5, filter = 'interactive' } = args;
+            const dismissed = [];
+            const tried = new Set();
+            let { pageSource, hash } = await this.getCachedPageSource();
+            let scan = this.analyzePage(hash, 'scan', () => this.scanScreen(pageSource));
+
+            while (scan.overlayDetected && dismissed.length < maxAttempts) {
+                const candidate = scan.dismissCandidates.find((item) => !tried.has(item.id || item.label));
+                if (!candidate) {
+                    break; // Overlay without a known control: left to the coordinate fallback
+                }
+                tried.add(candidate.id || candidate.label);
+
+                // Android resource IDs look like "package:id/name"; iOS names are accessibility IDs
+                const [strategy, selector] = candidate.id
+                    ? [candidate.id.includes(':id/') ? 'id' : 'accessibilityId', candidate.id]
+                    : ['text', candidate.label];
+                const result = await this.handleSmartFindAndClick({
+                    strategy,
+                    selector,
+                    timeout: 2000,
+                    enableScrolling: false,
+                    fallbackOptions: { enableScreenshotAnalysis: false },
+                });
+                const ok = !result.isError;
+                dismissed.push(`${ok ? '✅' : '❌'} ${candidate.label} (${strategy}: ${selector})`);
+                progress?.report(`${dismissed[dismissed.length - 1]}\n`);
+
+                this.markStateDirty();
+                ({ pageSource, hash } = await this.getCachedPageSource());
+                scan = this.analyzePage(hash, 'scan', () => this.scanScreen(pageSource));
+            }
+
+            const missing = expect.filter((term) => !pageSource.includes(`"${term}"`));
+            const ready = !scan.overlayDetected && missing.length === 0;
+            const lines = [
+                ready ? 'Page ready' : 'Page not ready',
+                `Dismissal taps: ${dismissed.length ? `\n${dismissed.join('\n')}` : 'none'}`,
+            ];
+            if (scan.overlayDetected) {
+                const remaining = scan.overlays.map((overlay) => `${overlay.category}: ${overlay.text || overlay.id || overlay.type}`);
+                lines.push(`Overlays remaining (${scan.overlayCount}): ${remaining.join('; ')}`);
+            }
+            if (scan.errorDetected) {
+                const errors = scan.errors.map((error) => `${error.category}: ${error.text || error.id || error.type}`);
+                lines.push(`🚨 Error indicators (${scan.errorCount}, verdict ${scan.verdict}): ${errors.join('; ')}`);
+            }
+            if (expect.length) {
+                lines.push(missing.length ? `Expected but not found: ${missing.join(', ')}` : `Expected elements found: ${expect.join(', ')}`);
+            }
+            if (filter !== 'none') {
+                lines.push(`📄 Screen:\n${this.compressPageSource(pageSource, filter).join('\n')}`);
+            }
+
+            // Not being ready is a finding, not a failed call
+            return this.markSnapshot(this.createSuccessResponse(lines.join('\n')));
+        } catch (error) {
+            return this.createErrorResponse('ensure_page_ready', error);
         }
     }
 
-    async handleGetScreenshot(args) {
-        try {
-            await this.ensureConnection();
+    /**
+     * Find error indicators, overlay indicators and dismissal controls in a page source
+     * in one pass over its elements.
+     * Only visible elements are considered, and only their type and identifying
+     * attributes (class, resource-id, content-desc, text, name, label, value) are scanned;
+     * error phrases are only looked for in the text attributes.
+     * @param {string} pageSource - Page source XML from Appium
+     * @returns {Object} Error, overlay and dismissal matches (at most MAX_SCAN_RESULTS of each),
+     *                   the context (NATIVE, WEBVIEW or HYBRID), the matched error categories as a
+     *                   severityMask (one bit each) and a verdict read off the mask: FAIL when an
+     *                   error is in a critical category, WARNING for other errors, otherwise PASS
+     */
+    scanScreen(pageSource) {
+        const errors = [];
+        const overlays = [];
+        const dismissCandidates = [];
+        let errorCount = 0;
+        let severityMask = 0;
+        let overlayCount = 0;
+        let dismissCount = 0;
+        let contextBits = 0;
+
+        for (const match of pageSource.matchAll(ELEMENT_TAG_RE)) {
+            const [, type, attributes] = match;
+            if (/\svisible="false"/.test(attributes)) {
+                continue;
+            }
 
-            let filename = args.filename || `screenshot-${Date.now()}.png`;
-            
-            // Add .jpg extension if filename doesn't have an extension
-            if (filename && !path.extname(filename)) {
-                filename = `${filename}.jpg`;
+            if (CONTEXT_WEBVIEW_TYPE_RE.test(type)) {
+                contextBits |= 0b001;
+            } else if (CONTEXT_NATIVE_TYPE_RE.test(type)) {
+                contextBits |= 0b010;
+            } else if (CONTEXT_HTML_TYPE_RE.test(type)) {
+                contextBits |= 0b100;
             }
-            
-            const tempDir = path.join(__dirname, 'temp');
-            const filepath = path.join(tempDir, filename);
 
-            await fs.mkdir(tempDir, { recursive: true });
+            const scanned = Array.from(attributes.matchAll(SCANNED_ATTRIBUTE_RE));
+            const values = [type, ...scanned.map((attribute) => attribute[2])];
+            const keyword = this.findOverlayKeyword(values);
+            const dismissLabel = values.find((value) => DISMISS_LABELS.has(value.trim().toLowerCase()));
+            const errorMatch = this.findErrorIndicator(scanned);
+            if (!keyword && !dismissLabel && !errorMatch) {
+                continue;
+            }
 
-            const screenshot = await this.driver.takeScreenshot();
-            await fs.writeFile(filepath, screenshot, 'base64');
+            const x = this.extractAttribute(attributes, 'x');
+            const y = this.extractAttribute(attributes, 'y');
+            const element = {
+                type,
+                id: this.extractAttribute(attributes, 'resource-id') || this.extractAttribute(attributes, 'name'),
+                text: this.extractAttribute(attributes, 'text') || this.extractAttribute(attributes, 'label') ||
+                      this.extractAttribute(attributes, 'content-desc'),
+                bounds: this.extractAttribute(attributes, 'bounds') ||
+                        (x !== null && y !== null ? `${x},${y} ${this.extractAttribute(attributes, 'width')}x${this.extractAttribute(attributes, 'height')}` : null),
+                offset: match.index,
+            };
 
-            return this.createSuccessResponse(`Screenshot saved: ${filepath}`, {
-                filepath,
-                filename,
-            });
-        } catch (error) {
-            return this.createErrorResponse('get_screenshot', error);
+            if (errorMatch) {
+                errorCount++;
+                severityMask |= ERROR_CATEGORY_BITS[errorMatch.category];
+                if (errors.length < MAX_SCAN_RESULTS) {
+                    errors.push({ ...errorMatch, ...element });
+                }
+            }
+            if (keyword) {
+                overlayCount++;
+                if (overlays.length < MAX_SCAN_RESULTS) {
+                    overlays.push({ category: OVERLAY_CATEGORY.get(keyword.toLowerCase()), keyword, ...element });
+                }
+            }
+            if (dismissLabel) {
+                dismissCount++;
+                if (dismissCandidates.length < MAX_SCAN_RESULTS) {
+                    dismissCandidates.push({ label: dismissLabel.trim(), ...element });
+                }
+            }
         }
-    }
 
-    async handleGetPageSource(args) {
-        try {
-            await this.ensureConnection();
+        return {
+            verdict: severityMask & CRITICAL_ERROR_MASK ? 'FAIL' : severityMask ? 'WARNING' : 'PASS',
+            severityMask,
+            errorCategories: Object.keys(ERROR_CATEGORY_BITS).filter((category) => severityMask & ERROR_CATEGORY_BITS[category]),
+            errorDetected: errorCount > 0,
+            errorCount,
+            errors,
+            overlayDetected: overlayCount > 0,
+            overlayCount,
+            dismissCount,
+            overlays,
+            dismissCandidates,
+            context: CONTEXT_BY_BITS[contextBits],
+        };
+    }
 
-            const pageSource = await this.driver.getPageSource();
-            const elementCount = (pageSource.match(/<[^/][^>]*>/g) || []).length;
+    /**
+     * Match an element's scanned attributes against the error vocabulary: an error
+     * phrase in a non-empty text attribute, or an error widget marker in its class or
+     * resource-id (reported only when the widget shows text)
+     * @param {Array} scanned - [match, name, value] entries from SCANNED_ATTRIBUTE_RE
+     * @returns {Object|null} { category, keyword } of the first match
+     */
+    findErrorIndicator(scanned) {
+        let hasText = false;
+        for (const [, name, value] of scanned) {
+            if (!TEXT_ATTRIBUTES.has(name) || !value) {
+                continue;
+            }
+            hasText = true;
+            const match = ERROR_RE.exec(value);
+            if (match) {
+                return { category: ERROR_CATEGORY.get(match[0].toLowerCase()), keyword: match[0] };
+            }
+        }
+        if (hasText) {
+            for (const [, name, value] of scanned) {
+                const marker = (name === 'class' || name === 'resource-id') && ERROR_MARKER_RE.exec(value);
+                if (marker) {
+                    return { category: 'error_widget', keyword: marker[0] };
+                }
+            }
+        }
+        return null;
+    }
 
-            return this.createSuccessResponse(`Page source retrieved (${elementCount} elements)`, {
-                pageSource,
-                elementCount,
-            });
-        } catch (error) {
-            return this.createErrorResponse('get_page_source', error);
+    /**
+     * Return the first overlay keyword found in the given attribute values.
+     * A lowercase keyword glued to a preceding letter is ignored ("tip" in "multiple"),
+     * while a camelCase part still matches ("Modal" in "loginModalView").
+     * The values are joined with newlines and scanned in one regex pass.
+     * @param {string[]} values - Element type and attribute values
+     * @returns {string|null} Matched keyword
+     */
+    findOverlayKeyword(values) {
+        const text = values.join('\n');
+        OVERLAY_RE.lastIndex = 0;
+        let match;
+        while ((match = OVERLAY_RE.exec(text)) !== null) {
+            const glued = match.index > 0 && /[a-z]/i.test(text[match.index - 1]);
+            if (!glued || match[0][0] !== match[0][0].toLowerCase()) {
+                return match[0];
+            }
         }
+        return null;
     }
 
     async handleAlert(args) {
@@ -1505,6 +2781,7 @@ class AppiumMCPServer extends BaseMCPServer {
                 } else {
                     await this.driver.dismissAlert();
                 }
+                this.markStateDirty();
                 
                 return this.createSuccessResponse(`Alert ${action}ed successfully`);
             } catch (error) {
@@ -1525,6 +2802,7 @@ class AppiumMCPServer extends BaseMCPServer {
             }
 
             await this.driver.execute('mobile: pressButton', { name: 'home' });
+            this.markStateDirty();
             
             return this.createSuccessResponse('Home button pressed');
         } catch (error) {
@@ -1540,6 +2818,7 @@ class AppiumMCPServer extends BaseMCPServer {
             const { appId } = args;
 
             await this.driver.activateApp(appId);
+            this.markStateDirty();
             await this.driver.pause(2000);
 
             let currentInfo = {};
@@ -1635,10 +2914,11 @@ class AppiumMCPServer extends BaseMCPServer {
             iosNsPredicate: selector, // iOS-specific NSPredicate selector
         };
 
-        const actualSelector = selectorMap[strategy];
-        if (!actualSelector) {
+        const mappedSelector = selectorMap[strategy];
+        if (!mappedSelector) {
             throw new Error(`Unsupported strategy: ${strategy}`);
         }
+        const actualSelector = XPATH_STRATEGIES.has(strategy) ? this.compileXPath(mappedSelector) : mappedSelector;
 
         let element;
         if (strategy === 'iosClassChain') {
@@ -1665,10 +2945,11 @@ class AppiumMCPServer extends BaseMCPServer {
             iosNsPredicate: selector, // iOS-specific NSPredicate selector
         };
 
-        const actualSelector = selectorMap[strategy];
-        if (!actualSelector) {
+        const mappedSelector = selectorMap[strategy];
+        if (!mappedSelector) {
             throw new Error(`Unsupported strategy: ${strategy}`);
         }
+        const actualSelector = XPATH_STRATEGIES.has(strategy) ? this.compileXPath(mappedSelector) : mappedSelector;
 
         let elements;
         if (strategy === 'iosClassChain') {
@@ -1707,11 +2988,18 @@ class AppiumMCPServer extends BaseMCPServer {
     }
 
     // Automatic state capture functionality
-    async captureCurrentState(actionName, actionParams = {}) {
+    async captureCurrentState(actionName, actionParams = {}, { forceRefresh = false } = {}) {
         if (!this.autoStateCapture.enabled || !this.isConnected) {
             return null;
         }
 
+        const snapshotKey = forceRefresh ? null : await this.getStateSnapshotKey();
+        const cachedSnapshot = this.getCachedStateSnapshot(snapshotKey);
+        if (cachedSnapshot) {
+            console.log(`📸 Screen unchanged since ${cachedSnapshot.id}, reusing cached state capture`);
+            return cachedSnapshot;
+        }
+
         try {
             const timestamp = Date.now();
             const captureId = `${actionName}_${timestamp}`;
@@ -1721,18 +3009,20 @@ class AppiumMCPServer extends BaseMCPServer {
 
             // Capture screenshot
             let screenshotPath = null;
+            let screenshotBase64 = null;
             try {
-                const screenshot = await this.driver.takeScreenshot();
+                screenshotBase64 = await this.driver.takeScreenshot();
                 screenshotPath = path.join(this.autoStateCapture.outputDir, `${captureId}_screenshot.png`);
-                await fs.writeFile(screenshotPath, screenshot, 'base64');
+                await fs.writeFile(screenshotPath, screenshotBase64, 'base64');
             } catch (error) {
                 console.warn('Failed to capture screenshot:', error.message);
             }
 
             // Capture page source
             let pageSourcePath = null;
+            let pageSource = null;
             try {
-                const pageSource = await this.driver.getPageSource();
+                pageSource = await this.driver.getPageSource();
                 pageSourcePath = path.join(this.autoStateCapture.outputDir, `${captureId}_page_source.xml`);
                 await fs.writeFile(pageSourcePath, pageSource, 'utf8');
             } catch (error) {
@@ -1781,13 +3071,124 @@ class AppiumMCPServer extends BaseMCPServer {
                 this.autoStateCapture.lastCaptures.shift();
             }
 
-            return capture;
+            if (snapshotKey && this.stateSnapshotCache.enabled) {
+                this.stateSnapshotCache.entry = {
+                    key: snapshotKey,
+                    capturedAt: timestamp,
+                    capture,
+                    pageSource,
+                    screenshotBase64
+                };
+            }
+
+            return { ...capture, cached: false, pageSource, screenshotBase64 };
         } catch (error) {
             console.warn('State capture failed:', error.message);
             return null;
         }
     }
 
+    /**
+     * Identify the current screen for the snapshot cache: the foreground activity
+     * (Android) plus the UI revision counter. Returns null when the screen cannot
+     * be identified, which disables the cache for that capture.
+     */
+    async getStateSnapshotKey() {
+        if (!this.stateSnapshotCache.enabled) {
+            return null;
+        }
+
+        let screenId = this.currentPlatform || 'unknown';
+        if (this.currentPlatform === 'Android') {
+            try {
+                screenId = await this.driver.getCurrentActivity();
+            } catch (error) {
+                return null;
+            }
+        }
+        return `${screenId}#${this.stateSnapshotCache.revision}`;
+    }
+
+    getCachedStateSnapshot(snapshotKey) {
+        const { entry, maxAgeMs } = this.stateSnapshotCache;
+        if (!snapshotKey || !entry || entry.key !== snapshotKey) {
+            return null;
+        }
+        if (Date.now() - entry.capturedAt > maxAgeMs) {
+            return null;
+        }
+        return {
+            ...entry.capture,
+            cached: true,
+            pageSource: entry.pageSource,
+            screenshotBase64: entry.screenshotBase64
+        };
+    }
+
+    /**
+     * Invalidate cached screen state. Call after any command that can change the UI
+     * (taps, typing, gestures, navigation, app lifecycle, session changes).
+     */
+    markStateDirty() {
+        this.stateSnapshotCache.revision++;
+        this.stateSnapshotCache.entry = null;
+        this.pageSourceCache.entry = null;
+    }
+
+    /**
+     * Page source for the tool-facing readers (get_page_source, the compact view,
+     * scan_overlays, batch snapshots). A read of an unchanged screen within maxAgeMs
+     * is served from memory, including the page source of a fresh state capture.
+     * Loops that poll for the UI to change call driver.getPageSource() directly.
+     * @param {Object} options - { refresh: bypass the cache }
+     * @returns {Object} { pageSource, cached, hash } where hash is from hashPageSource
+     */
+    async getCachedPageSource({ refresh = false } = {}) {
+        const key = await this.getStateSnapshotKey();
+        const { entry, maxAgeMs } = this.pageSourceCache;
+
+        if (!refresh && key) {
+            if (entry && entry.key === key && Date.now() - entry.fetchedAt <= maxAgeMs) {
+                return { pageSource: entry.pageSource, cached: true, hash: entry.hash };
+            }
+            const snapshot = this.getCachedStateSnapshot(key);
+            if (snapshot?.pageSource) {
+                snapshot.pageSourceHash ??= hashPageSource(snapshot.pageSource);
+                return { pageSource: snapshot.pageSource, cached: true, hash: snapshot.pageSourceHash };
+            }
+        }
+
+        const pageSource = await this.driver.getPageSource();
+        const hash = hashPageSource(pageSource);
+        if (key) {
+            this.pageSourceCache.entry = { key, fetchedAt: Date.now(), pageSource, hash };
+        }
+        return { pageSource, cached: false, hash };
+    }
+
+    /**
+     * Compute a view of a page source once per distinct screen content
+     * @param {string} hash - Page source hash from getCachedPageSource
+     * @param {string} view - Name of the view, including its options (e.g. 'table:interactive')
+     * @param {Function} compute - Builds the view on a miss
+     */
+    analyzePage(hash, view, compute) {
+        let views = this.pageAnalysis.get(hash);
+        if (views) {
+            this.pageAnalysis.delete(hash); // Re-insert as most recently used
+        } else {
+            views = new Map();
+            while (this.pageAnalysis.size >= PAGE_ANALYSIS_CACHE_SIZE) {
+                this.pageAnalysis.delete(this.pageAnalysis.keys().next().value);
+            }
+        }
+        this.pageAnalysis.set(hash, views);
+        if (!views.has(view)) {
+            views.set(view, compute());
+        }
+        return views.get(view);
+    }
+
     async getStateCaptureContext() {
         if (!this.autoStateCapture.enabled) {
             return { enabled: false };
@@ -1821,21 +3222,31 @@ class AppiumMCPServer extends BaseMCPServer {
             preActionCapture = await this.captureCurrentState(`pre_${actionName}`, args);
         }
 
-        // Perform the actual action
-        const result = await actionFunction();
+        // Perform the actual action; whatever the outcome, the screen may have changed
+        let result;
+        try {
+            result = await actionFunction();
+        } finally {
+            this.markStateDirty();
+        }
+
+        if (args?.observe && !result.isError) {
+            result.content.push({ type: 'text', text: await this.observeScreen() });
+        }
 
         // Add capture information to result if captured
         if (preActionCapture) {
-            // Read the page source content for immediate access
-            let pageSourceContent = null;
+            // Page source content is kept in memory by the capture, fall back to disk
+            let pageSourceContent = preActionCapture.pageSource;
             try {
-                if (preActionCapture.pageSourcePath) {
+                if (!pageSourceContent && preActionCapture.pageSourcePath) {
                     pageSourceContent = await fs.readFile(preActionCapture.pageSourcePath, 'utf8');
                 }
             } catch (error) {
                 console.warn('Could not read page source for state capture:', error.message);
             }
 
+            const elementCount = pageSourceContent ? countElements(pageSourceContent) : 0;
             result.stateCapture = {
                 preActionCapture: {
                     id: preActionCapture.id,
@@ -1845,15 +3256,39 @@ class AppiumMCPServer extends BaseMCPServer {
                     captureTime: preActionCapture.captureTime,
                     // Include actual page source content
                     pageSource: pageSourceContent,
-                    elementCount: pageSourceContent ? (pageSourceContent.match(/<[^/][^>]*>/g) || []).length : 0
+                    elementCount
                 },
-                message: `State captured before ${actionName}. Screenshot: ${preActionCapture.screenshotPath ? 'available' : 'failed'}, Page source: ${preActionCapture.pageSourcePath ? 'available' : 'failed'} (${pageSourceContent ? (pageSourceContent.match(/<[^/][^>]*>/g) || []).length : 0} elements)`
+                message: `State captured before ${actionName}. Screenshot: ${preActionCapture.screenshotPath ? 'available' : 'failed'}, Page source: ${preActionCapture.pageSourcePath ? 'available' : 'failed'} (${elementCount} elements)`
             };
         }
 
         return result;
     }
 
+    /**
+     * Describe the screen right after an action: wait OBSERVE_SETTLE_MS, then one page
+     * source fetch gives the hash, the error and overlay scan and the compact element list
+     * @returns {Promise<string>} Text part for the action response
+     */
+    async observeScreen() {
+        try {
+            await this.driver.pause(OBSERVE_SETTLE_MS);
+            const { pageSource, hash } = await this.getCachedPageSource();
+            const scan = this.analyzePage(hash, 'scan', () => this.scanScreen(pageSource));
+            const lines = this.analyzePage(hash, 'lines:interactive', () => this.compressPageSource(pageSource, 'interactive'));
+            const findings = [`verdict ${scan.verdict}`, `hash ${hash}`, scan.context];
+            if (scan.errorDetected) {
+                findings.push(`🚨 ${scan.errorCount} error indicator(s): ${scan.errors.map((error) => error.text || error.id || error.type).join('; ')}`);
+            }
+            if (scan.overlayDetected) {
+                findings.push(this.describeOverlays(scan));
+            }
+            return `📄 Screen after action (${findings.join(', ')}):\n${lines.join('\n')}`;
+        } catch (error) {
+            return `(screen unavailable: ${error.message})`;
+        }
+    }
+
     async handleWaitForElement(args) {
         try {
             await this.ensureConnection();
@@ -2175,6 +3610,235 @@ class AppiumMCPServer extends BaseMCPServer {
         }
     }
 
+    async handleScrollIntoView(args) {
+        try {
+            this.validateRequiredParams(args, ['strategy', 'selector']);
+            await this.ensureConnection();
+
+            const { strategy, selector, direction = 'down' } = args;
+            let method = this.currentPlatform === 'iOS' ? 'mobile_scroll' : 'ui_scrollable';
+            let maxSearchSwipes = args.maxSearchSwipes;
+            try {
+                if (this.currentPlatform === 'iOS') {
+                    // The element exists in the hierarchy while off screen; XCUITest scrolls its container
+                    const element = await this.findElementByStrategy(strategy, selector, 2000);
+                    this.markStateDirty();
+                    await this.driver.execute('mobile: scroll', { elementId: element.elementId, toVisible: true });
+                } else {
+                    const { pageSource, hash } = await this.getCachedPageSource();
+                    const plan = this.analyzePage(hash, `scroll:${strategy}:${selector}`, () => this.planScroll(pageSource, strategy, selector));
+                    method = plan.container && plan.target ? await this.scrollTargetIntoView(plan, strategy, selector) : null;
+                    if (!method) {
+                        method = 'ui_scrollable';
+                        maxSearchSwipes ??= plan.container
+                            ? Math.min(MAX_SEARCH_SWIPES, Math.max(MIN_SEARCH_SWIPES,
+                                Math.ceil(plan.container.children / Math.max(plan.container.visibleRows, 1))))
+                            : DEFAULT_SEARCH_SWIPES;
+                        this.markStateDirty();
+                        const element = await this.driver.$(
+                            `android=new UiScrollable(new UiSelector().scrollable(true)).setMaxSearchSwipes(${Math.round(maxSearchSwipes)})` +
+                            `.scrollIntoView(${this.toUiSelector(strategy, selector)})`,
+                        );
+                        await element.waitForExist({ timeout: 1000 });
+                    }
+                }
+            } catch (nativeError) {
+                // No scrollable container, an unsupported selector or the element was not reached
+                console.log(`🔄 Native scroll into view failed (${nativeError.message}), falling back to scroll_to_element`);
+                return await this.handleScrollToElement({ strategy, selector, direction });
+            }
+
+            return this.createSuccessResponse(`✅ Element scrolled into view: ${selector}`, {
+                found: true,
+                selector,
+                strategy,
+                method,
+                maxSearchSwipes: method === 'ui_scrollable' ? maxSearchSwipes : undefined,
+            });
+        } catch (error) {
+            return this.createErrorResponse('scroll_into_view', error);
+        }
+    }
+
+    /**
+     * Find the largest scrollable container in a page source, with its direct child count
+     * and how many of those children lie inside its bounds, and the bounds of the first
+     * element matching the locator if it is already in the hierarchy
+     * @param {string} pageSource - Page source XML from Appium
+     * @param {string} strategy - Locator strategy of the target
+     * @param {string} selector - Locator value of the target
+     * @returns {Object} { container: { bounds, children, visibleRows } | null, target: bounds | null }
+     */
+    planScroll(pageSource, strategy, selector) {
+        const targetAttribute = SCROLL_TARGET_ATTRIBUTES[strategy];
+        const targetRe = targetAttribute && new RegExp(`\\s${targetAttribute}="([^"]*)"`);
+        const stack = [];
+        let container = null;
+        let current = null;
+        let target = null;
+
+        for (const [, closing, , attributes, selfClosing] of pageSource.matchAll(XML_TAG_RE)) {
+            if (closing) {
+                if (stack.pop() === current) {
+                    current = null;
+                }
+                continue;
+            }
+
+            const bounds = this.parseElementBounds(attributes);
+            if (current && bounds && stack.length === current.depth + 1) {
+                current.children++;
+                if (bounds.y >= current.bounds.y && bounds.y + bounds.height <= current.bounds.y + current.bounds.height) {
+                    current.visibleRows++;
+                }
+            }
+            if (!target && targetRe && bounds) {
+                const value = targetRe.exec(attributes)?.[1];
+                if (value !== undefined && value.replace(XML_ENTITY_RE, (_, entity) => XML_ENTITIES[entity]) === selector) {
+                    target = bounds;
+                }
+            }
+
+            let entry = null;
+            if (!current && bounds && /\sscrollable="true"/.test(attributes)) {
+                entry = { bounds, depth: stack.length, children: 0, visibleRows: 0 };
+                current = entry;
+                if (!container || bounds.width * bounds.height > container.bounds.width * container.bounds.height) {
+                    container = entry;
+                }
+            }
+            if (!selfClosing) {
+                stack.push(entry);
+            }
+        }
+
+        return { container, target };
+    }
+
+    /**
+     * Bring a target that is already in the hierarchy into its container's viewport with one
+     * scrollGesture sized to the distance, instead of a search that swipes a page at a time
+     * @param {Object} plan - Result of planScroll with a container and a target
+     * @returns {Promise<string|null>} Method used, or null when the target is still not in view
+     */
+    async scrollTargetIntoView(plan, strategy, selector) {
+        const view = plan.container.bounds;
+        const isInView = (bounds) => bounds.y >= view.y && bounds.y + bounds.height <= view.y + view.height;
+        if (isInView(plan.target)) {
+            return 'already_visible';
+        }
+
+        const below = plan.target.y + plan.target.height > view.y + view.height;
+        const distance = below ? plan.target.y + plan.target.height - (view.y + view.height) : view.y - plan.target.y;
+        this.markStateDirty();
+        await this.driver.execute('mobile: scrollGesture', {
+            left: view.x,
+            top: view.y,
+            width: view.width,
+            height: view.height,
+            direction: below ? 'down' : 'up',
+            // A tenth of the viewport beyond the target, so it is not left on the edge
+            percent: Math.min(1, distance / view.height + 0.1),
+            speed: SCROLL_GESTURE_SPEED,
+        });
+
+        try {
+            const element = await this.findElementByStrategy(strategy, selector, 1000);
+            const [location, size] = await Promise.all([element.getLocation(), element.getSize()]);
+            return isInView({ y: location.y, height: size.height }) ? 'scroll_gesture' : null;
+        } catch {
+            return null;
+        }
+    }
+
+    /**
+     * Compile a simple XPath (//Type or //*, with @attribute="value" conditions joined by
+     * "and", or by "or" on iOS) into a native locator: android=new UiSelector()... on
+     * Android, -ios predicate string:... on iOS. Anything else (axes, indexes, functions)
+     * is returned unchanged. Results are cached per platform.
+     * @param {string} xpath - XPath locator
+     * @returns {string} WebdriverIO selector
+     */
+    compileXPath(xpath) {
+        const key = `${this.currentPlatform}|${xpath}`;
+        let compiled = this.compiledXPaths.get(key);
+        if (compiled === undefined) {
+            compiled = this.toNativeLocator(xpath) || xpath;
+            this.compiledXPaths.set(key, compiled);
+            if (this.compiledXPaths.size > XPATH_CACHE_SIZE) {
+                this.compiledXPaths.delete(this.compiledXPaths.keys().next().value);
+            }
+        }
+        return compiled;
+    }
+
+    toNativeLocator(xpath) {
+        const match = SIMPLE_XPATH_RE.exec(xpath.trim());
+        if (!match) {
+            return null;
+        }
+        const [, type, predicate = ''] = match;
+        const conditions = [];
+        const operators = new Set();
+        XPATH_CONDITION_RE.lastIndex = 0;
+        while (XPATH_CONDITION_RE.lastIndex < predicate.length) {
+            const condition = XPATH_CONDITION_RE.exec(predicate);
+            if (!condition) {
+                return null;
+            }
+            conditions.push([condition[1], condition[2] ?? condition[3]]);
+            if (condition[4]) {
+                operators.add(condition[4]);
+            }
+        }
+        if (operators.size > 1 || (operators.size === 1 && conditions.length < 2)) {
+            return null;
+        }
+        const operator = operators.has('or') ? 'or' : 'and';
+
+        if (this.currentPlatform === 'iOS') {
+            if (conditions.some(([attribute]) => !PREDICATE_ATTRIBUTES.has(attribute))) {
+                return null;
+            }
+            const clauses = conditions.map(([attribute, value]) => `${attribute} == ${JSON.stringify(value)}`);
+            let predicateString = clauses.join(operator === 'or' ? ' OR ' : ' AND ');
+            if (type !== '*') {
+                predicateString = [`type == ${JSON.stringify(type)}`, operator === 'or' ? `(${predicateString})` : predicateString]
+                    .filter((clause) => clause && clause !== '()').join(' AND ');
+            }
+            return predicateString ? `-ios predicate string:${predicateString}` : null;
+        }
+
+        if (operator === 'or' || conditions.some(([attribute]) => !UI_SELECTOR_METHODS[attribute])) {
+            return null;
+        }
+        const selectors = conditions.map(([attribute, value]) => `.${UI_SELECTOR_METHODS[attribute]}(${JSON.stringify(value)})`);
+        if (type !== '*') {
+            selectors.unshift(`.className(${JSON.stringify(type)})`);
+        }
+        return selectors.length > 0 ? `android=new UiSelector()${selectors.join('')}` : null;
+    }
+
+    /**
+     * Build a UiAutomator UiSelector expression for an element locator
+     * @param {string} strategy - id, text, contentDescription, accessibilityId or className
+     * @param {string} selector - Selector value
+     * @returns {string} e.g. new UiSelector().text("Submit")
+     */
+    toUiSelector(strategy, selector) {
+        const methods = {
+            id: 'resourceId',
+            text: 'text',
+            contentDescription: 'description',
+            accessibilityId: 'description',
+            className: 'className',
+        };
+        if (!methods[strategy]) {
+            throw new Error(`Strategy ${strategy} has no UiSelector equivalent`);
+        }
+        return `new UiSelector().${methods[strategy]}(${JSON.stringify(selector)})`;
+    }
+
     async detectScrollableContainer() {
         try {
             const pageSource = await this.driver.getPageSource();
@@ -2277,6 +3941,7 @@ class AppiumMCPServer extends BaseMCPServer {
     }
 
     async performOptimizedScroll(direction, scrollDistance, windowSize, scrollableArea) {
+        this.markStateDirty();
         const centerX = Math.floor(windowSize.width / 2);
         const centerY = Math.floor(windowSize.height / 2);
         
@@ -3092,23 +4757,25 @@ class AppiumMCPServer extends BaseMCPServer {
         try {
             await this.ensureConnection();
 
-            const { actionName = 'manual_capture', getContext = true } = args;
+            const { actionName = 'manual_capture', getContext = true, forceRefresh = false, include = ['compressed'] } = args;
 
-            // Capture current state
-            const capture = await this.captureCurrentState(actionName, args);
+            // Capture current state (served from the snapshot cache when the screen is unchanged)
+            const capture = await this.captureCurrentState(actionName, args, { forceRefresh });
             
             const result = {
                 capturePerformed: !!capture,
                 actionName,
             };
 
+            let pageSourceContent = null;
+            let screenshotBase64 = null;
             if (capture) {
-                // Read the actual page source content to include in response
-                let pageSourceContent = null;
-                let screenshotBase64 = null;
+                // Captures carry their content in memory; read from disk only as a fallback
+                pageSourceContent = capture.pageSource;
+                screenshotBase64 = capture.screenshotBase64;
                 
                 try {
-                    if (capture.pageSourcePath) {
+                    if (!pageSourceContent && capture.pageSourcePath) {
                         pageSourceContent = await fs.readFile(capture.pageSourcePath, 'utf8');
                     }
                 } catch (error) {
@@ -3116,13 +4783,14 @@ class AppiumMCPServer extends BaseMCPServer {
                 }
 
                 try {
-                    if (capture.screenshotPath) {
+                    if (!screenshotBase64 && capture.screenshotPath && include.includes('screenshot')) {
                         screenshotBase64 = await fs.readFile(capture.screenshotPath, 'base64');
                     }
                 } catch (error) {
                     console.warn('Could not read screenshot file:', error.message);
                 }
 
+                result.cached = capture.cached;
                 result.capture = {
                     id: capture.id,
                     timestamp: capture.timestamp,
@@ -3132,10 +4800,7 @@ class AppiumMCPServer extends BaseMCPServer {
                     windowInfo: capture.windowInfo,
                     appContext: capture.appContext,
                     captureTime: capture.captureTime,
-                    // Include actual content for immediate analysis
-                    pageSource: pageSourceContent,
-                    screenshotBase64: screenshotBase64 ? `data:image/png;base64,${screenshotBase64}` : null,
-                    elementCount: pageSourceContent ? (pageSourceContent.match(/<[^/][^>]*>/g) || []).length : 0
+                    elementCount: pageSourceContent ? countElements(pageSourceContent) : 0
                 };
             }
 
@@ -3144,18 +4809,131 @@ class AppiumMCPServer extends BaseMCPServer {
                 result.stateConfiguration = await this.getStateCaptureContext();
             }
 
-            return this.createSuccessResponse(
+            const response = this.createSuccessResponse(
                 capture ? 
-                    `State captured successfully: ${capture.id} (${result.capture.elementCount} elements found)` : 
+                    `State ${capture.cached ? 'reused from cache (screen unchanged)' : 'captured successfully'}: ${capture.id} (${result.capture.elementCount} elements found)` :
                     'State capture is disabled or failed',
                 result
             );
+
+            // Captured content goes in its own parts: XML as text, the screenshot as an
+            // image part rather than a base64 data URI inside the JSON text
+            if (pageSourceContent && include.includes('compressed')) {
+                response.content.push({ type: 'text', text: `📄 Screen:\n${this.compressPageSource(pageSourceContent, 'interactive').join('\n')}` });
+            }
+            if (pageSourceContent && include.includes('source')) {
+                response.content.push({ type: 'text', text: this.trimPageSource(pageSourceContent) });
+            }
+            if (screenshotBase64 && include.includes('screenshot')) {
+                response.content.push({ type: 'image', data: screenshotBase64, mimeType: 'image/png' });
+            }
+            return this.markSnapshot(response);
         } catch (error) {
             return this.createErrorResponse('capture_state', error);
         }
     }
 
     // AI-powered screenshot analysis methods
+    /**
+     * Locate a target from element bounds in the page source, with no screenshot and no
+     * WebDriver call per candidate. Matches visible elements whose text, content-desc,
+     * name, label or value equals or contains textToFind; without textToFind, matches
+     * dismissal controls (Close, Skip, OK, ×...) that the target description names.
+     * @param {string} pageSource - Page source XML from Appium
+     * @param {string} targetDescription - Description of what to find
+     * @param {Object} options - textToFind and region (relative 0.0-1.0) as for analyze_screenshot
+     * @param {Object} windowSize - Window width and height
+     * @returns {Object|null} Analysis with suggestions, best first, or null when nothing matched
+     */
+    locateFromBounds(pageSource, targetDescription, { textToFind, region } = {}, windowSize) {
+        const wanted = (textToFind || '').trim().toLowerCase();
+        const description = targetDescription.toLowerCase();
+        const mentions = (word) => new RegExp(`(?:^|[^\\w])${escapeRegExp(word)}(?:[^\\w]|$)`).test(description);
+        const wantsClose = mentions('close') || mentions('dismiss') || mentions('x');
+        const suggestions = [];
+
+        for (const match of pageSource.matchAll(ELEMENT_TAG_RE)) {
+            const [, type, attributes] = match;
+            if (/\svisible="false"/.test(attributes)) {
+                continue;
+            }
+
+            let best = null;
+            let confidence = 0;
+            for (const [, name, value] of attributes.matchAll(SCANNED_ATTRIBUTE_RE)) {
+                const label = value.trim().toLowerCase();
+                if (!TEXT_ATTRIBUTES.has(name) || !label) {
+                    continue;
+                }
+                let score = 0;
+                if (wanted) {
+                    score = label === wanted ? 0.95 : label.includes(wanted) ? 0.8 : 0;
+                } else if (CLOSE_SYMBOLS.has(label)) {
+                    score = wantsClose ? 0.9 : 0;
+                } else if (DISMISS_LABELS.has(label)) {
+                    score = mentions(label) ? 0.9 : 0;
+                }
+                if (score > confidence) {
+                    confidence = score;
+                    best = value.trim();
+                }
+            }
+            if (!best) {
+                continue;
+            }
+
+            const bounds = this.parseElementBounds(attributes);
+            if (!bounds || bounds.width <= 0 || bounds.height <= 0) {
+                continue;
+            }
+            const x = bounds.x + bounds.width / 2;
+            const y = bounds.y + bounds.height / 2;
+            const relativeX = x / windowSize.width;
+            const relativeY = y / windowSize.height;
+            if (region && (relativeX < region.x || relativeX > region.x + region.width ||
+                           relativeY < region.y || relativeY > region.y + region.height)) {
+                continue;
+            }
+
+            suggestions.push({
+                description: best,
+                coordinates: { x, y, absoluteX: x, absoluteY: y, relativeX, relativeY },
+                bounds,
+                confidence,
+                element: { type, label: best },
+                method: 'page_source_bounds',
+            });
+        }
+
+        if (suggestions.length === 0) {
+            return null;
+        }
+        suggestions.sort((a, b) => b.confidence - a.confidence);
+        return { windowSize, suggestions, confidence: suggestions[0].confidence, method: 'page_source_bounds' };
+    }
+
+    /**
+     * Read an element's bounds from its attributes: Android bounds="[x1,y1][x2,y2]"
+     * or iOS x, y, width and height
+     * @param {string} attributes - Attribute string of the element tag
+     * @returns {Object|null} { x, y, width, height }
+     */
+    parseElementBounds(attributes) {
+        const androidBounds = this.extractAttribute(attributes, 'bounds');
+        const match = androidBounds && ANDROID_BOUNDS_RE.exec(androidBounds);
+        if (match) {
+            const [x1, y1, x2, y2] = match.slice(1).map(Number);
+            return { x: x1, y: y1, width: x2 - x1, height: y2 - y1 };
+        }
+        // Whole attribute names only: extractAttribute would read index="..." as x
+        const [x, y, width, height] = ['x', 'y', 'width', 'height']
+            .map((name) => attributes.match(new RegExp(`\\s${name}="([^"]*)"`))?.[1] ?? null);
+        if ([x, y, width, height].some((value) => value === null)) {
+            return null;
+        }
+        return { x: Number(x), y: Number(y), width: Number(width), height: Number(height) };
+    }
+
     async analyzeScreenshotForElement(screenshotPath, targetDescription, options = {}) {
         try {
             // Read screenshot
@@ -3475,6 +5253,17 @@ class AppiumMCPServer extends BaseMCPServer {
 
     async handleSmartFindAndClick(args) {
         try {
+            // A table row brings its ranked locators: the best is the primary, the rest are tried before scrolling
+            let alternativeLocators = [];
+            if (args.element !== undefined) {
+                const locators = this.locatorTable[args.element];
+                if (!locators || locators.length === 0) {
+                    throw new Error(`No locators for element ${args.element}; call get_page_source_compressed with format "table" first`);
+                }
+                const [[strategy, selector], ...rest] = locators;
+                args = { ...args, strategy, selector };
+                alternativeLocators = rest;
+            }
             this.validateRequiredParams(args, ['strategy', 'selector']);
             await this.ensureConnection();
 
@@ -3541,6 +5330,30 @@ class AppiumMCPServer extends BaseMCPServer {
                         }
                     }
                     
+                    // Phase 1b: Lower-ranked locators of a table row, each with a short wait
+                    if (!elementFoundButClickFailed) {
+                        for (const [index, [altStrategy, altSelector]] of alternativeLocators.entries()) {
+                            try {
+                                const element = await this.findElementByStrategy(altStrategy, altSelector, Math.min(timeout, 2000));
+                                if (!(await element.isDisplayed())) {
+                                    continue;
+                                }
+                                await element.click();
+                                return this.createSuccessResponse(`✅ Element clicked using locator tier ${index + 2}: ${altStrategy}`, {
+                                    method: 'locator_table',
+                                    element: args.element,
+                                    tier: index + 2,
+                                    strategy: altStrategy,
+                                    selector: altSelector,
+                                    success: true,
+                                    scrollUsed: false
+                                });
+                            } catch (altError) {
+                                console.log(`🔄 Locator tier ${index + 2} (${altStrategy}) failed: ${altError.message}`);
+                            }
+                        }
+                    }
+
                     // Phase 2: Try scrolling to find element (only if element was not found or still failing)
                     if (enableScrolling && !elementFoundButClickFailed) {
                         console.log(`📜 Attempting to find element with scrolling...`);
@@ -3705,6 +5518,7 @@ class AppiumMCPServer extends BaseMCPServer {
     }
 
     async performCoordinateClick(x, y, duration = 100) {
+        this.markStateDirty();
         if (this.currentPlatform === 'iOS') {
             await this.driver.execute('mobile: tap', {
                 x: Math.round(x),
@@ -3729,26 +5543,33 @@ class AppiumMCPServer extends BaseMCPServer {
 
             const { targetDescription, textToFind, elementType = 'any', region } = args;
 
-            // Take screenshot for analysis
-            const screenshotPath = path.join(this.autoStateCapture.outputDir, `analysis_${Date.now()}.png`);
-            await fs.mkdir(path.dirname(screenshotPath), { recursive: true });
-            
-            const screenshot = await this.driver.takeScreenshot();
-            await fs.writeFile(screenshotPath, screenshot, 'base64');
+            // Common controls (labelled buttons, close/skip/OK) are located from the bounds in the
+            // page source; the screenshot is only taken when that finds nothing
+            const windowSize = await this.driver.getWindowSize();
+            const { pageSource } = await this.getCachedPageSource();
+            let analysis = this.locateFromBounds(pageSource, targetDescription, { textToFind, region }, windowSize);
+            let screenshotPath = null;
 
-            // Perform analysis
-            const analysis = await this.analyzeScreenshotForElement(
-                screenshotPath,
-                targetDescription,
-                { textToFind, elementType, region }
-            );
+            if (!analysis) {
+                screenshotPath = path.join(this.autoStateCapture.outputDir, `analysis_${Date.now()}.png`);
+                await fs.mkdir(path.dirname(screenshotPath), { recursive: true });
+
+                const screenshot = await this.driver.takeScreenshot();
+                await fs.writeFile(screenshotPath, screenshot, 'base64');
+
+                analysis = await this.analyzeScreenshotForElement(
+                    screenshotPath,
+                    targetDescription,
+                    { textToFind, elementType, region }
+                );
+            }
 
             if (!analysis) {
                 return this.createErrorResponse('analyze_screenshot', 
                     new Error('Screenshot analysis failed'));
             }
 
-            return this.createSuccessResponse(
+            return this.markSnapshot(this.createSuccessResponse(
                 `Screenshot analyzed, found ${analysis.suggestions.length} suggestions`,
                 {
                     targetDescription,
@@ -3760,12 +5581,56 @@ class AppiumMCPServer extends BaseMCPServer {
                     screenshotPath,
                     analysisMethod: analysis.method
                 }
-            );
+            ));
         } catch (error) {
             return this.createErrorResponse('analyze_screenshot', error);
         }
     }
 
+    async handleActAndDiff(args, context) {
+        try {
+            this.validateRequiredParams(args, ['tool']);
+            await this.ensureConnection();
+
+            const { tool, threshold = DHASH_CHANGE_THRESHOLD, includeImage = true } = args;
+            const handler = tool !== 'act_and_diff' && this.toolHandlers.get(tool);
+            if (!handler) {
+                throw new Error(`Unknown or unsupported tool: ${tool}`);
+            }
+
+            const before = await this.driver.takeScreenshot();
+            const result = await handler(args.args || {}, context);
+            if (result.isError) {
+                return result;
+            }
+            await this.driver.pause(OBSERVE_SETTLE_MS);
+            const after = await this.driver.takeScreenshot();
+
+            let distance = null;
+            try {
+                const beforeHash = differenceHash(Buffer.from(before, 'base64'));
+                const afterHash = differenceHash(Buffer.from(after, 'base64'));
+                distance = beforeHash.reduce((count, bit, index) => count + (bit !== afterHash[index] ? 1 : 0), 0);
+            } catch (error) {
+                console.warn('Failed to compare screenshots:', error.message);
+            }
+            // Without a distance the screenshot cannot be skipped safely
+            const changed = distance === null || distance >= threshold;
+
+            const actionText = result.content.map((item) => item.text).filter(Boolean).join('');
+            const response = this.createSuccessResponse(
+                `${actionText}\n🖼️ Screen ${changed ? 'changed' : 'unchanged'} after ${tool} (hash distance ${distance ?? 'unknown'} of 64, threshold ${threshold})`,
+                { tool, changed, distance, threshold },
+            );
+            if (changed && includeImage) {
+                response.content.push({ type: 'image', data: after, mimeType: 'image/png' });
+            }
+            return this.markSnapshot(response);
+        } catch (error) {
+            return this.createErrorResponse('act_and_diff', error);
+        }
+    }
+
     async handleTapCoordinates(args) {
         try {
             this.validateRequiredParams(args, ['x', 'y']);
@@ -3824,6 +5689,8 @@ class AppiumMCPServer extends BaseMCPServer {
 // Export the class for testing
 export { AppiumMCPServer };
 
-// Start the server
-const server = new AppiumMCPServer();
-server.run().catch(console.error);
+// Start the server if this file is run directly
+if (isMainModule(import.meta.url)) {
+    const server = new AppiumMCPServer();
+    server.run().catch(console.error);
+}
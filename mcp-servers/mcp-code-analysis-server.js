@@ -10,7 +10,7 @@
 import { promises as fs } from 'fs';
 import path from 'path';
 import { spawn } from 'child_process';
-import { BaseMCPServer } from './base-mcp-server.js';
+import { BaseMCPServer, isMainModule } from './base-mcp-server.js';
 
 class CodeAnalysisServer extends BaseMCPServer {
     constructor() {
@@ -29,6 +29,7 @@ class CodeAnalysisServer extends BaseMCPServer {
         this.addTool({
             name: 'get_errors',
             description: 'Get compilation and syntax errors from code files',
+            annotations: { readOnlyHint: true },
             inputSchema: {
                 type: 'object',
                 properties: {
@@ -45,6 +46,7 @@ class CodeAnalysisServer extends BaseMCPServer {
         this.addTool({
             name: 'list_code_usages',
             description: 'List all usages (references, definitions, implementations etc) of a function, class, method, variable etc',
+            annotations: { readOnlyHint: true },
             inputSchema: {
                 type: 'object',
                 properties: {
@@ -65,6 +67,7 @@ class CodeAnalysisServer extends BaseMCPServer {
         this.addTool({
             name: 'test_search',
             description: 'For a source code file, find the file that contains the tests. For a test file find the file that contains the code under test',
+            annotations: { readOnlyHint: true },
             inputSchema: {
                 type: 'object',
                 properties: {
@@ -760,6 +763,10 @@ class CodeAnalysisServer extends BaseMCPServer {
     }
 }
 
-// Start the server
-const server = new CodeAnalysisServer();
-server.run().catch(console.error);
+// Start the server if this file is run directly
+if (isMainModule(import.meta.url)) {
+    const server = new CodeAnalysisServer();
+    server.run().catch(console.error);
+}
+
+export default CodeAnalysisServer;
@@ -3,7 +3,7 @@
 import fs from 'fs/promises';
 import path from 'path';
 import { fileURLToPath } from 'url';
-import { BaseMCPServer, CommonSchemas, FileUtils } from './base-mcp-server.js';
+import { BaseMCPServer, CommonSchemas, FileUtils, isMainModule } from './base-mcp-server.js';
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
@@ -704,7 +704,7 @@ class CodeModificationMCPServer extends BaseMCPServer {
 }
 
 // Start the server if this file is run directly
-if (import.meta.url === `file://${process.argv[1]}`) {
+if (isMainModule(import.meta.url)) {
     const server = new CodeModificationMCPServer();
     server.start().catch(console.error);
 }
@@ -4,11 +4,102 @@ import fs from 'fs/promises';
 import path from 'path';
 import { fileURLToPath } from 'url';
 import { glob } from 'glob';
-import { BaseMCPServer, CommonSchemas, FileUtils } from './base-mcp-server.js';
+import { BaseMCPServer, CommonSchemas, FileUtils, isMainModule } from './base-mcp-server.js';
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
+/**
+ * Classifies one line of a Gherkin feature file: a section header (group 1 keyword,
+ * group 2 title), a step (group 3 keyword, group 4 text) or a tag line (group 5)
+ */
+const GHERKIN_LINE_RE = /^\s*(?:(Feature|Background|Scenario Outline|Scenario|Examples):\s*(.*)|(Given|When|Then|And|But)\s+(.*)|(@.*))$/;
+
+/** Files scenario_scan and semantic_search read at once */
+const FILE_READ_CONCURRENCY = 16;
+/** Files whose content semantic_search keeps between queries */
+const SEARCH_CACHE_MAX_FILES = 5000;
+
+function escapeRegExp(text) {
+    return text.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
+}
+
+/**
+ * Run task(item, index) for every item, with at most FILE_READ_CONCURRENCY running at once
+ * @param {Array} items - Items to process
+ * @param {Function} task - Async function of (item, index)
+ * @param {Function} done - Checked before each item; no new items are started once it returns true
+ * @returns {Promise<number>} Number of items started
+ */
+async function forEachConcurrently(items, task, done = () => false) {
+    let next = 0;
+    const worker = async () => {
+        while (next < items.length && !done()) {
+            const index = next++;
+            await task(items[index], index);
+        }
+    };
+    await Promise.all(Array.from({ length: Math.min(FILE_READ_CONCURRENCY, items.length) }, worker));
+    return next;
+}
+
+/**
+ * Pick the scenarios tagged with any of the wanted tags out of one feature file.
+ * Feature-level tags apply to every scenario in the file.
+ * @param {string} content - Feature file content
+ * @param {string} file - File path reported with each scenario
+ * @param {Set<string>} wantedSet - Tags without the leading @
+ * @returns {Object[]} Scenarios with their line, title, tags and steps
+ */
+function parseFeatureScenarios(content, file, wantedSet) {
+    const scenarios = [];
+    const lines = content.split('\n');
+    let featureTags = [];
+    let pendingTags = [];
+    let current = null;
+
+    for (let i = 0; i < lines.length; i++) {
+        const match = GHERKIN_LINE_RE.exec(lines[i].trimEnd());
+        if (!match) continue;
+
+        const [, section, title, stepKeyword, stepText, tagLine] = match;
+        if (tagLine) {
+            pendingTags.push(...(tagLine.match(/@[^\s#]+/g) || []));
+        } else if (section === 'Feature') {
+            featureTags = pendingTags;
+            pendingTags = [];
+            current = null;
+        } else if (section === 'Scenario' || section === 'Scenario Outline') {
+            const scenarioTags = [...featureTags, ...pendingTags];
+            const matchedTags = scenarioTags.map((tag) => tag.slice(1)).filter((tag) => wantedSet.has(tag));
+            pendingTags = [];
+            current = null;
+            if (matchedTags.length > 0) {
+                current = {
+                    file,
+                    line: i + 1,
+                    type: section,
+                    title: title.trim(),
+                    tags: scenarioTags,
+                    matchedTags: [...new Set(matchedTags)],
+                    steps: [],
+                };
+                scenarios.push(current);
+            }
+        } else if (section) {
+            // Background and Examples: tags above them are not scenario tags
+            pendingTags = [];
+            if (section === 'Background') {
+                current = null;
+            }
+        } else if (current) {
+            current.steps.push(`${stepKeyword} ${stepText.trim()}`);
+        }
+    }
+
+    return scenarios;
+}
+
 /**
  * File System MCP Server
  * Provides essential file system operations for test automation and code analysis
@@ -18,13 +109,14 @@ class FileSystemMCPServer extends BaseMCPServer {
         const serverInfo = {
             name: 'filesystem-mcp-server',
             version: '1.0.0',
-            description: 'File system operations for test automation - 8 essential tools',
+            description: 'File system operations for test automation - 9 essential tools',
         };
 
         const tools = [
             {
                 name: 'file_search',
                 description: 'Search for files using glob patterns (e.g., **/*.feature, **/*.js)',
+                annotations: { readOnlyHint: true },
                 inputSchema: {
                     type: 'object',
                     properties: {
@@ -48,6 +140,7 @@ class FileSystemMCPServer extends BaseMCPServer {
             {
                 name: 'read_file',
                 description: 'Read file contents with optional line range support',
+                annotations: { readOnlyHint: true },
                 inputSchema: {
                     type: 'object',
                     properties: {
@@ -72,6 +165,7 @@ class FileSystemMCPServer extends BaseMCPServer {
             {
                 name: 'list_dir',
                 description: 'List directory contents with filtering options',
+                annotations: { readOnlyHint: true },
                 inputSchema: {
                     type: 'object',
                     properties: {
@@ -100,6 +194,7 @@ class FileSystemMCPServer extends BaseMCPServer {
             {
                 name: 'grep_search',
                 description: 'Search for text patterns in files using regex',
+                annotations: { readOnlyHint: true },
                 inputSchema: {
                     type: 'object',
                     properties: {
@@ -163,6 +258,7 @@ class FileSystemMCPServer extends BaseMCPServer {
             {
                 name: 'semantic_search',
                 description: 'Search codebase using natural language queries with relevance scoring',
+                annotations: { readOnlyHint: true },
                 inputSchema: {
                     type: 'object',
                     properties: {
@@ -191,9 +287,43 @@ class FileSystemMCPServer extends BaseMCPServer {
                     required: ['query'],
                 },
             },
+            {
+                name: 'scenario_scan',
+                description: 'Find Gherkin scenarios by tag (e.g. @NTC-1234) and return their titles and steps; '
+                    + 'all tags are looked up in a single pass over the feature files',
+                annotations: { readOnlyHint: true },
+                inputSchema: {
+                    type: 'object',
+                    properties: {
+                        tags: {
+                            type: 'array',
+                            items: { type: 'string' },
+                            description: 'Tags to look up, with or without the leading @',
+                        },
+                        searchPath: {
+                            type: 'string',
+                            description: 'Directory containing the feature files',
+                            default: '.',
+                        },
+                        filePattern: {
+                            type: 'string',
+                            description: 'Glob pattern for feature files',
+                            default: '**/*.feature',
+                        },
+                        includeSteps: {
+                            type: 'boolean',
+                            description: 'Include the Given/When/Then steps of each scenario',
+                            default: true,
+                        },
+                        maxResults: CommonSchemas.maxResults,
+                    },
+                    required: ['tags'],
+                },
+            },
             {
                 name: 'get_changed_files',
                 description: 'Get list of changed files from Git repository',
+                annotations: { readOnlyHint: true },
                 inputSchema: {
                     type: 'object',
                     properties: {
@@ -251,6 +381,7 @@ class FileSystemMCPServer extends BaseMCPServer {
         ];
 
         super(serverInfo, tools);
+        this.searchDocuments = new Map(); // absolute path -> { mtimeMs, size, content, lowerContent, wordCount }
         this.setupFileSystemHandlers();
     }
 
@@ -261,6 +392,7 @@ class FileSystemMCPServer extends BaseMCPServer {
         this.registerTool('grep_search', this.handleGrepSearch.bind(this));
         this.registerTool('create_file', this.handleCreateFile.bind(this));
         this.registerTool('semantic_search', this.handleSemanticSearch.bind(this));
+        this.registerTool('scenario_scan', this.handleScenarioScan.bind(this));
         this.registerTool('get_changed_files', this.handleGetChangedFiles.bind(this));
         this.registerTool('fetch_webpage', this.handleFetchWebpage.bind(this));
     }
@@ -540,6 +672,102 @@ class FileSystemMCPServer extends BaseMCPServer {
         }
     }
 
+    async handleScenarioScan(args) {
+        try {
+            this.validateRequiredParams(args, ['tags']);
+
+            const {
+                tags,
+                searchPath = '.',
+                filePattern = '**/*.feature',
+                includeSteps = true,
+                maxResults = 100,
+            } = args;
+
+            const wanted = [...new Set(tags.map((tag) => String(tag).trim().replace(/^@/, '')).filter(Boolean))];
+            if (wanted.length === 0) {
+                throw new Error('No tags given');
+            }
+
+            this.logInfo(`Scanning ${filePattern} in ${searchPath} for ${wanted.length} tag(s)`);
+
+            const { scenarios, filesScanned } = await this.scanScenarios(wanted, searchPath, filePattern, maxResults);
+            const found = new Set(scenarios.flatMap((scenario) => scenario.matchedTags));
+            const missingTags = wanted.filter((tag) => !found.has(tag));
+
+            this.logSuccess(`Found ${scenarios.length} scenarios in ${filesScanned} files`);
+
+            const sections = wanted.map((tag) => {
+                const matches = scenarios.filter((scenario) => scenario.matchedTags.includes(tag));
+                if (matches.length === 0) {
+                    return `@${tag}: not found`;
+                }
+                return matches.map((scenario) => {
+                    const header = `@${tag}: ${scenario.type}: ${scenario.title}\n   📄 ${scenario.file}:${scenario.line}`;
+                    const steps = includeSteps ? scenario.steps.map((step) => `\n   ${step}`).join('') : '';
+                    return header + steps;
+                }).join('\n\n');
+            }).join('\n\n');
+
+            if (!includeSteps) {
+                scenarios.forEach((scenario) => delete scenario.steps);
+            }
+
+            return this.createSuccessResponse(
+                `🧪 SCENARIO DISCOVERY RESULTS (${scenarios.length} scenarios, ${filesScanned} files scanned)\n\n${sections}`,
+                {
+                    tags: wanted,
+                    searchPath,
+                    filesScanned,
+                    totalScenarios: scenarios.length,
+                    missingTags,
+                    scenarios,
+                },
+            );
+        } catch (error) {
+            this.logError('Scenario scan failed', error);
+            return this.createErrorResponse('scenario_scan', error);
+        }
+    }
+
+    /**
+     * Collect the scenarios tagged with any of the wanted tags.
+     * All tags are compiled into one regex that is run over each file's whole
+     * content first, so files without a match are skipped after a single pass.
+     * Files are read and parsed by FILE_READ_CONCURRENCY workers at once;
+     * results keep the glob order of the files.
+     * @param {string[]} wanted - Tags without the leading @
+     */
+    async scanScenarios(wanted, searchPath, filePattern, maxResults) {
+        const wantedSet = new Set(wanted);
+        const tagRe = new RegExp(`@(?:${wanted.map(escapeRegExp).join('|')})(?![\\w-])`);
+
+        const files = await glob(filePattern, {
+            cwd: searchPath,
+            absolute: true,
+            nodir: true,
+        });
+
+        const perFile = new Array(files.length);
+        let found = 0;
+        const filesScanned = await forEachConcurrently(files, async (file, index) => {
+            let content;
+            try {
+                content = await fs.readFile(file, 'utf8');
+            } catch (err) {
+                // Skip files that can't be read
+                return;
+            }
+            if (tagRe.test(content)) {
+                perFile[index] = parseFeatureScenarios(content, path.relative(process.cwd(), file), wantedSet);
+                found += perFile[index].length;
+            }
+        }, () => found >= maxResults);
+
+        const scenarios = perFile.flatMap((fileScenarios) => fileScenarios || []).slice(0, maxResults);
+        return { scenarios, filesScanned };
+    }
+
     async handleSemanticSearch(args) {
         try {
             this.validateRequiredParams(args, ['query']);
@@ -576,28 +804,26 @@ class FileSystemMCPServer extends BaseMCPServer {
 
     async performSemanticSearch(query, searchPath, fileTypes, maxResults, minScore) {
         const results = [];
-        const queryTerms = query.toLowerCase().split(/\s+/);
+        const queryTerms = query.toLowerCase().split(/\s+/).filter(Boolean);
+        // Terms are matched literally; each regex is compiled once per query, not per file
+        const termPatterns = queryTerms.map((term) => new RegExp(escapeRegExp(term), 'g'));
 
         // Build file pattern from file types
         const patterns = fileTypes.map((ext) => `**/*${ext}`);
-        const allFiles = [];
-
-        for (const pattern of patterns) {
-            const files = await glob(pattern, {
-                cwd: searchPath,
-                absolute: true,
-                nodir: true,
-            });
-            allFiles.push(...files);
-        }
+        const globbed = await Promise.all(patterns.map((pattern) => glob(pattern, {
+            cwd: searchPath,
+            absolute: true,
+            nodir: true,
+        })));
+        const allFiles = [...new Set(globbed.flat())];
 
-        for (const file of allFiles) {
+        await forEachConcurrently(allFiles, async (file) => {
             try {
-                const content = await fs.readFile(file, 'utf8');
-                const score = this.calculateRelevanceScore(content, queryTerms);
+                const document = await this.loadSearchDocument(file);
+                const score = this.calculateRelevanceScore(document, queryTerms, termPatterns, path.basename(file));
 
                 if (score >= minScore) {
-                    const snippet = this.extractRelevantSnippet(content, queryTerms);
+                    const snippet = this.extractRelevantSnippet(document.content, queryTerms);
                     results.push({
                         file: path.relative(process.cwd(), file),
                         score,
@@ -607,26 +833,55 @@ class FileSystemMCPServer extends BaseMCPServer {
                 }
             } catch (err) {
                 // Skip files that can't be read
-                continue;
             }
-        }
+        });
 
         // Sort by relevance score and limit results
         return results
-            .sort((a, b) => b.score - a.score)
+            .sort((a, b) => b.score - a.score || a.path.localeCompare(b.path))
             .slice(0, maxResults);
     }
 
-    calculateRelevanceScore(content, queryTerms) {
+    /**
+     * Read a file for semantic_search, reusing the content and word count from an earlier
+     * query while the file's mtime and size are unchanged. At most SEARCH_CACHE_MAX_FILES
+     * files are kept; the least recently used is dropped first.
+     * @param {string} file - Absolute file path
+     * @returns {Promise<Object>} { content, lowerContent, wordCount }
+     */
+    async loadSearchDocument(file) {
+        const stats = await fs.stat(file);
+        const cached = this.searchDocuments.get(file);
+        this.searchDocuments.delete(file);
+        if (cached && cached.mtimeMs === stats.mtimeMs && cached.size === stats.size) {
+            this.searchDocuments.set(file, cached);
+            return cached;
+        }
+
+        const content = await fs.readFile(file, 'utf8');
         const lowerContent = content.toLowerCase();
-        const words = lowerContent.split(/\s+/);
-        const wordCount = words.length;
+        const document = {
+            mtimeMs: stats.mtimeMs,
+            size: stats.size,
+            content,
+            lowerContent,
+            wordCount: lowerContent.split(/\s+/).length,
+        };
+        this.searchDocuments.set(file, document);
+        if (this.searchDocuments.size > SEARCH_CACHE_MAX_FILES) {
+            this.searchDocuments.delete(this.searchDocuments.keys().next().value);
+        }
+        return document;
+    }
+
+    calculateRelevanceScore(document, queryTerms, termPatterns, fileName) {
+        const { lowerContent, wordCount } = document;
 
         let score = 0;
         let termMatches = 0;
 
-        for (const term of queryTerms) {
-            const matches = (lowerContent.match(new RegExp(term, 'g')) || []).length;
+        for (const pattern of termPatterns) {
+            const matches = (lowerContent.match(pattern) || []).length;
             if (matches > 0) {
                 termMatches++;
                 score += (matches / wordCount) * 10; // Weight by frequency
@@ -637,9 +892,9 @@ class FileSystemMCPServer extends BaseMCPServer {
         score += (termMatches / queryTerms.length) * 5;
 
         // Bonus for matches in filenames
-        const fileName = path.basename(content).toLowerCase();
+        const lowerFileName = fileName.toLowerCase();
         for (const term of queryTerms) {
-            if (fileName.includes(term)) {
+            if (lowerFileName.includes(term)) {
                 score += 2;
             }
         }
@@ -828,7 +1083,7 @@ class FileSystemMCPServer extends BaseMCPServer {
 }
 
 // Start the server if this file is run directly
-if (import.meta.url === `file://${process.argv[1]}`) {
+if (isMainModule(import.meta.url)) {
     const server = new FileSystemMCPServer();
     server.start().catch(console.error);
 }
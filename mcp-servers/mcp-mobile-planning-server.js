@@ -5,7 +5,7 @@
  * Provides tools for converting testing instructions into executable action plans
  */
 
-import { BaseMCPServer } from './base-mcp-server.js';
+import { BaseMCPServer, isMainModule } from './base-mcp-server.js';
 
 class MobileAutomationPlanningServer extends BaseMCPServer {
     constructor() {
@@ -637,6 +637,10 @@ class MobileAutomationPlanningServer extends BaseMCPServer {
     }
 }
 
-// Start the server
-const server = new MobileAutomationPlanningServer();
-server.start().catch(console.error);
+// Start the server if this file is run directly
+if (isMainModule(import.meta.url)) {
+    const server = new MobileAutomationPlanningServer();
+    server.start().catch(console.error);
+}
+
+export default MobileAutomationPlanningServer;
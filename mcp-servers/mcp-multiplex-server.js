@@ -0,0 +1,131 @@
+#!/usr/bin/env node
+
+/**
+ * MCP Multiplex Server
+ * Hosts several MCP servers in a single Node process behind one stdio endpoint,
+ * so agents share one process instead of spawning one Node runtime per server.
+ *
+ * Usage: node mcp-multiplex-server.js appium planning test advanced [--listen /tmp/mcp-agent.sock]
+ * Tools are exposed as `<namespace>__<tool>` (e.g. appium__get_page_source).
+ *
+ * A namespace's module is imported and its server created on first use (a tools/list
+ * request or a call to one of its tools), so an agent whose tool schemas are cached
+ * and that only runs tests never loads the Appium client.
+ */
+
+import { ListToolsRequestSchema } from '@modelcontextprotocol/sdk/types.js';
+import { existsSync } from 'fs';
+import { BaseMCPServer, getListenPath, isMainModule } from './base-mcp-server.js';
+
+export const NAMESPACE_SEPARATOR = '__';
+
+/**
+ * Module of each namespace's server class and the name it is exported under,
+ * resolved to absolute URLs once at load so every mount imports the same specifier
+ */
+export const SERVER_NAMESPACES = Object.freeze(Object.fromEntries(Object.entries({
+    appium: ['./mcp-appium-server-new.js', 'AppiumMCPServer'],
+    planning: ['./mcp-mobile-planning-server.js', 'default'],
+    analysis: ['./mcp-code-analysis-server.js', 'default'],
+    modification: ['./mcp-code-modification-server.js', 'default'],
+    filesystem: ['./mcp-filesystem-server.js', 'default'],
+    test: ['./mcp-test-execution-server.js', 'default'],
+    advanced: ['./mcp-advanced-server.js', 'default'],
+}).map(([namespace, [modulePath, exportName]]) => [
+    namespace,
+    Object.freeze({ url: new URL(modulePath, import.meta.url), exportName }),
+])));
+
+class MultiplexMCPServer extends BaseMCPServer {
+    constructor(namespaces = Object.keys(SERVER_NAMESPACES)) {
+        super({
+            name: 'mcp-multiplex-server',
+            version: '1.0.0',
+            description: `Multiplexed MCP servers: ${namespaces.join(', ')}`,
+        });
+
+        for (const namespace of namespaces) {
+            if (!SERVER_NAMESPACES[namespace]) {
+                throw new Error(`Unknown server namespace: ${namespace} (available: ${Object.keys(SERVER_NAMESPACES).join(', ')})`);
+            }
+            // Modules load lazily; a missing file should still fail at startup, not on the first tool call
+            if (!existsSync(SERVER_NAMESPACES[namespace].url)) {
+                throw new Error(`MCP server module not found for ${namespace}: ${SERVER_NAMESPACES[namespace].url.pathname}`);
+            }
+        }
+        this.namespaces = namespaces;
+        this.servers = new Map();
+        this.namespaceTools = new Map();
+        this.mounting = new Map();
+    }
+
+    setupBaseHandlers() {
+        super.setupBaseHandlers();
+
+        // Listing needs every namespace; tools keep the namespace order whatever mounted first
+        this.server.setRequestHandler(ListToolsRequestSchema, async () => {
+            await Promise.all(this.namespaces.map((namespace) => this.mountServer(namespace)));
+            return { tools: this.namespaces.flatMap((namespace) => this.namespaceTools.get(namespace)) };
+        });
+    }
+
+    async getToolHandler(toolName) {
+        const namespace = toolName.split(NAMESPACE_SEPARATOR, 1)[0];
+        if (this.namespaces.includes(namespace)) {
+            await this.mountServer(namespace);
+        }
+        return super.getToolHandler(toolName);
+    }
+
+    /**
+     * Load a namespace's server once; concurrent callers share the same promise
+     * @param {string} namespace - Key in SERVER_NAMESPACES
+     */
+    mountServer(namespace) {
+        if (!this.mounting.has(namespace)) {
+            const mounted = this.loadServer(namespace).catch((error) => {
+                this.mounting.delete(namespace); // Let a later request try again
+                throw error;
+            });
+            this.mounting.set(namespace, mounted);
+        }
+        return this.mounting.get(namespace);
+    }
+
+    /**
+     * Instantiate a server and expose its tools under a namespace prefix
+     * @param {string} namespace - Key in SERVER_NAMESPACES
+     */
+    async loadServer(namespace) {
+        const { url, exportName } = SERVER_NAMESPACES[namespace];
+        const ServerClass = (await import(url.href))[exportName];
+        const server = new ServerClass();
+        this.servers.set(namespace, server);
+
+        const tools = [];
+        for (const tool of server.tools) {
+            const toolName = `${namespace}${NAMESPACE_SEPARATOR}${tool.name}`;
+            tools.push({ ...tool, name: toolName });
+            this.registerTool(toolName, (args, context) => {
+                const handler = server.toolHandlers.get(tool.name);
+                if (!handler) {
+                    throw new Error(`Tool ${tool.name} has no handler in ${namespace}`);
+                }
+                return handler(args, context);
+            });
+        }
+        this.tools.push(...tools);
+        this.namespaceTools.set(namespace, tools);
+        this.logInfo(`Mounted ${namespace} (${tools.length} tools)`);
+    }
+}
+
+// Start the server if this file is run directly
+if (isMainModule(import.meta.url)) {
+    const socketPath = getListenPath();
+    const namespaces = process.argv.slice(2).filter((arg) => arg !== '--listen' && arg !== socketPath);
+    const server = new MultiplexMCPServer(namespaces.length > 0 ? namespaces : undefined);
+    server.run().catch(console.error);
+}
+
+export default MultiplexMCPServer;
@@ -0,0 +1,29 @@
+#!/usr/bin/env node
+
+/**
+ * MCP Socket Bridge
+ * Connects a stdio MCP client to a server listening on a Unix domain socket
+ * (started with `--listen <path>`), so agents that only speak stdio can attach
+ * to a long-running server instead of spawning a fresh one.
+ *
+ * Usage: node mcp-socket-bridge.js /tmp/mcp-agent.sock
+ */
+
+import net from 'net';
+
+const socketPath = process.argv[2];
+if (!socketPath) {
+    console.error('Usage: node mcp-socket-bridge.js <socket-path>');
+    process.exit(1);
+}
+
+const socket = net.connect(socketPath);
+socket.on('error', (error) => {
+    console.error(`❌ [mcp-socket-bridge] ${socketPath}: ${error.message}`);
+    process.exit(1);
+});
+socket.on('close', () => process.exit(0));
+process.stdin.on('end', () => socket.end());
+
+process.stdin.pipe(socket);
+socket.pipe(process.stdout);
@@ -10,7 +10,7 @@
 import { spawn } from 'child_process';
 import { promises as fs } from 'fs';
 import path from 'path';
-import { BaseMCPServer } from './base-mcp-server.js';
+import { BaseMCPServer, isMainModule } from './base-mcp-server.js';
 
 class TestExecutionServer extends BaseMCPServer {
     constructor() {
@@ -48,6 +48,11 @@ class TestExecutionServer extends BaseMCPServer {
                         description: 'Test timeout in milliseconds',
                         default: 30000,
                     },
+                    background: {
+                        type: 'boolean',
+                        description: 'Start the run and return its session ID at once; collect the results later with get_terminal_output',
+                        default: false,
+                    },
                 },
                 required: ['testFile'],
             },
@@ -107,6 +112,11 @@ class TestExecutionServer extends BaseMCPServer {
                         type: 'string',
                         description: 'The ID of the terminal command output to check',
                     },
+                    waitMs: {
+                        type: 'number',
+                        description: 'Wait up to this many milliseconds for the process to finish before returning',
+                        default: 0,
+                    },
                 },
                 required: ['id'],
             },
@@ -143,11 +153,11 @@ class TestExecutionServer extends BaseMCPServer {
         this.registerTool('test_failure', this.testFailure.bind(this));
     }
 
-    async runTestCase(args) {
+    async runTestCase(args, { progress } = {}) {
         try {
             this.validateRequiredParams(args, ['testFile']);
 
-            const { testFile, testPattern, timeout = 30000 } = args;
+            const { testFile, testPattern, timeout = 30000, background = false } = args;
 
             // Determine test command based on file extension and project type
             let command;
@@ -171,7 +181,33 @@ class TestExecutionServer extends BaseMCPServer {
                 throw new Error(`Unsupported test file type: ${testFile}`);
             }
 
-            const result = await this.executeCommand(command, commandArgs, { timeout });
+            if (background) {
+                const sessionId = `bg_${++this.sessionCounter}`;
+                const child = this.startBackgroundProcess(command, commandArgs, process.cwd());
+                this.terminalSessions.set(sessionId, {
+                    process: child,
+                    command: `${command} ${commandArgs.join(' ')}`,
+                    startTime: Date.now(),
+                    isBackground: true,
+                    workingDirectory: process.cwd(),
+                });
+
+                return this.createSuccessResponse(
+                    `Test run started in the background for ${testFile}`,
+                    {
+                        sessionId,
+                        testFile,
+                        command: `${command} ${commandArgs.join(' ')}`,
+                        isBackground: true,
+                        pid: child.pid,
+                    },
+                );
+            }
+
+            const result = await this.executeCommand(command, commandArgs, {
+                timeout,
+                onOutput: progress?.report,
+            });
 
             return this.createSuccessResponse(
                 `Test execution completed for ${testFile}`,
@@ -241,7 +277,7 @@ class TestExecutionServer extends BaseMCPServer {
         }
     }
 
-    async runInTerminal(args) {
+    async runInTerminal(args, { progress } = {}) {
         try {
             this.validateRequiredParams(args, ['command']);
 
@@ -258,7 +294,7 @@ class TestExecutionServer extends BaseMCPServer {
             if (isBackground) {
                 // Start background process
                 const sessionId = `bg_${++this.sessionCounter}`;
-                const process = this.startBackgroundProcess(command, workingDirectory, sessionId);
+                const process = this.startBackgroundProcess('sh', ['-c', command], workingDirectory);
 
                 this.terminalSessions.set(sessionId, {
                     process,
@@ -282,6 +318,7 @@ class TestExecutionServer extends BaseMCPServer {
             const result = await this.executeCommand('sh', ['-c', command], {
                 timeout,
                 cwd: workingDirectory,
+                onOutput: progress?.report,
             });
 
             return this.createSuccessResponse(
@@ -303,7 +340,7 @@ class TestExecutionServer extends BaseMCPServer {
         try {
             this.validateRequiredParams(args, ['id']);
 
-            const { id } = args;
+            const { id, waitMs = 0 } = args;
             const session = this.terminalSessions.get(id);
 
             if (!session) {
@@ -311,6 +348,17 @@ class TestExecutionServer extends BaseMCPServer {
             }
 
             if (session.isBackground) {
+                if (waitMs > 0) {
+                    let timer;
+                    await Promise.race([
+                        session.process.exited,
+                        new Promise((resolve) => {
+                            timer = setTimeout(resolve, waitMs);
+                        }),
+                    ]);
+                    clearTimeout(timer);
+                }
+
                 // Get current output from background process
                 const output = await this.getBackgroundProcessOutput(session);
 
@@ -319,7 +367,8 @@ class TestExecutionServer extends BaseMCPServer {
                     {
                         sessionId: id,
                         command: session.command,
-                        isRunning: !session.process.killed,
+                        isRunning: session.process.exitCode === null && session.process.signalCode === null,
+                        exitCode: session.process.exitCode,
                         startTime: session.startTime,
                         output,
                         pid: session.process.pid,
@@ -372,7 +421,7 @@ class TestExecutionServer extends BaseMCPServer {
 
     async executeCommand(command, args, options = {}) {
         return new Promise((resolve, reject) => {
-            const { timeout = 30000, cwd = process.cwd() } = options;
+            const { timeout = 30000, cwd = process.cwd(), onOutput } = options;
 
             const startTime = Date.now();
             const child = spawn(command, args, {
@@ -384,11 +433,15 @@ class TestExecutionServer extends BaseMCPServer {
             let stderr = '';
 
             child.stdout.on('data', (data) => {
-                stdout += data.toString();
+                const chunk = data.toString();
+                stdout += chunk;
+                onOutput?.(chunk);
             });
 
             child.stderr.on('data', (data) => {
-                stderr += data.toString();
+                const chunk = data.toString();
+                stderr += chunk;
+                onOutput?.(chunk);
             });
 
             const timeoutId = setTimeout(() => {
@@ -415,26 +468,27 @@ class TestExecutionServer extends BaseMCPServer {
         });
     }
 
-    startBackgroundProcess(command, workingDirectory, sessionId) {
-        const child = spawn('sh', ['-c', command], {
+    startBackgroundProcess(command, args, workingDirectory) {
+        const child = spawn(command, args, {
             cwd: workingDirectory,
             stdio: 'pipe',
             detached: true,
         });
 
-        let output = '';
-
-        child.stdout.on('data', (data) => {
-            output += data.toString();
-        });
-
-        child.stderr.on('data', (data) => {
-            output += data.toString();
+        // Output accumulates on the child so get_terminal_output sees what arrived so far
+        child._output = '';
+        const append = (data) => {
+            child._output += data.toString();
+        };
+        child.stdout.on('data', append);
+        child.stderr.on('data', append);
+
+        // Settles when the process ends, for callers that wait on the result
+        child.exited = new Promise((resolve) => {
+            child.on('close', resolve);
+            child.on('error', resolve);
         });
 
-        // Store output reference
-        child._output = output;
-
         return child;
     }
 
@@ -587,6 +641,10 @@ class TestExecutionServer extends BaseMCPServer {
     }
 }
 
-// Start the server
-const server = new TestExecutionServer();
-server.run().catch(console.error);
+// Start the server if this file is run directly
+if (isMainModule(import.meta.url)) {
+    const server = new TestExecutionServer();
+    server.run().catch(console.error);
+}
+
+export default TestExecutionServer;
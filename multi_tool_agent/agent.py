@@ -1,52 +1,1367 @@
 # Multi-Agent System Implementation for Comprehensive Automation
+import asyncio
+import difflib
+import hashlib
+import inspect
+import logging
 import os
-from google.adk.agents import LlmAgent, SequentialAgent, ParallelAgent
+import re
+import shutil
+import sys
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
+
+import anyio
+import httpx
+import orjson
+from google.genai import Client, types
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.agents.context_cache_config import ContextCacheConfig
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.apps import App
+from google.adk.models import Gemini, LlmResponse
+from google.adk.runners import InMemoryRunner
+from google.adk.tools.mcp_tool.mcp_session_manager import MCPSessionManager
+from google.adk.tools.mcp_tool import mcp_tool
+from google.adk.tools.mcp_tool.mcp_tool import MCPTool
 from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StdioServerParameters
 from google.adk.tools import agent_tool
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+from google.adk.tools.tool_context import ToolContext
+from mcp.client.stdio import get_default_environment
+from mcp.shared.message import SessionMessage
+from mcp.types import JSONRPCMessage, Tool as McpTool
+from pydantic import TypeAdapter
 
 # Path configurations
-TARGET_FOLDER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp-servers")
-NODE_PATH = "/Users/sariputray/.nvm/versions/node/v18.20.8/bin/node"
+_BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGET_FOLDER_PATH = os.path.realpath(f"{_BASE_PATH}/mcp-servers")
+# Server scripts resolved once at import (a missing script fails here, not at first tool call)
+# and interned, so every toolset and pool replica passes the same argv strings
+MCP_SERVER_SCRIPTS = {
+    name: sys.intern(os.path.join(TARGET_FOLDER_PATH, f'mcp-{name}.js'))
+    for name in ('code-analysis-server', 'code-modification-server', 'filesystem-server',
+                 'multiplex-server')
+}
+for _script in MCP_SERVER_SCRIPTS.values():
+    if not os.path.isfile(_script):
+        raise FileNotFoundError(f"MCP server script not found: {_script}")
+# Resolved once at import; MCP_NODE_PATH overrides PATH lookup (NODE_PATH is Node's module search path)
+NODE_PATH = os.environ.get('MCP_NODE_PATH') or shutil.which('node') or '/usr/local/bin/node'
+if not os.path.isfile(NODE_PATH):
+    raise FileNotFoundError(
+        f"Node.js executable not found at {NODE_PATH}; install Node.js or set MCP_NODE_PATH"
+    )
+
+# Network resilience configuration
+NETWORK_CONFIG = {
+    'timeout': 600,  # Increased timeout for mobile operations
+    'max_retries': 3,
+    'max_keepalive_connections': 32,
+    'max_connections': 64,
+}
+
+
+# Requests sent by the shared Gemini client and TCP connections it had to open for them;
+# with the keep-alive HTTP/2 pool, connections stay at a handful however many agents run
+GEMINI_CONNECTION_STATS = Counter()
+
+
+async def _count_connection_event(event_name, info):
+    if event_name == 'connection.connect_tcp.complete':
+        GEMINI_CONNECTION_STATS['connections'] += 1
+
+
+async def _trace_gemini_request(request):
+    GEMINI_CONNECTION_STATS['requests'] += 1
+    request.extensions['trace'] = _count_connection_event
+
+
+# Prompt tokens billed per model call and how many of them the implicit prefix cache served;
+# a low cached share means the instruction prefixes drifted between calls
+GEMINI_PROMPT_STATS = Counter()
+
+
+class PooledGemini(Gemini):
+    """Gemini model whose genai client sends every request over one keep-alive HTTP/2 pool"""
+
+    @cached_property
+    def api_client(self) -> Client:
+        # A custom transport also makes google-genai use httpx instead of aiohttp
+        transport = httpx.AsyncHTTPTransport(
+            http2=True,
+            retries=NETWORK_CONFIG['max_retries'],
+            limits=httpx.Limits(
+                max_keepalive_connections=NETWORK_CONFIG['max_keepalive_connections'],
+                max_connections=NETWORK_CONFIG['max_connections'],
+            ),
+        )
+        return Client(http_options=types.HttpOptions(
+            timeout=NETWORK_CONFIG['timeout'] * 1000,
+            async_client_args={'transport': transport, 'event_hooks': {'request': [_trace_gemini_request]}},
+        ))
+
+    async def warm_up(self):
+        """Open the pooled connection (TLS and HTTP/2 handshake) before the first generate call needs it"""
+        try:
+            await self.api_client.aio.models.get(model=self.model)
+        except Exception as error:  # The first real request will simply connect itself
+            logger.warning('Gemini connection warm-up failed: %s', error)
+
+    async def generate_content_async(self, llm_request, stream=False):
+        async for llm_response in super().generate_content_async(llm_request, stream):
+            usage = llm_response.usage_metadata
+            if usage and not llm_response.partial:
+                GEMINI_PROMPT_STATS['prompt'] += usage.prompt_token_count or 0
+                GEMINI_PROMPT_STATS['cached'] += usage.cached_content_token_count or 0
+            yield llm_response
+
+
+# Model configuration
+GEMINI_MODEL_NAME = 'gemini-2.5-flash-preview-05-20'
+# One model instance for every agent: its genai client is created once and cached,
+# so concurrent specialists (e.g. parallel analysis) share a single connection pool
+SHARED_GEMINI_MODEL = PooledGemini(model=GEMINI_MODEL_NAME)
+
+# A forked worker must not reuse the parent's sockets; drop the cached client so it connects itself
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=lambda: SHARED_GEMINI_MODEL.__dict__.pop('api_client', None))
+
+
+class FallbackGemini(PooledGemini):
+    """Gemini model that answers with a cheaper model and retries a turn on fallback_model when it falters
+
+    A turn is escalated when the cheap model errors, calls a tool the agent does not have,
+    or asks for it by replying with ESCALATE_MARKER. Partial streamed chunks are not stored
+    in the session, so only the final response of the cheap attempt is discarded.
+    """
+
+    fallback_model: str
+
+    @property
+    def api_client(self) -> Client:
+        # Reuse the shared connection pool instead of opening one per model tier
+        return SHARED_GEMINI_MODEL.api_client
+
+    async def generate_content_async(self, llm_request, stream=False):
+        instruction = llm_request.config.system_instruction
+        if isinstance(instruction, str):
+            llm_request.config.system_instruction = instruction + _ESCALATE_HINT
+        async for llm_response in super().generate_content_async(llm_request, stream):
+            if not llm_response.partial and self._needs_escalation(llm_request, llm_response):
+                logger.info('Escalating %s turn from %s to %s', llm_request.model, self.model, self.fallback_model)
+                break
+            yield llm_response
+        else:
+            return
+        llm_request.config.system_instruction = instruction
+        llm_request.model = self.fallback_model
+        async for llm_response in super().generate_content_async(llm_request, stream):
+            yield llm_response
+
+    @staticmethod
+    def _needs_escalation(llm_request, llm_response):
+        if llm_response.error_code:
+            return True
+        parts = llm_response.content.parts if llm_response.content else None
+        for part in parts or ():
+            if part.function_call and part.function_call.name not in llm_request.tools_dict:
+                return True
+            if part.text and part.text.strip() == ESCALATE_MARKER:
+                return True
+        return False
+
+
+ESCALATE_MARKER = 'NEED_REASONING'
+_ESCALATE_HINT = (
+    f'\n\nIf deciding the next step needs careful multi-step reasoning, reply with only {ESCALATE_MARKER}.'
+)
+
+# Model tiers: specialists that mostly dispatch short tool calls answer on the light tier
+GEMINI_MODELS = {
+    'heavy': SHARED_GEMINI_MODEL,
+    'light': FallbackGemini(
+        model=os.environ.get('GEMINI_LIGHT_MODEL', 'gemini-2.5-flash-lite'),
+        fallback_model=GEMINI_MODEL_NAME,
+    ),
+}
+
+logger = logging.getLogger(__name__)
+
+# Line-Framed Transports
+# ======================
+# JSONRPCMessage is a RootModel in MCP SDK 1.x and a plain union in 2.x; an adapter parses either
+JSONRPC_MESSAGE_ADAPTER = TypeAdapter(JSONRPCMessage)
+
+
+@asynccontextmanager
+async def jsonrpc_line_streams(receive_stream, send_stream):
+    """MCP client streams over a pair of byte streams, one JSON-RPC message per line.
+
+    Messages are parsed straight from the received bytes, and the messages queued
+    while a write is in flight (e.g. concurrent tool calls) go out in one write.
+    """
+    read_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_reader = anyio.create_memory_object_stream(0)
+
+    async def receive_messages():
+        buffer = bytearray()
+        async with read_writer:
+            async for chunk in receive_stream:
+                buffer += chunk
+                *lines, rest = buffer.split(b'\n')
+                buffer = bytearray(rest)
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        message = JSONRPC_MESSAGE_ADAPTER.validate_json(line)
+                    except ValueError as error:
+                        await read_writer.send(error)
+                    else:
+                        await read_writer.send(SessionMessage(message))
+
+    async def send_messages():
+        async with write_reader:
+            async for session_message in write_reader:
+                batch = [session_message]
+                while True:
+                    try:
+                        batch.append(write_reader.receive_nowait())
+                    except (anyio.WouldBlock, anyio.EndOfStream):
+                        break
+                await send_stream.send(b''.join(
+                    message.message.model_dump_json(by_alias=True, exclude_none=True).encode() + b'\n'
+                    for message in batch
+                ))
+
+    async with anyio.create_task_group() as tasks:
+        tasks.start_soon(receive_messages)
+        tasks.start_soon(send_messages)
+        try:
+            yield read_stream, write_stream
+        finally:
+            tasks.cancel_scope.cancel()
+
+
+# Seconds a server gets to exit after its stdin is closed before it is killed
+STDIO_SHUTDOWN_TIMEOUT = 2
+
+
+@asynccontextmanager
+async def batched_stdio_client(server, errlog=sys.stderr):
+    """MCP client streams over the stdio pipes of a spawned server, via jsonrpc_line_streams.
+
+    Replaces the MCP SDK's stdio_client, which decodes every chunk to text before
+    splitting it and writes each outgoing message with its own syscall.
+    """
+    env = get_default_environment() if server.env is None else {**get_default_environment(), **server.env}
+    process = await anyio.open_process([server.command, *server.args], env=env, cwd=server.cwd, stderr=errlog)
+    try:
+        async with jsonrpc_line_streams(process.stdout, process.stdin) as streams:
+            yield streams
+    finally:
+        with anyio.CancelScope(shield=True):
+            await process.stdin.aclose()
+            with anyio.move_on_after(STDIO_SHUTDOWN_TIMEOUT):
+                await process.wait()
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+
+class BatchedStdioSessionManager(MCPSessionManager):
+    """Session manager whose stdio sessions run over batched_stdio_client"""
+
+    def _create_client(self, *args, **kwargs):
+        return batched_stdio_client(self._connection_params.server_params, self._errlog)
+
+
+class BatchedStdioMCPToolset(MCPToolset):
+    """MCPToolset whose server pipes carry line-framed, write-coalesced JSON-RPC.
+
+    On Windows the MCP SDK's stdio_client is kept for its process-creation handling.
+    """
+
+    def __init__(self, *, connection_params, **kwargs):
+        super().__init__(connection_params=connection_params, **kwargs)
+        if sys.platform != 'win32':
+            self._mcp_session_manager = BatchedStdioSessionManager(
+                connection_params=self._connection_params, errlog=self._errlog
+            )
+
+
+@asynccontextmanager
+async def unix_socket_client(socket_path):
+    """MCP client streams over a Unix domain socket, via jsonrpc_line_streams.
+
+    Connects straight to a server started with `--listen <path>`, without a bridge
+    process copying every message between a stdio pipe and the socket.
+    """
+    connection = await anyio.connect_unix(socket_path)
+    async with connection, jsonrpc_line_streams(connection, connection) as streams:
+        yield streams
+
+
+class UnixSocketSessionManager(MCPSessionManager):
+    """Session manager whose sessions run over unix_socket_client instead of a spawned process"""
+
+    def __init__(self, socket_path, **kwargs):
+        super().__init__(**kwargs)
+        self._socket_path = socket_path
+
+    def _create_client(self, *args, **kwargs):
+        return unix_socket_client(self._socket_path)
+
+
+# MCP Server Parameters
+# =====================
+# Built once and shared by every toolset (and pool replica) that talks to the same server
+# Node servers get the MCP client's default (minimal) environment, without Node's startup
+# warnings: stderr is inherited, and each warning is a synchronous write the server blocks on
+NODE_SERVER_ENV = {**get_default_environment(), 'NODE_NO_WARNINGS': '1'}
+# The Playwright server keeps one browser for the life of its (shared) process. npx serves
+# '@latest' from its cache when it can, instead of asking the npm registry on every spawn
+PLAYWRIGHT_SERVER_PARAMS = StdioServerParameters(
+    command='npx',
+    args=['--prefer-offline', '-y', '@playwright/mcp@latest']
+    + (['--headless'] if os.environ.get('HEADLESS_MODE', '').lower() in ('1', 'true', 'yes') else []),
+)
+CODE_ANALYSIS_SERVER_PARAMS = StdioServerParameters(
+    command=NODE_PATH, args=[MCP_SERVER_SCRIPTS['code-analysis-server']], env=NODE_SERVER_ENV
+)
+CODE_MODIFICATION_SERVER_PARAMS = StdioServerParameters(
+    command=NODE_PATH, args=[MCP_SERVER_SCRIPTS['code-modification-server']], env=NODE_SERVER_ENV
+)
+FILESYSTEM_SERVER_PARAMS = StdioServerParameters(
+    command=NODE_PATH, args=[MCP_SERVER_SCRIPTS['filesystem-server']], env=NODE_SERVER_ENV
+)
+
+
+# Tool Schema Cache
+# =================
+# Tool schemas only change when the server code does, so they are kept on disk across runs
+SCHEMA_CACHE_DIR = os.path.expanduser(os.environ.get('MCP_SCHEMA_CACHE_DIR', '~/.cache/mcp-agent/schemas'))
+# Within a run, the tool list is reused for this many seconds instead of being fetched on every model turn
+TOOL_LIST_TTL = 300
+
+
+def accepts_argument(cls, name):
+    """Whether cls() takes the keyword `name`, looking past deprecated (*args, **kwargs) aliases"""
+    for klass in cls.__mro__:
+        if '__init__' in vars(klass):
+            parameters = inspect.signature(klass.__init__).parameters
+            if name in parameters:
+                return True
+            if not any(parameter.kind is parameter.VAR_KEYWORD for parameter in parameters.values()):
+                return False
+    return False
+
+
+# Older ADK releases reject progress_callback; newer ones also take a per-call factory that
+# receives the calling tool's context (mcp_tool.ProgressCallbackFactory)
+MCP_PROGRESS_CALLBACKS = accepts_argument(MCPToolset, 'progress_callback') and accepts_argument(MCPTool, 'progress_callback')
+MCP_PROGRESS_FACTORIES = MCP_PROGRESS_CALLBACKS and hasattr(mcp_tool, 'ProgressCallbackFactory')
+
+
+class SchemaCachedMCPToolset(BatchedStdioMCPToolset):
+    """MCPToolset that reuses the server's tool list from a previous run.
+
+    The list_tools result is stored under a key built from the server command,
+    its arguments and the mtimes of the server's script directory (servers import
+    sibling modules), so editing any server invalidates the entry. On a hit no
+    list_tools round trip is made and the server is only spawned on the first
+    tool call. Pass schema_cache_dir=None to always ask the server.
+
+    ADK asks a toolset for its tools on every model turn; the resulting tool list is
+    kept in memory for `tool_list_ttl` seconds, and concurrent first requests share
+    one fetch.
+
+    With `socket_path`, the toolset talks to an already running server over that Unix
+    socket instead of spawning `connection_params`.
+    """
+
+    def __init__(self, *, connection_params, schema_cache_dir=SCHEMA_CACHE_DIR, tool_list_ttl=TOOL_LIST_TTL,
+                 socket_path=None, **kwargs):
+        super().__init__(connection_params=connection_params, **kwargs)
+        if socket_path:
+            self._mcp_session_manager = UnixSocketSessionManager(
+                socket_path, connection_params=self._connection_params, errlog=self._errlog
+            )
+        self.tool_list_ttl = tool_list_ttl
+        self._tool_list = None  # (time.monotonic() when fetched, tools)
+        self._tool_list_lock = asyncio.Lock()
+        self._schema_cache_path = None
+        if schema_cache_dir and not self.tool_filter:
+            key = self._schema_cache_key(connection_params)
+            if key:
+                self._schema_cache_path = os.path.join(schema_cache_dir, f'{key}.json')
+
+    @staticmethod
+    def _schema_cache_key(connection_params):
+        scripts = [arg for arg in connection_params.args if os.path.isfile(arg)]
+        if not scripts:  # e.g. npx packages resolved at spawn time
+            return None
+        mtimes = []
+        for folder in sorted({os.path.dirname(script) for script in scripts}):
+            with os.scandir(folder) as entries:
+                mtimes.extend(
+                    (entry.name, entry.stat().st_mtime_ns)
+                    for entry in entries if entry.name.endswith('.js')
+                )
+        payload = orjson.dumps([connection_params.command, connection_params.args, sorted(mtimes)])
+        return hashlib.sha256(payload).hexdigest()
+
+    def _load_schemas(self):
+        try:
+            with open(self._schema_cache_path, 'rb') as cache_file:
+                return [McpTool.model_validate(schema) for schema in orjson.loads(cache_file.read())]
+        except (OSError, ValueError) as error:
+            if not isinstance(error, FileNotFoundError):
+                logger.warning('Ignoring unreadable tool schema cache %s: %s', self._schema_cache_path, error)
+            return None
+
+    def _save_schemas(self, tools):
+        schemas = [tool.raw_mcp_tool.model_dump(mode='json', exclude_none=True) for tool in tools]
+        try:
+            os.makedirs(os.path.dirname(self._schema_cache_path), exist_ok=True)
+            temp_path = f'{self._schema_cache_path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as cache_file:
+                cache_file.write(orjson.dumps(schemas))
+            os.replace(temp_path, self._schema_cache_path)
+        except OSError as error:
+            logger.warning('Could not write tool schema cache: %s', error)
+
+    async def get_tools(self, readonly_context=None):
+        if self.tool_filter:  # The selection may depend on the context, so it is not memoized
+            return await self._list_tools(readonly_context)
+        async with self._tool_list_lock:
+            if self._tool_list is None or time.monotonic() - self._tool_list[0] >= self.tool_list_ttl:
+                self._tool_list = (time.monotonic(), await self._list_tools(readonly_context))
+        return self._tool_list[1]
+
+    async def close(self):
+        self._tool_list = None
+        await super().close()
+
+    async def _list_tools(self, readonly_context):
+        if self._schema_cache_path is None:
+            return await super().get_tools(readonly_context)
+
+        schemas = self._load_schemas()
+        if schemas is None:
+            tools = await super().get_tools(readonly_context)
+            self._save_schemas(tools)
+            return tools
+
+        options = {'progress_callback': getattr(self, '_progress_callback', None)} if MCP_PROGRESS_CALLBACKS else {}
+        return [
+            MCPTool(
+                mcp_tool=schema,
+                mcp_session_manager=self._mcp_session_manager,
+                auth_scheme=self._auth_scheme,
+                auth_credential=self._auth_credential,
+                **options,
+            )
+            for schema in schemas
+        ]
+
+
+# Streaming Tool Output
+# =====================
+class StreamingMCPToolset(SchemaCachedMCPToolset):
+    """MCPToolset that surfaces partial tool output while a call is still running.
+
+    MCP servers report partial output (e.g. test stdout) as progress notifications.
+    Each call's chunks are pushed onto an asyncio.Queue and drained in ~50ms batches, so
+    a chatty test run produces a few updates per second instead of one per line. Every
+    batch is logged and, where ADK passes the calling context, written to session state
+    under '<tool name>_progress' (the last PROGRESS_STATE_CHARS characters of the call's
+    output), where callbacks and the tool's event see it. On ADK releases without
+    progress callbacks the servers are not asked for progress and results arrive whole.
+    """
+
+    COALESCE_SECONDS = 0.05
+    PROGRESS_STATE_CHARS = 4000
+
+    def __init__(self, *, connection_params, **kwargs):
+        if MCP_PROGRESS_FACTORIES:
+            kwargs['progress_callback'] = self.progress_callback_for
+        elif MCP_PROGRESS_CALLBACKS:
+            kwargs['progress_callback'] = self.progress_callback_for('mcp')
+        super().__init__(connection_params=connection_params, **kwargs)
+
+    def progress_callback_for(self, tool_name, *, callback_context=None, **kwargs):
+        """Progress callback for one call of tool_name (an ADK ProgressCallbackFactory)"""
+        queue = asyncio.Queue()
+        drain_task = None
+        received = ''
+        state_key = f'{tool_name}_progress'
+
+        async def drain():
+            nonlocal received
+            while not queue.empty():
+                await asyncio.sleep(self.COALESCE_SECONDS)
+                chunks = []
+                while not queue.empty():
+                    chunks.append(queue.get_nowait())
+                text = ''.join(chunks)
+                logger.info('%s: %s', tool_name, text.rstrip())
+                received = (received + text)[-self.PROGRESS_STATE_CHARS:]
+                if callback_context is not None:
+                    callback_context.state[state_key] = received
+
+        async def on_progress(progress, total=None, message=None):
+            nonlocal drain_task
+            if not message:
+                return
+            queue.put_nowait(message)
+            if drain_task is None or drain_task.done():
+                drain_task = asyncio.create_task(drain())
+
+        return on_progress
+
+
+# Pooled Tool Servers
+# ===================
+# Replicas per stateless MCP server; stateful servers (Appium session, terminals) stay single-process
+MCP_POOL_SIZE = max(1, min(4, (os.cpu_count() or 2) // 2))
+
+
+class _PooledTool(BaseTool):
+    """One tool backed by a pool of identical servers; each call runs on the least-busy replica"""
+
+    def __init__(self, pool, template):
+        super().__init__(name=template.name, description=template.description)
+        self._pool = pool
+        self._template = template
+
+    def _get_declaration(self):
+        return self._template._get_declaration()
+
+    async def run_async(self, *, args, tool_context):
+        index, replica = await self._pool.acquire(self.name)
+        try:
+            return await replica.run_async(args=args, tool_context=tool_context)
+        finally:
+            self._pool.release(index)
+
+
+class PooledMCPToolset(BaseToolset):
+    """Spread calls to a stateless MCP server over several Node processes.
+
+    Each MCPToolset serializes its calls over one stdio pipe, so independent calls
+    (e.g. parallel file reads) queue behind each other. The pool starts a single
+    server on first use and only spawns another replica (up to `size`) when every
+    running one is busy, so idle specialists never pay for more than they use.
+    """
+
+    def __init__(self, *, connection_params, size=MCP_POOL_SIZE, toolset_class=SchemaCachedMCPToolset, **kwargs):
+        super().__init__()
+        self._members = [toolset_class(connection_params=connection_params, **kwargs) for _ in range(size)]
+        self._member_tools = []  # Tools by name for each started member, in start order
+        self._in_flight = []
+        self._start_lock = asyncio.Lock()
+        self._tools = None
+
+    async def _start_member(self):
+        async with self._start_lock:
+            index = len(self._member_tools)
+            tools = await self._members[index].get_tools()
+            self._member_tools.append({tool.name: tool for tool in tools})
+            self._in_flight.append(0)
+            return index
+
+    async def get_tools(self, readonly_context=None):
+        if self._tools is None:
+            if not self._member_tools:
+                await self._start_member()
+            self._tools = [_PooledTool(self, tool) for tool in self._member_tools[0].values()]
+        return self._tools
+
+    async def acquire(self, tool_name):
+        index = min(range(len(self._in_flight)), key=self._in_flight.__getitem__)
+        if self._in_flight[index] and len(self._member_tools) < len(self._members) and not self._start_lock.locked():
+            try:
+                index = await self._start_member()
+            except Exception as error:  # Keep serving from the running replicas
+                logger.warning('Failed to start additional MCP replica: %s', error)
+        self._in_flight[index] += 1
+        return index, self._member_tools[index][tool_name]
+
+    def release(self, index):
+        if index < len(self._in_flight):  # Pool may have been closed mid-call
+            self._in_flight[index] -= 1
+
+    async def close(self):
+        started = self._members[:len(self._member_tools)]
+        self._member_tools, self._in_flight, self._tools = [], [], None
+        await asyncio.gather(*(member.close() for member in started))
+
+
+# Admission Control
+# =================
+# In-flight calls allowed on one server pipe while the server is healthy
+MCP_MAX_CONCURRENT_CALLS = 4
+# Consecutive failed calls that open a namespace's circuit, and how long it stays open
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 30
+
+
+def is_error_result(result):
+    """Whether an MCP tool result reports a failed call"""
+    return isinstance(result, dict) and bool(result.get('isError'))
+
+
+class AdaptiveLimiter:
+    """Concurrency limit for the calls sharing one MCP server pipe, adjusted AIMD-style.
+
+    Up to `max_limit` calls run at once while calls succeed. Each failed call halves
+    the limit (down to one) and each successful call raises it by one again, so a
+    struggling server (e.g. a stuck Appium session) is not flooded with more requests.
+    """
+
+    def __init__(self, max_limit=MCP_MAX_CONCURRENT_CALLS):
+        self.max_limit = self.limit = max_limit
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def run(self, call):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        failed = None  # Cancelled calls leave the limit as it is
+        try:
+            result = await call()
+            failed = is_error_result(result)
+            return result
+        except Exception:
+            failed = True
+            raise
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                if failed is not None:
+                    self.limit = max(1, self.limit // 2) if failed else min(self.max_limit, self.limit + 1)
+                self._condition.notify_all()
+
+
+class CircuitBreaker:
+    """Stop calling a server after repeated failures instead of letting the model retry forever.
+
+    After `failure_threshold` consecutive failed calls the circuit opens and calls are
+    answered with an error at once for `reset_seconds`. Then a single trial call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.rejected = 0
+        self._opened_at = None  # time.monotonic() when the circuit last opened
+        self._trial = False
+
+    def allow(self):
+        """Whether a call may go through now; claims the trial call when half-open"""
+        if self._opened_at is None:
+            return True
+        if self._trial or time.monotonic() - self._opened_at < self.reset_seconds:
+            self.rejected += 1
+            return False
+        self._trial = True
+        return True
+
+    def record(self, failed):
+        """Record the outcome of an allowed call; None for a call that was cancelled"""
+        trial, self._trial = self._trial, False
+        if failed is None:
+            return
+        if not failed:
+            self.failures, self._opened_at = 0, None
+            return
+        self.failures += 1
+        if trial or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            logger.warning(
+                'Circuit for %s opened after %d failed calls; retrying in %ds',
+                self.name, self.failures, self.reset_seconds,
+            )
+
+    def rejection(self, tool_name):
+        return {
+            'content': [{
+                'type': 'text',
+                'text': (
+                    f'{tool_name} not called: the {self.name} server failed {self.failures} calls in a row. '
+                    f'Stop retrying, report the failure, or try again in {self.reset_seconds}s.'
+                ),
+            }],
+            'isError': True,
+        }
+
+
+# Shared Node Process
+# ===================
+class _NamespacedTool(BaseTool):
+    """A multiplexed server tool exposed under its original (unprefixed) name"""
+
+    def __init__(self, tool, name, namespace_toolset):
+        super().__init__(name=name, description=tool.description)
+        self._tool = tool
+        self._namespace_toolset = namespace_toolset
+
+    def _get_declaration(self):
+        return self._tool._get_declaration().model_copy(update={'name': self.name})
+
+    async def run_async(self, *, args, tool_context):
+        return await self._namespace_toolset.call(
+            self.name, lambda: self._tool.run_async(args=args, tool_context=tool_context)
+        )
+
+
+class NamespaceToolset(BaseToolset):
+    """The tools of one server namespace inside a MultiplexedMCPServer.
+
+    Calls pass the namespace's circuit breaker, then the server's shared admission limit.
+    """
+
+    def __init__(self, server, namespace):
+        super().__init__()
+        self._server = server
+        self._prefix = f'{namespace}{MultiplexedMCPServer.SEPARATOR}'
+        self._tools = None
+        self.breaker = CircuitBreaker(namespace)
+
+    async def get_tools(self, readonly_context=None):
+        if self._tools is None:
+            self._tools = [
+                _NamespacedTool(tool, tool.name[len(self._prefix):], self)
+                for tool in await self._server.get_tools()
+                if tool.name.startswith(self._prefix)
+            ]
+        return self._tools
+
+    async def call(self, tool_name, run):
+        if not self.breaker.allow():
+            return self.breaker.rejection(tool_name)
+        failed = None
+        try:
+            result = await self._server.limiter.run(run)
+            failed = is_error_result(result)
+            return result
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.breaker.record(failed)
+
+    async def close(self):
+        self._tools = None
+        await self._server.close()
+
+
+class MultiplexedMCPServer:
+    """Several MCP servers hosted by one Node process (mcp-multiplex-server.js).
+
+    Agents get per-server views via view(namespace), so the planner, Appium, test
+    and advanced tools share one Node runtime and one stdio pipe instead of four.
+    With `socket_path`, the agent attaches to an already running server
+    (`node mcp-multiplex-server.js ... --listen <path>`) over that Unix socket,
+    so server state such as the Appium session survives agent restarts.
+    """
+
+    SEPARATOR = '__'
+
+    def __init__(self, namespaces, toolset_class=SchemaCachedMCPToolset, socket_path=None):
+        kwargs = {}
+        args = [MCP_SERVER_SCRIPTS['multiplex-server'], *namespaces]
+        if socket_path:
+            kwargs['socket_path'] = socket_path
+            kwargs['schema_cache_dir'] = None  # The listening server's namespaces are not known here
+        self.toolset = toolset_class(
+            connection_params=StdioServerParameters(command=NODE_PATH, args=args, env=NODE_SERVER_ENV),
+            **kwargs,
+        )
+        self._tools = None
+        self._lock = asyncio.Lock()
+        self.limiter = AdaptiveLimiter()
+
+    async def get_tools(self):
+        async with self._lock:
+            if self._tools is None:
+                self._tools = await self.toolset.get_tools()
+        return self._tools
+
+    def view(self, namespace):
+        return NamespaceToolset(self, namespace)
+
+    async def close(self):
+        async with self._lock:
+            if self._tools is not None:
+                self._tools = None
+                await self.toolset.close()
+
+
+# Stateful single-process servers share one Node process; pooled servers keep their own
+# Set MCP_SHARED_SOCKET to attach to a persistent server listening on that Unix socket
+SHARED_NODE_SERVER = MultiplexedMCPServer(
+    ['planning', 'appium', 'test', 'advanced'],
+    toolset_class=StreamingMCPToolset,
+    socket_path=os.environ.get('MCP_SHARED_SOCKET'),
+)
+
+# Shared Toolsets
+# ===============
+_TOOLSET_REGISTRY = {}
+
+
+def shared_toolset(toolset_class, connection_params, /, **kwargs):
+    """Return the process-wide toolset for a server, creating it on first request.
+
+    Agents and pipeline clones that ask for the same server and options get the
+    same instance, and with it one server process (or pool) and one handshake.
+    The first two arguments are positional, so kwargs may carry a toolset's own
+    toolset_class (PooledMCPToolset).
+    """
+    key = (
+        toolset_class,
+        connection_params.command,
+        tuple(connection_params.args),
+        tuple(sorted(kwargs.items())),
+    )
+    toolset = _TOOLSET_REGISTRY.get(key)
+    if toolset is None:
+        toolset = _TOOLSET_REGISTRY[key] = toolset_class(connection_params=connection_params, **kwargs)
+    return toolset
+
+
+async def close_shared_toolsets():
+    """Stop every shared server process once, whichever agents or pipelines used it"""
+    results = await asyncio.gather(
+        *(toolset.close() for toolset in _TOOLSET_REGISTRY.values()),
+        SHARED_NODE_SERVER.close(),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.warning('Failed to close MCP server: %s', result)
+
+
+# Relevant Tool Selection
+# =======================
+EMBEDDING_MODEL_NAME = 'text-embedding-004'
+
+
+async def embed_texts(texts, model=SHARED_GEMINI_MODEL):
+    """Unit-length embeddings of texts from one embed_content call, so a dot product is the cosine"""
+    response = await model.api_client.aio.models.embed_content(
+        model=EMBEDDING_MODEL_NAME,
+        contents=texts,
+        config=types.EmbedContentConfig(task_type='SEMANTIC_SIMILARITY'),
+    )
+    vectors = []
+    for embedding in response.embeddings:
+        norm = sum(value * value for value in embedding.values) ** 0.5 or 1.0
+        vectors.append([value / norm for value in embedding.values])
+    return vectors
+
+
+class RelevantToolset(BaseToolset):
+    """Offer the model only the tools of a large toolset that fit the current request.
+
+    Every tool schema is sent with every model call, and Playwright alone exposes
+    dozens. Tool names and descriptions are embedded once; per invocation the user's
+    message is embedded and the `top_k` closest tools, plus those named in `always`,
+    are returned. The selection is fixed for the whole invocation, so the tool list
+    does not change while the agent works on a request. When there is no message or
+    embedding fails, every tool is offered.
+    """
+
+    def __init__(self, toolset, top_k=8, always=(), max_invocations=64):
+        super().__init__()
+        self._toolset = toolset
+        self.top_k = top_k
+        self.always = frozenset(always)
+        self.max_invocations = max_invocations
+        self._vectors = {}    # Tool name -> embedding of its name and description
+        self._selection = {}  # Invocation id -> selected tool names, or None for all
+
+    async def get_tools(self, readonly_context=None):
+        tools = await self._toolset.get_tools(readonly_context)
+        if readonly_context is None or len(tools) <= self.top_k + len(self.always):
+            return tools
+
+        invocation_id = readonly_context.invocation_id
+        if invocation_id not in self._selection:
+            self._selection[invocation_id] = await self._select(tools, readonly_context.user_content)
+            while len(self._selection) > self.max_invocations:
+                del self._selection[next(iter(self._selection))]
+        names = self._selection[invocation_id]
+        return tools if names is None else [tool for tool in tools if tool.name in names]
+
+    async def _select(self, tools, user_content):
+        text = ' '.join(part.text for part in (user_content.parts if user_content else None) or () if part.text)
+        if not text.strip():
+            return None
+        missing = [tool for tool in tools if tool.name not in self._vectors]
+        try:
+            *tool_vectors, query = await embed_texts(
+                [f'{tool.name}: {tool.description}' for tool in missing] + [text]
+            )
+        except Exception as error:  # Selection is an optimization; offer every tool instead
+            logger.warning('Tool selection unavailable: %s', error)
+            return None
+        self._vectors.update(zip((tool.name for tool in missing), tool_vectors))
+
+        scored = sorted(
+            (
+                (sum(a * b for a, b in zip(query, self._vectors[tool.name])), tool.name)
+                for tool in tools if tool.name not in self.always
+            ),
+            reverse=True,
+        )
+        return self.always | {name for _, name in scored[:self.top_k]}
+
+    async def close(self):
+        self._selection.clear()
+        await self._toolset.close()
+
+
+_IDENTIFIER_RE = re.compile(r'[a-z][a-z0-9_]+')
+
+
+def is_failed_tool_response(tool_response):
+    """An MCP result flagged isError (is_error in MCP SDK 2.x), or the error ADK reports for a raised tool"""
+    return isinstance(tool_response, dict) and any(tool_response.get(key) for key in ('isError', 'is_error', 'error'))
+
+
+class PlannedToolset(BaseToolset):
+    """Offer only the tools an agent's own plan names, once the planner has produced one.
+
+    Agents that plan first (via an AgentTool) then work through the plan step by step
+    only need the tools its steps name. After the planner returns in an invocation, the
+    tool names found in the plan, plus those in `always`, are offered for the rest of
+    that invocation. Names are matched exactly, so unlike RelevantToolset no embedding
+    call is made. Before a plan exists, or when it names none of the tools, every tool
+    is offered. A failed tool call ends the narrowing for the invocation, so recovery
+    steps outside the plan stay callable; a new plan narrows the tools again.
+    """
+
+    def __init__(self, toolset, planner_name, always=(), max_invocations=64):
+        super().__init__()
+        self._toolset = toolset
+        self.planner_name = planner_name
+        self.always = frozenset(always)
+        self.max_invocations = max_invocations
+        self._plans = {}  # Invocation id -> tool names the plan uses
+
+    async def get_tools(self, readonly_context=None):
+        tools = await self._toolset.get_tools(readonly_context)
+        names = self._plans.get(readonly_context.invocation_id) if readonly_context is not None else None
+        return tools if names is None else [tool for tool in tools if tool.name in names]
+
+    async def record_plan(self, tool, tool_context, tool_response):
+        """After-tool hook: remember which tools the planner's response names; forget them after a failure"""
+        if tool.name != self.planner_name:
+            if is_failed_tool_response(tool_response):
+                self._plans.pop(tool_context.invocation_id, None)
+            return
+        tool_names = {candidate.name for candidate in await self._toolset.get_tools(tool_context)}
+        named = tool_names.intersection(_IDENTIFIER_RE.findall(str(tool_response)))
+        if not named:
+            return
+        self._plans[tool_context.invocation_id] = frozenset(named | self.always)
+        while len(self._plans) > self.max_invocations:
+            del self._plans[next(iter(self._plans))]
+
+    async def close(self):
+        self._plans.clear()
+        await self._toolset.close()
+
+
+# Cross-Agent Tool Call Coalescing
+# ================================
+# Read-only tools whose results can be shared between specialists for a few seconds;
+# tools that an MCP server annotates with readOnlyHint are treated the same way
+COALESCABLE_TOOLS = frozenset({
+    # Filesystem and code analysis
+    'read_file', 'list_dir', 'file_search', 'grep_search', 'semantic_search',
+    'get_changed_files', 'get_errors', 'list_code_usages', 'test_search',
+    # Screen inspection
+    'get_screenshot', 'get_page_source', 'get_page_source_compressed', 'scan_overlays',
+    'scan_screen', 'appium_status',
+    'browser_take_screenshot', 'browser_snapshot',
+})
+
+
+def canonical_json(value):
+    """Compact JSON with sorted keys, so equal tool arguments always serialize the same"""
+    return orjson.dumps(value, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str).decode()
+
+
+class ToolCallCoalescer:
+    """Share one result between identical read-only tool calls made within a short TTL.
+
+    Installed as before/after tool callbacks on every specialist, so when two agents
+    (e.g. file operations and code management in a pipeline) read the same file, the
+    second call awaits the first call's future instead of hitting the MCP server again.
+    Calls are keyed by server, tool and arguments, and at most `max_entries` results are
+    kept (oldest first out). Any call to a tool outside COALESCABLE_TOOLS may change
+    state and drops finished entries.
+    """
+
+    def __init__(self, ttl=5, tool_names=COALESCABLE_TOOLS, max_entries=256):
+        self.ttl = ttl
+        self.tool_names = frozenset(tool_names)
+        self.max_entries = max_entries
+        self._cache: dict[bytes, tuple[float, asyncio.Future]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def is_read_only(self, tool):
+        """Listed in tool_names, or annotated readOnlyHint by its MCP server"""
+        if tool.name in self.tool_names:
+            return True
+        while isinstance(tool, (_NamespacedTool, _PooledTool)):
+            tool = tool._tool if isinstance(tool, _NamespacedTool) else tool._template
+        annotations = getattr(getattr(tool, 'raw_mcp_tool', None), 'annotations', None)
+        return bool(annotations and annotations.readOnlyHint)
+
+    @staticmethod
+    def server_id(tool):
+        """Identify the server connection behind a tool, through pooled and namespaced wrappers"""
+        while isinstance(tool, _NamespacedTool):
+            tool = tool._tool
+        owner = getattr(tool, '_pool', None) or getattr(tool, '_mcp_session_manager', None)
+        return f'{id(owner) if owner is not None else type(tool).__name__}:{tool.name}'
+
+    @classmethod
+    def make_key(cls, tool, args):
+        canonical = canonical_json(args)
+        return hashlib.blake2b(f'{cls.server_id(tool)}:{canonical}'.encode(), digest_size=16).digest()
+
+    def _store(self, key, now):
+        future = asyncio.get_running_loop().create_future()
+        self._cache.pop(key, None)  # Re-insert at the end so eviction drops the oldest entries
+        self._cache[key] = (now, future)
+        while len(self._cache) > self.max_entries:
+            del self._cache[next(iter(self._cache))]
+        return future
+
+    async def before_tool(self, tool, args, tool_context):
+        if not self.is_read_only(tool):
+            self._cache = {key: entry for key, entry in self._cache.items() if not entry[1].done()}
+            return None
+
+        key = self.make_key(tool, args)
+        now = time.monotonic()
+        entry = self._cache.get(key)
+        if entry and now - entry[0] < self.ttl:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(entry[1]), timeout=self.ttl)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass  # Original call failed or stalled, run the tool ourselves
+            else:
+                self.hits += 1
+                return result
+
+        self.misses += 1
+        self._store(key, now)
+        return None
+
+    def reserve(self, tool, args):
+        """Register a call made outside the callbacks; returns its future, or None if one is live"""
+        key = self.make_key(tool, args)
+        now = time.monotonic()
+        entry = self._cache.get(key)
+        if entry and now - entry[0] < self.ttl:
+            return None
+        return self._store(key, now)
+
+    async def after_tool(self, tool, args, tool_context, tool_response):
+        if self.is_read_only(tool):
+            entry = self._cache.get(self.make_key(tool, args))
+            if entry and not entry[1].done():
+                entry[1].set_result(tool_response)
+        return None
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+tool_call_coalescer = ToolCallCoalescer()
+
+
+class SpeculativePrefetcher:
+    """Start the likely next read-only tool call while the model is still decoding.
+
+    Learns P(next call | last call) per agent from the calls it sees. After a read-only
+    call, a follow-up (tool and arguments) seen at least `min_observations` times with
+    probability >= `threshold` is started right away and registered with the coalescer,
+    so the model's own call picks up the result. A wrong guess simply expires with the
+    coalescer TTL. Nothing is predicted after a state-changing call, since the screen or
+    files may still be changing.
+
+    As an after_model callback it also starts read-only calls the model has already
+    streamed out, overlapping their MCP round trip with the rest of the decode.
+    """
+
+    def __init__(self, coalescer, threshold=0.7, min_observations=5):
+        self._coalescer = coalescer
+        self.threshold = threshold
+        self.min_observations = min_observations
+        self._transitions = {}  # (agent, call) -> Counter of next calls
+        self._last_call = {}    # agent -> last call, as (tool name, canonical args)
+        self._tools = {}        # (agent, tool name) -> tool object
+        self._contexts = {}     # agent -> tool context of its latest call
+        self._tasks = set()
+        self.prefetches = 0
+
+    @staticmethod
+    def _call(tool, args):
+        return tool.name, canonical_json(args)
+
+    async def before_tool(self, tool, args, tool_context):
+        agent = tool_context.agent_name
+        call = self._call(tool, args)
+        previous = self._last_call.get(agent)
+        if previous is not None:
+            self._transitions.setdefault((agent, previous), Counter())[call] += 1
+        self._last_call[agent] = call
+        self._tools[(agent, tool.name)] = tool
+        self._contexts[agent] = tool_context
+        return await self._coalescer.before_tool(tool, args, tool_context)
+
+    async def after_tool(self, tool, args, tool_context, tool_response):
+        result = await self._coalescer.after_tool(tool, args, tool_context, tool_response)
+        if self._coalescer.is_read_only(tool):
+            self._prefetch(tool_context, self._call(tool, args))
+        return result
+
+    def _prefetch(self, tool_context, call):
+        agent = tool_context.agent_name
+        counts = self._transitions.get((agent, call))
+        if not counts:
+            return
+        (name, canonical_args), count = counts.most_common(1)[0]
+        total = sum(counts.values())
+        tool = self._tools.get((agent, name))
+        if total < self.min_observations or count / total < self.threshold:
+            return
+        if tool is None or not self._coalescer.is_read_only(tool):
+            return
+        self._start(tool, orjson.loads(canonical_args), tool_context)
+
+    def after_model(self, callback_context, llm_response):
+        """Start read-only calls found in a streamed chunk before the whole response is decoded"""
+        if not llm_response.partial or not llm_response.content:
+            return None
+        agent = callback_context.agent_name
+        for part in llm_response.content.parts or ():
+            call = part.function_call
+            if not call or getattr(call, 'partial_args', None) or getattr(call, 'will_continue', None):
+                continue  # No call, or its arguments are still streaming in
+            tool = self._tools.get((agent, call.name))
+            tool_context = self._contexts.get(agent)
+            if tool is not None and tool_context is not None and self._coalescer.is_read_only(tool):
+                self._start(tool, dict(call.args or {}), tool_context)
+        return None
+
+    def _start(self, tool, args, tool_context):
+        future = self._coalescer.reserve(tool, args)
+        if future is not None:  # Nothing cached or in flight for this call yet
+            task = asyncio.create_task(self._run(tool, args, tool_context, future))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, tool, args, tool_context, future):
+        try:
+            result = await tool.run_async(args=args, tool_context=tool_context)
+        except Exception as error:  # The model's own call will run the tool
+            logger.debug('Prefetch of %s failed: %s', tool.name, error)
+            future.cancel()
+        else:
+            if not future.done():
+                future.set_result(result)
+            self.prefetches += 1
+
+
+tool_prefetcher = SpeculativePrefetcher(tool_call_coalescer)
+
+# Snapshot Results
+# ================
+# Page sources and screenshots describe the screen at one moment and are never re-read
+# once the agent has acted again. MCP servers flag such results with
+# `_meta.cache_hint: "no-cache"`; these tools are treated the same when a server does not.
+SNAPSHOT_TOOL_NAMES = frozenset({
+    'get_page_source', 'get_page_source_compressed', 'analyze_screenshot', 'capture_state', 'scan_screen',
+    'browser_snapshot',
+})
+STALE_SNAPSHOT_RESPONSE = {'content': [{
+    'type': 'text',
+    'text': 'Earlier snapshot omitted; the screen has changed since. Call the tool again for the current state.',
+}]}
+
+
+def is_snapshot_response(response):
+    """Whether a function response is a point-in-time snapshot that goes stale after the next action"""
+    if response.name in SNAPSHOT_TOOL_NAMES:
+        return True
+    result = response.response or {}
+    meta = result.get('meta') or result.get('_meta') or {}
+    return meta.get('cache_hint') == 'no-cache'
+
+
+def drop_stale_snapshots(callback_context, llm_request):
+    """Replace snapshot results from earlier turns with a short note.
+
+    Everything before the trailing run of user contents (the results the model is about
+    to read) is the prefix that context caching stores, so stale XML and screenshot
+    analyses would otherwise be cached and billed on every later turn.
+    """
+    contents = llm_request.contents
+    boundary = len(contents)
+    while boundary and contents[boundary - 1].role == 'user':
+        boundary -= 1
+    for index in range(boundary):
+        content = contents[index]
+        parts = content.parts or []
+        if not any(part.function_response and is_snapshot_response(part.function_response) for part in parts):
+            continue
+        contents[index] = types.Content(role=content.role, parts=[
+            types.Part(function_response=types.FunctionResponse(
+                id=part.function_response.id,
+                name=part.function_response.name,
+                response=STALE_SNAPSHOT_RESPONSE,
+            ))
+            if part.function_response and is_snapshot_response(part.function_response) else part
+            for part in parts
+        ])
+    return None
+
+
+# Shared Instruction Fragments
+# ============================
+# Phrases repeated across agent instructions are kept once and composed with f-strings
+_FRAG_EXCEL_AT = sys.intern('You excel at:')
+_FRAG_TASK_COMPLETION = sys.intern('TASK COMPLETION REQUIREMENTS:')
+_FRAG_PARALLEL_TOOL_CALLS = '''    - Request independent tool calls together in one response so they run concurrently
+      (e.g. read several files at once); only sequence calls that depend on earlier results'''
+# Byte-identical opening of every agent's system instruction, so each model call starts with
+# the same prefix and Gemini's implicit cache can reuse it across agents and turns
+_COMMON_PREAMBLE = sys.intern(f'''You are one agent of a multi-agent test automation system for mobile apps and the web.
+The automation coordinator routes each request to the agent that owns it; agents act through their tools
+and report back what the tools actually returned.
+
+SHARED RULES:
+{_FRAG_PARALLEL_TOOL_CALLS}
+    - Never report a step as done without tool output that shows it; say what failed and why instead
+
+''')
+
+# Indented f-string prompts leave whitespace-only lines and trailing spaces behind
+_TRAILING_WS_RE = re.compile(r'[ \t]+$', re.MULTILINE)
+
+
+def compact_instruction(text):
+    """Strip trailing whitespace from every prompt line; wording and indentation are kept"""
+    return _TRAILING_WS_RE.sub('', text)
+
+
+def static_instruction(text):
+    """Instruction provider for a fixed prompt, compacted, behind the shared preamble and interned once.
+
+    ADK scans string instructions for {state} placeholders on every model call; an
+    instruction provider's result is used as-is, so multi-kilobyte prompts are not
+    re-parsed each turn. Only for prompts that reference no session state.
+    """
+    text = sys.intern(_COMMON_PREAMBLE + compact_instruction(text))
+
+    def provide(context):
+        return text
+
+    return provide
 
-# # Network resilience configuration
-# NETWORK_CONFIG = {
-#     'timeout': 600,  # Increased timeout for mobile operations
-#     'max_retries': 3,
-#     'retry_delay': 2
-# }
 
 # Specialized Agent Definitions
 # ==============================
+@dataclass(frozen=True)
+class AgentSpec:
+    """Declarative description of a tool-driven specialist, turned into an LlmAgent by build_specialist"""
+
+    name: str
+    description: str
+    role: str  # Completes "You are ..."
+    skills: tuple[str, ...]
+    tool_hint: str  # Closing line naming the tools to use
+    tools: tuple = ()
+    completion: tuple[str, ...] = ()  # TASK COMPLETION REQUIREMENTS; omitted when empty
+    guidelines: tuple[str, ...] = ()  # Extra rules after the completion requirements
+    model: object = field(default_factory=lambda: SHARED_GEMINI_MODEL)  # Models are unhashable, so not a plain default
+
+
+def _bullets(lines):
+    return '\n'.join(f'    - {line}' for line in lines)
+
+
+def render_instruction(spec):
+    """Compose a specialist instruction from its spec and the shared fragments"""
+    sections = [f'You are {spec.role}. {_FRAG_EXCEL_AT}\n{_bullets(spec.skills)}\n    ']
+    if spec.completion:
+        sections.append(f'\n    {_FRAG_TASK_COMPLETION}\n{_bullets(spec.completion)}\n')
+        if spec.guidelines:
+            sections.append(f'{_bullets(spec.guidelines)}\n')
+        sections.append('    ')
+    sections.append(f'\n    {spec.tool_hint}')
+    return ''.join(sections)
+
+
+def build_specialist(spec):
+    """Create the LlmAgent for a spec, sharing tool results through the prefetcher"""
+    return LlmAgent(
+        model=spec.model,
+        name=spec.name,
+        description=spec.description,
+        instruction=static_instruction(render_instruction(spec)),
+        tools=list(spec.tools),
+        before_tool_callback=tool_prefetcher.before_tool,
+        before_model_callback=drop_stale_snapshots,
+        after_tool_callback=tool_prefetcher.after_tool,
+        after_model_callback=tool_prefetcher.after_model,
+    )
+
 
 # 1. Web Automation Specialist
-web_automation_agent = LlmAgent(
-    model='gemini-2.5-flash-preview-05-20',
+WEB_AUTOMATION_SPEC = AgentSpec(
     name='web_automation_specialist',
     description='Specialist for web browser automation, testing, and interaction using Playwright',
-    instruction='''You are a web automation specialist. You excel at:
-    - Browser automation and testing
-    - Web scraping and data extraction
-    - UI testing and validation
-    - Taking screenshots and generating reports
-    - Handling dynamic web content and SPAs
-    
-    Use Playwright tools for all web-related tasks.''',
-    tools=[
-        MCPToolset(
-            connection_params=StdioServerParameters(
-                command='npx',
-                args=['-y', '@playwright/mcp@latest']
-            ),
+    role='a web automation specialist',
+    skills=(
+        'Browser automation and testing',
+        'Web scraping and data extraction',
+        'UI testing and validation',
+        'Taking screenshots and generating reports',
+        'Handling dynamic web content and SPAs',
+    ),
+    tool_hint='Use Playwright tools for all web-related tasks.',
+    tools=(
+        RelevantToolset(
+            shared_toolset(SchemaCachedMCPToolset, PLAYWRIGHT_SERVER_PARAMS),
+            always=('browser_navigate', 'browser_snapshot', 'browser_click', 'browser_type', 'browser_wait_for'),
         ),
-    ],
+    ),
 )
+web_automation_agent = build_specialist(WEB_AUTOMATION_SPEC)
 
 # 2. Mobile Automation Planner Agent
-mobile_automation_planner = LlmAgent(
-    model='gemini-2.5-flash-preview-05-20',
-    name='mobile_automation_planner',
-    description='Specialist for converting mobile testing instructions into detailed action plans with assertions',
-    instruction='''You are a mobile automation planner. Your primary responsibility is to:
+MOBILE_PLANNER_INSTRUCTION = '''You are a mobile automation planner. Your primary responsibility is to:
 
 CORE FUNCTIONALITY:
 1. INSTRUCTIONS TO ACTIONS CONVERSION:
@@ -70,11 +1385,14 @@ PLANNING METHODOLOGY:
 - DEFINE verification points and success criteria
 - PLAN fallback strategies for each step
 - CONSIDER edge cases and error conditions
+- PLAN one ensure_page_ready step after each navigation, listing the elements that prove the
+  page loaded, instead of separate overlay check, dismissal and verification steps
 
 ACTION STEP STRUCTURE:
 Each planned action should include:
 - Step number and description
 - Target element identification strategy
+- The Appium tool that performs it, by exact name (e.g. smart_find_and_click, ensure_page_ready, type_text)
 - Expected behavior/outcome
 - Success assertion criteria
 - Failure handling approach
@@ -100,977 +1418,446 @@ COLLABORATION WITH SPECIALIST:
 - Prepare comprehensive action plans for the mobile_automation_specialist
 - Include all necessary context and parameters
 - Provide clear handoff documentation
-- Ensure plans are executable and measurable''',
+- Ensure plans are executable and measurable'''
+
+mobile_automation_planner = LlmAgent(
+    model=SHARED_GEMINI_MODEL,
+    name='mobile_automation_planner',
+    description='Specialist for converting mobile testing instructions into detailed action plans with assertions',
+    instruction=static_instruction(MOBILE_PLANNER_INSTRUCTION),
     tools=[
-        MCPToolset(
-            connection_params=StdioServerParameters(
-                command=NODE_PATH,
-                args=[os.path.join(TARGET_FOLDER_PATH, 'mcp-mobile-planning-server.js')]
-            ),
-        ),
+        SHARED_NODE_SERVER.view('planning'),
     ],
 )
 
+# Plans for near-identical tasks are reused across runs from here
+PLAN_CACHE_PATH = os.path.expanduser(os.environ.get('MCP_PLAN_CACHE_PATH', '~/.cache/mcp-agent/plans.json'))
+# Values a plan depends on: quoted strings, and tokens with a digit, an inner capital or
+# underscore, or an inner separator (numbers, hosts and ports, package names, e-mail
+# addresses, user names, EMAS, iOS)
+PLAN_LITERAL_RE = re.compile(
+    r'"([^"]*)"|(?<!\w)\'([^\']*)\'(?!\w)|`([^`]*)`'
+    r'|(\S*\d\S*|\w+[A-Z_]\w*|\w+(?:[.@/:+-]\w+)+)'
+)
+
+
+def plan_literals(request):
+    """The literal values in a request, in order; requests that differ in one need different plans"""
+    return [next(group for group in match.groups() if group is not None) for match in PLAN_LITERAL_RE.finditer(request)]
+
+
+class CachedAgentTool(agent_tool.AgentTool):
+    """AgentTool that answers a request close to an earlier one with that request's answer.
+
+    Planning tasks recur with small wording changes ("open EMAS and log in"). Each request
+    is embedded with embed_texts; when the closest stored request with the same literal
+    values (plan_literals) scores at least `min_score` (cosine), its answer is returned
+    without running the agent. Requests that differ only in a credential, host or package
+    name embed almost identically, so the literals must match exactly. The newest
+    `max_entries` (embedding, literals, answer) entries are kept and saved to `cache_path`,
+    so recurring tasks hit across runs. When embedding fails the agent simply runs.
+    """
+
+    def __init__(self, agent, cache_path=PLAN_CACHE_PATH, min_score=0.93, max_entries=256, **kwargs):
+        super().__init__(agent=agent, **kwargs)
+        self.cache_path = cache_path
+        self.min_score = min_score
+        self.max_entries = max_entries
+        self._entries = None  # [(embedding, literals, answer)], loaded on first use
+        self.hits = 0
+        self.misses = 0
+
+    async def run_async(self, *, args, tool_context):
+        request = args.get('request')
+        if not isinstance(request, str) or not request.strip():
+            return await super().run_async(args=args, tool_context=tool_context)
+        try:
+            (query,) = await embed_texts([request])
+        except Exception as error:  # The cache is an optimization; plan without it
+            logger.warning('Plan cache unavailable: %s', error)
+            return await super().run_async(args=args, tool_context=tool_context)
+
+        literals = plan_literals(request)
+        entries = self._load_entries()
+        candidates = [
+            (sum(a * b for a, b in zip(query, vector)), answer)
+            for vector, entry_literals, answer in entries if entry_literals == literals
+        ]
+        if candidates:
+            score, answer = max(candidates, key=lambda scored: scored[0])
+            if score >= self.min_score:
+                self.hits += 1
+                return answer
+        self.misses += 1
+
+        answer = await super().run_async(args=args, tool_context=tool_context)
+        if isinstance(answer, str) and answer.strip():
+            entries.append((query, literals, answer))
+            del entries[:-self.max_entries]
+            self._save_entries(entries)
+        return answer
+
+    def _load_entries(self):
+        if self._entries is None:
+            self._entries = []
+            try:
+                with open(self.cache_path, 'rb') as cache_file:
+                    self._entries = [
+                        (entry['embedding'], entry['literals'], entry['answer'])
+                        for entry in orjson.loads(cache_file.read())
+                    ]
+            except (OSError, ValueError, KeyError, TypeError) as error:
+                if not isinstance(error, FileNotFoundError):
+                    logger.warning('Ignoring unreadable plan cache %s: %s', self.cache_path, error)
+        return self._entries
+
+    def _save_entries(self, entries):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temp_path = f'{self.cache_path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as cache_file:
+                cache_file.write(orjson.dumps([
+                    {'embedding': vector, 'literals': literals, 'answer': answer}
+                    for vector, literals, answer in entries
+                ]))
+            os.replace(temp_path, self.cache_path)
+        except OSError as error:
+            logger.warning('Could not write plan cache: %s', error)
+
+
 # 3. Enhanced Mobile Automation Specialist  
+# Role, hard rules and reporting only: how to use each tool, its fallbacks and the overlay,
+# error and webview procedures are in the Appium tool descriptions the model sees with the tools
+MOBILE_SPECIALIST_INSTRUCTION = '''You are the mobile automation specialist: you plan, run and report Android and iOS app tests through Appium.
+
+WORKFLOW:
+1. For every new scenario, first call mobile_automation_planner with the user's request, then follow the plan it returns.
+2. Connect with appium_connect using exactly the host, port and device details the user gave.
+3. Before interacting with a screen, call ensure_page_ready. Act with smart_find_and_click, type_text or, for steps whose
+   selectors are already known, one appium_batch; pass observe: true so the result includes the settled screen and its error scan.
+4. Check each action's result (observe, scan_screen or act_and_diff) before the next step. The tool descriptions give each
+   tool's purpose and fallbacks - follow them.
+5. Finish with the final report.
+
+HARD RULES:
+- Use only selectors seen in the page source (prefer get_page_source_compressed); never guess them.
+  Priority: accessibilityId > id > contentDescription > text > xpath.
+  - For Android: copy the accessibility-id, resource-id, content-desc and text attributes.
+  - For iOS: name, label and value are the accessibility IDs.
+- Limits: 20 actions per task, 5 attempts and 3 selector strategies per element, 3 page source calls per step,
+  3 scrolls per element. At a limit, change approach or move on to the next part of the task.
+- When scan_screen or an observed action reports FAIL, stop at once and send the critical error report.
+  On WARNING, report it and ask the user whether to continue.
+- Keep replies short: quote only the XML snippet you rely on, never a whole page source.
+
+REPORTING:
+- Report progress with emit_status in the same response as the next action, when a counter changes or resets,
+  when an assertion fails, or every 3rd action. Never write the "📊" status line yourself.
+- After each step: "🔍 ASSERTION: [action] → [expected] → [actual] → ✅ PASS / ❌ FAIL / ⚠️ WARNING"
+- Critical error: "🚨 CRITICAL ERROR DETECTED - AUTOMATION STOPPED" followed by Location, Error Type, Error Details
+  (exact text from the screen), Page Analysis (the relevant XML) and Recommended Action.
+- Final report: overall status (PASS/FAIL/PARTIAL) and steps run vs planned; per step its status, assertion result
+  and evidence (capture_state files); then issues found and recommendations.'''
+
+MOBILE_SPECIALIST_INSTRUCTION = _COMMON_PREAMBLE + compact_instruction(MOBILE_SPECIALIST_INSTRUCTION)
+
+# Lines like "- For iOS: ..." or "* Android: ..." only apply to that platform
+_PLATFORM_LINE_RE = re.compile(r'^(\s*)[-*]\s+(?:For |Look for )?(iOS|Android)(?: devices?)?[:,]')
+
+
+@lru_cache(maxsize=4)
+def specialize_mobile_prompt(platform=''):
+    """Drop instruction lines (and their nested bullets) that target the other platform"""
+    platform = platform.lower()
+    if platform not in ('ios', 'android'):
+        return MOBILE_SPECIALIST_INSTRUCTION
+    lines = []
+    skip_indent = None
+    for line in MOBILE_SPECIALIST_INSTRUCTION.split('\n'):
+        indent = len(line) - len(line.lstrip())
+        if skip_indent is not None:
+            if line.strip() and indent > skip_indent:
+                continue
+            skip_indent = None
+        match = _PLATFORM_LINE_RE.match(line)
+        if match and match.group(2).lower() != platform:
+            skip_indent = indent
+            continue
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def mobile_specialist_instruction(context):
+    """Instruction provider: specialize the prompt once the device platform is known"""
+    return specialize_mobile_prompt(context.state.get('mobile_platform', ''))
+
+
+# Compressed status line: "📊 A:X/20 E:Y/5 P:Z/3 [S:W/3] ..."
+_STATUS_LINE_RE = re.compile(r'^[ \t]*"?📊 A:(\d+)/\d+ E:(\d+)/\d+ P:(\d+)/\d+(?: S:(\d+)/\d+)?.*\n?', re.MULTILINE)
+STATUS_EVERY_N_ACTIONS = 3
+
+
+def coalesce_status_lines(callback_context, llm_response):
+    """Drop status heartbeats whose counters did not meaningfully change since the last one kept.
+
+    Kept lines are those where the E/P/S counters moved, an error is reported, or at
+    least STATUS_EVERY_N_ACTIONS actions passed; the rest never enter the session history.
+    """
+    if llm_response.partial or not llm_response.content or not llm_response.content.parts:
+        return None
+
+    last = callback_context.state.get('mobile_status_counters')
+    changed = False
+
+    def keep_or_drop(match):
+        nonlocal last, changed
+        actions, *counters = (int(value or 0) for value in match.groups())
+        is_error = '❌' in match.group(0) or '🚨' in match.group(0)
+        if last is None or is_error or counters != last[1:] or actions - last[0] >= STATUS_EVERY_N_ACTIONS:
+            last = [actions, *counters]
+            return match.group(0)
+        changed = True
+        return ''
+
+    for part in llm_response.content.parts:
+        if part.text and '📊 A:' in part.text:
+            part.text = _STATUS_LINE_RE.sub(keep_or_drop, part.text)
+
+    if last is not None:
+        callback_context.state['mobile_status_counters'] = last
+    return llm_response if changed else None
+
+
+# Limits shown in the status line: actions, element attempts, page source calls, scroll attempts
+STATUS_LIMITS = (20, 5, 3, 3)
+_CONTEXT_MARKERS = {'NATIVE': '📱', 'WEBVIEW': '🌐', 'HYBRID': '🔄'}
+_SCROLL_UP_RE = re.compile(r'\bup\b', re.IGNORECASE)
+
+
+def emit_status(
+    actions: int,
+    element_attempts: int,
+    page_source_calls: int,
+    scroll_attempts: int,
+    action: str,
+    next_step: str,
+    tool_context: ToolContext,
+    overlay: str = '',
+    scroll: str = '',
+    context: str = '',
+    assertion: str = '',
+    error: str = '',
+) -> str:
+    """Format the compressed mobile status line from its values.
+
+    Args:
+        actions: Actions taken so far in the task (max 20); 0 once the task is done.
+        element_attempts: Attempts on the current element (max 5); 0 once the element succeeds.
+        page_source_calls: Page source calls for the current step (max 3); 0 once the step succeeds.
+        scroll_attempts: Scroll attempts for the current element (max 3); 0 once the element succeeds.
+        action: The action just done and how, e.g. "Login via smart_find_and_click".
+        next_step: The next action, e.g. "password".
+        overlay: Overlay status, e.g. "No overlays" or "2 overlays dismissed"; empty to omit.
+        scroll: Scroll status, e.g. "Scrolled down"; empty to omit.
+        context: NATIVE, WEBVIEW or HYBRID; empty to omit.
+        assertion: Assertion result, e.g. "ASSERT: Login page loaded"; empty to omit.
+        error: Error that stops the automation; empty when there is none.
+
+    Returns:
+        The status line; it is shown to the user as is, so do not repeat it.
+    """
+    counters = (actions, element_attempts, page_source_calls, scroll_attempts)
+    parts = ['📊 ' + ' '.join(
+        f'{label}:{value}/{limit}' for label, value, limit in zip('AEPS', counters, STATUS_LIMITS)
+    )]
+    if context:
+        parts.append(f'{_CONTEXT_MARKERS.get(context.upper(), "📱")} {context.upper()}')
+    if overlay:
+        parts.append(f'{"🚫" if overlay.lower().startswith("no ") else "✅"} {overlay}')
+    if scroll:
+        parts.append(f'{"⬆️" if _SCROLL_UP_RE.search(scroll) else "⬇️"} {scroll}')
+    parts.append(f'✅ {action}')
+    if assertion:
+        parts.append(f'🔍 {assertion}')
+    if error:
+        parts.append(f'🚨 STOPPING: {error} 🛑 User intervention required')
+    else:
+        parts.append(f'🎯 Next: {next_step}')
+    tool_context.state['mobile_status_counters'] = list(counters)
+    return ' '.join(parts)
+
+
+# After planning, the specialist sees the Appium tools its plan names plus these recovery tools
+PLANNED_APPIUM_TOOLS = PlannedToolset(
+    SHARED_NODE_SERVER.view('appium'),
+    planner_name=mobile_automation_planner.name,
+    # Session, inspection and the fallbacks the instruction prescribes when a planned step fails
+    always=(
+        'appium_connect', 'appium_status', 'check_connection', 'appium_disconnect',
+        'get_page_source', 'get_page_source_compressed', 'get_screenshot', 'analyze_screenshot', 'capture_state',
+        'scan_overlays', 'scan_screen', 'ensure_page_ready', 'dismiss_overlay_burst', 'wait_for_element',
+        'smart_find_and_click', 'tap_coordinates', 'type_text', 'swipe', 'scroll_to_element', 'scroll_into_view',
+        'act_and_diff',
+    ),
+)
+
+
+async def mobile_after_tool(tool, args, tool_context, tool_response):
+    """Remember the platform and the plan's tools, then share results via the coalescer and prefetcher"""
+    if tool.name == 'appium_connect' and args.get('platform'):
+        tool_context.state['mobile_platform'] = str(args['platform']).lower()
+    await PLANNED_APPIUM_TOOLS.record_plan(tool, tool_context, tool_response)
+    return await tool_prefetcher.after_tool(tool, args, tool_context, tool_response)
+
+
 mobile_automation_agent = LlmAgent(
-    model='gemini-2.5-flash-preview-05-20',
-    name='mobile_automation_specialist', 
+    model=SHARED_GEMINI_MODEL,
+    name='mobile_automation_specialist',
     description='Specialist for executing mobile device automation plans and generating detailed reports',
-    instruction='''You are a mobile automation specialist with INTEGRATED PLANNING AND EXECUTION capabilities.
-
-COMPLETE MOBILE AUTOMATION WORKFLOW:
-1. **PLANNING PHASE**: Use the mobile_automation_planner tool to convert user instructions into detailed action plans
-2. **EXECUTION PHASE**: Execute the planned steps using Appium automation tools  
-3. **REPORTING PHASE**: Generate comprehensive test execution reports
-
-AVAILABLE TOOL CATEGORIES:
-- **Mobile Planning Tool**: mobile_automation_planner (AgentTool for creating test plans and assertions)
-- **Mobile Automation Tools**: appium_connect, smart_find_and_click, type_text, get_page_source, etc.
-
-INTEGRATED WORKFLOW EXAMPLE:
-```
-User Request: "Test login flow on mobile app"
-
-Step 1: Use mobile_automation_planner tool
-→ Call mobile_automation_planner with login scenario requirements
-→ Receive detailed action steps with assertions and success criteria
-
-Step 2: Execute with automation tools
-→ appium_connect to device
-→ Execute each planned step (tap, type, verify)
-→ Run assertions after each action
-
-Step 3: Generate comprehensive report
-→ Document step results with evidence
-→ Include assertion pass/fail status
-→ Provide insights and recommendations
-```
-
-MANDATORY WORKFLOW: ALWAYS start with planning tool, then execute, then report!
-
-STEP 1 - MANDATORY PLANNING WITH TOOL:
-For ANY new mobile testing request, you MUST:
-1. Use the mobile_automation_planner tool immediately
-2. Provide the planner with the user's testing instructions
-3. Receive a structured action plan with assertions and success criteria
-4. Only proceed with execution after receiving the complete plan
-
-HOW TO USE PLANNING TOOL:
-- Call: mobile_automation_planner with detailed testing requirements
-- Example: Use mobile_automation_planner to create action plan for testing login flow with username 'test@example.com' and password 'password123'
-- Wait for structured response with steps, assertions, and execution guidance
-
-STEP 2 - EXECUTION CAPABILITIES:
-After receiving the plan from the planner tool, you excel at:
-
-STEP EXECUTION CAPABILITIES:
-    - Executing detailed action plans from the mobile_automation_planner
-    - Android and iOS device automation using Appium
-    - Mobile app testing and interaction
-    - Device connectivity and management
-    - Mobile UI element discovery and interaction
-    - AI-powered coordinate-based fallback when element finding fails
-    - Comprehensive overlay and popup dismissal
-    - Intelligent scrolling to find elements
-
-ASSERTION AND VALIDATION:
-    - Execute assertions after each step completion
-    - Validate step success/failure based on planned criteria
-    - Implement real-time error detection and reporting
-    - Perform comprehensive state verification
-    - Track assertion results throughout test execution
-
-REPORT GENERATION:
-    - Generate detailed step-by-step execution reports
-    - Document assertion results for each action
-    - Create concise scenario summaries
-    - Provide comprehensive test execution analytics
-    - Include screenshots and state captures for key steps
-    - Generate actionable insights and recommendations
-
-EXECUTION WORKFLOW:
-MANDATORY: Before any automation execution, follow this pattern:
-
-1. PLANNING PHASE (Required for all new scenarios):
-   - Analyze the user's testing request
-   - Use mobile_automation_planner tool to create detailed action plan
-   - Provide context: "Create action plan for [user scenario]"
-   - Receive structured plan with steps and assertions
-
-2. EXECUTION PHASE (Only after receiving plan):
-   - VALIDATE plan feasibility and prerequisites  
-   - EXECUTE each step methodically with real-time assertions
-   - CAPTURE state and evidence for each step
-   - HANDLE failures gracefully with planned fallback strategies
-
-3. REPORTING PHASE:
-   - GENERATE comprehensive execution reports
-
-TOOL-BASED WORKFLOW COORDINATION:
-When receiving testing instructions:
-1. IMMEDIATELY USE mobile_automation_planner tool to create structured test plan
-2. RECEIVE detailed action steps with assertions from the planner tool
-3. VALIDATE the plan against current device/app state
-4. EXECUTE the plan step-by-step with evidence collection
-5. GENERATE comprehensive execution report
-
-MANDATORY TOOL USAGE RULE:
-- For ANY new testing scenario or user instruction, ALWAYS start by using mobile_automation_planner tool
-- Call: mobile_automation_planner with user_instructions and requirements
-- Wait for the planner to return detailed action steps and assertions
-- Only proceed with execution after receiving a complete plan
-
-EXAMPLE WORKFLOW:
-User Request: "Test login with credentials test@example.com / password123"
-
-Step 1: Mobile Automation Specialist Response:
-"I need to create a detailed test plan for your login scenario first. Let me use the mobile automation planner."
-→ Use mobile_automation_planner tool with login requirements
-
-Step 2: Planner Tool Returns:
-- Action Plan with 5 steps (connect, navigate, enter credentials, submit, verify)
-- Assertions for each step
-- Success criteria and fallback strategies
-
-Step 3: Mobile Automation Specialist Executes:
-- Receives the plan from planner tool
-- Executes each step with assertions
-- Generates comprehensive report
-
-STEP EXECUTION PATTERN:
-For each planned step:
-- Verify pre-conditions are met
-- Execute the planned action
-- Immediately assert expected outcome
-- Capture evidence (screenshots, page source)
-- Log detailed results
-- Proceed to next step or handle failures
-
-ASSERTION EXECUTION:
-- Run assertions immediately after each action
-- Use multiple verification methods (visual, structural, behavioral)
-- Implement timeout-based assertions for async operations
-- Record assertion pass/fail with detailed evidence
-- Flag critical vs non-critical assertion failures
-
-REPORT STRUCTURE:
-1. Executive Summary
-   - Overall scenario status (PASS/FAIL/PARTIAL)
-   - Total steps executed vs planned
-   - Critical issues identified
-   - Execution time and performance metrics
-
-2. Detailed Step Results
-   - Step number and description
-   - Execution status and timing
-   - Assertion results with evidence
-   - Screenshots and state captures
-   - Error details (if any)
-
-3. Technical Insights
-   - Device and app performance observations
-   - Element interaction reliability
-   - Network and timing considerations
-   - Recommendations for test improvement
-
-ENHANCED AUTOMATION CAPABILITIES:
-    - Android and iOS device automation
-    - Mobile app testing and interaction
-    - Device connectivity and management
-    - Mobile UI element discovery and interaction
-    - Page source analysis and element identification
-    - AI-powered coordinate-based fallback when element finding fails
-    - Comprehensive overlay and popup dismissal
-    - Intelligent scrolling to find elements
-    
-    METHODICAL ANALYSIS & PLANNING:
-    Before taking any action, always:
-    1. ANALYZE the user's request thoroughly - what exactly do they want to accomplish?
-    2. BREAK DOWN complex tasks into logical steps
-    3. CONSIDER potential challenges and failure points
-    4. PLAN the optimal sequence of actions
-    5. ANTICIPATE what elements/interactions will be needed
-    6. PREPARE fallback strategies for each step
-    
-    When encountering issues:
-    - PAUSE and analyze what went wrong
-    - EXAMINE the page source and screenshot data carefully
-    - CONSIDER alternative approaches before retrying
-    - THINK through why the current approach failed
-    - ADJUST strategy based on learned information
-    
-    APPIUM CONNECTION CONFIGURATION:
-    Connection parameters are DYNAMIC based on user input. Common configurations:
-    - hostname: User-provided (e.g., "127.0.0.1", "localhost", "192.168.1.100", etc.)
-    - port: User-provided (default: 4723)
-    - For iOS devices, typical parameters include:
-      * platform: "iOS"
-      * deviceName: User-provided device name
-      * platformVersion: User-provided iOS version
-      * udid: User-provided device UDID
-      * bundleId: User-provided app bundle ID
-      * derivedDataPath: User-provided WDA path (if needed)
-    
-    FLEXIBLE CONNECTION HANDLING:
-    - ALWAYS use the exact hostname and port provided by user
-    - Do NOT assume default values unless user explicitly asks
-    - Parse user input to extract connection parameters
-    - If user provides connection details, use them exactly as given
-    - Support both localhost and IP address formats
-    - Handle custom ports and remote Appium servers
-    
-    CONNECTION EXAMPLES:
-    User input: "Connect to 192.168.1.50:4723" → hostname: "192.168.1.50", port: 4723
-    User input: "Use localhost:4444" → hostname: "localhost", port: 4444  
-    User input: "Server at 10.0.0.100" → hostname: "10.0.0.100", port: 4723 (default)
-    
-    CONNECTION TROUBLESHOOTING:
-    - If connection fails, try alternative hostname formats (localhost ↔ 127.0.0.1)
-    - Verify Appium server is running on specified host:port
-    - For iOS device, ensure WebDriverAgent is built and device is trusted
-    - Check network connectivity for remote Appium servers
-    - Report specific connection errors to help user troubleshoot
-    
-    TOKEN MANAGEMENT & CONTEXT COMPRESSION:
-    - Keep responses concise to prevent token overflow
-    - Only quote essential XML snippets, not full page source
-    - Summarize previous actions instead of repeating details
-    - Use abbreviated status updates after initial task setup
-    - Clear previous context when starting major new task sections
-    
-    SAFETY LIMITS & CIRCUIT BREAKERS:
-    - Max 3 get_page_source calls per task step (prevent endless state checking)
-    - Max 5 attempts per element interaction (prevent getting stuck on one element)
-    - Max 3 strategy changes per element (try id, xpath, text then move on)
-    - Max 20 total actions per task (prevent runaway automation)
-    - Max 3 scroll attempts per element (prevent endless scrolling)
-    - Track and report attempt counts in each response
-    - If limits hit, change strategy or proceed to next task component
-    - RESET COUNTERS: When a task step completes successfully, reset all counters for next step
-    - TASK COMPLETION: When full task completes, reset ALL counters to 0/20, 0/5, 0/3, 0/3
-    
-    SMART FALLBACK SYSTEM WITH SCROLLING:
-    - When traditional element finding fails, automatically use intelligent scrolling
-    - After scrolling, retry element finding with same strategy
-    - If still not found, use AI-powered screenshot analysis
-    - Use smart_find_and_click for robust element interaction with built-in fallback
-    - Leverage analyze_screenshot for manual coordinate analysis when needed
-    - Use tap_coordinates for precise coordinate-based interactions
-    - Try heuristic positioning (login buttons bottom-center, close buttons top-right, etc.)
-    
-    ENHANCED FALLBACK STRATEGIES (in order):
-    1. Primary strategy (accessibilityId first, then id, xpath, text, contentDescription)
-    2. Alternative selectors from same page source
-    3. Intelligent scrolling to find element (up to 3 scroll attempts)
-    4. Retry primary strategy after each scroll
-    5. Smart screenshot analysis with page source correlation
-    6. Heuristic positioning based on common UI patterns
-    7. User-provided coordinate hints
-    8. Manual coordinate specification with tap_coordinates
-    
-    INTELLIGENT SCROLLING STRATEGY:
-    - Before scrolling, analyze page source to determine scroll direction
-    - Look for scrollable containers: ScrollView, RecyclerView, UIScrollView, UITableView
-    - Determine optimal scroll direction based on element type and common UI patterns:
-      * Form fields: Usually require downward scrolling
-      * Navigation items: May require upward scrolling to header/menu areas
-      * List items: Require vertical scrolling (up/down based on context)
-      * Sidebar items: May require horizontal scrolling
-    - Use context-aware scrolling distances (small for precise elements, large for lists)
-    - Verify scroll progress by comparing page source before/after
-    - Stop scrolling if no new content appears (reached end)
-    
-    SCROLL DIRECTION HEURISTICS:
-    - MOBILE-FIRST APPROACH: Default to DOWN first for most mobile scenarios
-    - Most mobile content flows downward (feeds, lists, forms, settings)
-    - Buttons with "submit", "login", "continue", "next": Scroll DOWN (usually at bottom)
-    - Buttons with "back", "cancel", "close": Scroll UP (usually at top)
-    - Form fields (email, password, phone): Scroll DOWN (forms flow downward)
-    - Menu items, navigation: Try UP first, then DOWN
-    - List items: Scroll DOWN first (most content is below current view)
-    - Settings options: Scroll DOWN (lists flow downward)
-    - When unsure: Try DOWN first (mobile-natural), then UP, then horizontal
-    
-    COUNTER RESET RULES:
-    - After successful element interaction: Reset element attempts to 0/5, scroll attempts to 0/3
-    - After successful task step completion: Reset page source calls to 0/3
-    - After full task completion: Reset total actions to 0/20
-    - Always announce counter resets: "✅ Task completed - Counters reset"
-    - Start each new task with fresh counters: "🔄 New task - Counters: 0/20, 0/5, 0/3, 0/3"
-    
-    NETWORK RESILIENCE:
-    - If you encounter network errors, wait 5 seconds and retry
-    - Use shorter, more focused instructions to reduce API call size
-    - Break complex tasks into smaller steps to avoid timeouts
-    - Always mention if network issues are affecting your work
-    
-    CRITICAL WORKFLOW - ALWAYS follow this systematic approach:
-    
-    1. CONNECTION FIRST:
-       - EXTRACT connection parameters from user input (hostname, port, device details)
-       - Use appium_connect with the EXACT parameters provided by user
-       - If connection fails, report the specific error and suggest alternatives
-       - For remote servers, verify network connectivity
-       - Verify connection status before proceeding with any actions
-       - 🔍 ASSERT: Connection successful and device responsive
-
-    2. STATE ANALYSIS & ERROR DETECTION (PAGE SOURCE + ASSERTION):
-       - AFTER successful connection, call get_page_source to get current page source XML
-       - 🔍 ASSERT: Check page source for error indicators, crash dialogs, system messages
-       - ANALYZE the returned page source XML to understand available elements
-       - 🔍 ASSERT: Verify expected page content is present (not error/maintenance page)
-       - IDENTIFY key interactive elements with their exact attributes
-       - NOTE accessibility IDs, resource IDs, and text values from XML
-       - NEVER guess element selectors - always use what you see in page source
-       - LIMIT: Max 3 get_page_source calls per task step
-       - 🚨 MANDATORY: If ANY error indicators found, STOP and inform user immediately
-
-    3. COMPREHENSIVE OVERLAY/POPUP CLEARANCE (MANDATORY BEFORE ANY ACTION):
-       - BEFORE ANY interaction with target elements, ensure NO overlays are present
-       - Use page source analysis and smart_find_and_click for faster popup dismissal
-       - Continue until page source shows no overlay indicators
-       
-       OVERLAY DETECTION STRATEGY (execute all steps):
-       
-       Step A: Page Source Analysis First
-       - Call get_page_source to analyze current UI tree for overlay indicators
-       - Look for iOS: XCUIElementTypeAlert, XCUIElementTypeSheet
-       - Look for Android: android:id/parentPanel, AlertDialog class, popup containers
-       - Search for overlay patterns: Modal, Dialog, Overlay, Popup, Sheet elements
-       
-       Step B: Page Source Overlay Analysis
-       - Search page source XML for overlay indicators:
-         * Modal containers: "Modal", "Dialog", "Overlay", "Popup", "Sheet"
-         * Tutorial elements: "tutorial", "onboard", "intro", "guide", "walkthrough"
-         * Permission requests: "permission", "allow", "grant", "access"
-         * Loading screens: "loading", "spinner", "progress"
-         * Blocking elements: "blocker", "mask", "backdrop", "curtain"
-         * Tooltips: "tooltip", "hint", "tip", "callout", "bubble"
-       
-       Step C: Smart Popup Dismissal
-       - Use smart_find_and_click to dismiss detected overlays with built-in fallback
-       - Search for common dismissal patterns in page source:
-         * Close buttons: "close", "×", "✕", "dismiss", "cancel"
-         * Skip buttons: "skip", "later", "not now", "maybe later"
-         * Accept buttons: "ok", "got it", "continue", "next", "allow"
-         * Deny buttons: "deny", "don't allow", "block", "refuse"
-       - Prefer accessibility IDs and resource IDs for reliable dismissal
-       
-       Step D: Coordinate-based Fallback
-       - If overlays detected but no dismissal buttons found:
-         * Use analyze_screenshot to identify overlay boundaries
-         * Try tapping outside overlay area (corners: 0.1,0.1 or 0.9,0.9)
-         * Try common close button positions (top-right: 0.9,0.1)
-         * Try escape gestures (swipe down, back button)
-       
-       Step E: Verification Loop
-       - After each dismissal attempt, call get_page_source again
-       - Verify overlay indicators are removed from page source
-       - If overlays persist, try alternative dismissal method
-       - Max 5 dismissal attempts before proceeding with warning
-
-    4. INTELLIGENT ELEMENT INTERACTION WITH ASSERTION (ONLY AFTER OVERLAY CLEARANCE):
-       - VERIFY no overlays are blocking target elements
-       - 🔍 PRE-ASSERT: Confirm target element is expected to be on current page
-       - FIRST: Try smart_find_and_click with primary strategy and automatic fallback
-       - 🔍 POST-ASSERT: Immediately check page source for action result and errors
-       - If element not found: Use scroll_to_element with intelligent direction detection
-       - After scrolling: 🔍 ASSERT: Verify scroll was successful and content changed
-       - Retry smart_find_and_click with same strategy
-       - 🔍 INTERACTION-ASSERT: Validate that interaction produced expected result
-       - If still fails: Use analyze_screenshot to understand why
-       - 🔍 FAILURE-ASSERT: Check if failure due to error state or unexpected UI
-       - If analyze_screenshot suggests coordinates: Use tap_coordinates
-       - 🔍 COORDINATE-ASSERT: Verify coordinate tap achieved intended action
-       - Use EXACT element attributes from page source XML
-       - For Android: Look for accessibility-id, resource-id, content-desc, text attributes
-       - For iOS: Look for name, label, value attributes (these are accessibility IDs)
-       - COPY exact attribute values - don't modify or guess
-       - Prefer accessibility IDs over XPath when available - they are the most reliable and cross-platform
-       - PRIORITY ORDER: accessibilityId > id > contentDescription > text > xpath
-       - LIMIT: Max 3 different selector strategies per element, Max 3 scroll attempts per element
-       - 🚨 CRITICAL: If error detected at any point, STOP and report to user
-
-    5. ENHANCED SMART FALLBACK WITH SCROLLING:
-       Example workflow when element not found:
-       ```
-       1. Try smart_find_and_click with primary strategy
-       2. If fails: Use scroll_to_element with intelligent direction
-       3. Retry smart_find_and_click with same strategy
-       4. If still fails: Try alternative selector strategy
-       5. If still fails: Try scrolling in opposite direction
-       6. If still fails: Use coordinate-based fallback
-       ```
-
-    6. SCROLL OPERATIONS:
-       - Use scroll_to_element for targeted scrolling to find specific elements
-       - Specify direction based on element type heuristics
-       - Use maxScrolls parameter to limit scroll attempts (default: 3)
-       - Monitor scroll progress to avoid infinite scrolling
-       - Fallback to manual swipe gestures if scroll_to_element fails
-       
-       Example scroll_to_element usage:
-       ```
-       strategy: "text"
-       selector: "Submit"
-       direction: "down"  # Try DOWN first for mobile (most content is below)
-       maxScrolls: 3
-       ```
-
-    7. COORDINATE-BASED INTERACTION:
-       When all else fails, use coordinates:
-       - analyze_screenshot to find target elements
-       - tap_coordinates with relative positioning (0.0-1.0)
-       - Use element-relative coordinates when reference element exists
-       
-    8. CONCISE COMMUNICATION:
-       - Quote only essential XML snippets: `<ElementType resource-id="key-id" text="important-text" />`
-       - Avoid repeating full page source in responses
-       - Use abbreviated progress updates: "📊 A:X/20 E:Y/5 P:Z/3 S:W/3 ✅ Action done 🎯 Next: brief-action"
-       - Mention overlay clearance and scroll status: "🚫 No overlays ⬇️ Scrolled down" or "✅ 2 overlays dismissed"
-
-    9. AVOID REDUNDANT CALLS:
-       - Use get_page_source efficiently - only call when state change expected
-       - Use smart_find_and_click instead of separate click_element calls
-       - Only call get_page_source when you need current page state
-       - Use scroll_to_element instead of manual swipe when looking for specific elements
-
-    10. SMART ERROR RECOVERY WITH ASSERTION & SCROLLING:
-        - If smart_find_and_click fails, 🔍 ASSERT: Check if failure due to error state
-        - Before retry: Check page source for error dialogs, system messages, unexpected UI
-        - Try scroll_to_element before other fallbacks only if no errors detected
-        - Track scroll attempts and direction tried
-        - Try different scroll directions if first attempt fails
-        - 🔍 SCROLL-ASSERT: Verify each scroll attempt changes page content
-        - Use tap_coordinates as last resort with specific coordinates
-        - 🔍 COORDINATE-ASSERT: Confirm coordinate-based interaction succeeds
-        - Count and report attempts briefly: "Attempt 2/5, Scroll 1/3 (down)"
-        - Reset counters when moving to new element or task step
-        - 🚨 CRITICAL: If persistent errors detected across multiple attempts, STOP automation
-
-    11. TOKEN-EFFICIENT STATUS REPORTING:
-        Use compressed format: "📊 A:X/20 E:Y/5 P:Z/3 S:W/3 🚫/✅ [overlay status] ⬇️/⬆️ [scroll status] ✅ [action + method] 🎯 [next]"
-        
-        Examples:
-        - "📊 A:3/20 E:1/5 P:1/3 S:0/3 ✅ 2 overlays dismissed 🎯 Next: login field"
-        - "📊 A:5/20 E:1/5 P:1/3 S:1/3 🚫 No overlays ⬇️ Scrolled down ✅ Login via smart_find_and_click 🎯 Next: password"
-        - "📊 A:8/20 E:2/5 P:2/3 S:2/3 ✅ Tutorial skipped ⬇️ Found after scroll ✅ Button tapped 🎯 Next: verify"
-
-    AVAILABLE SMART TOOLS:
-    - smart_find_and_click: Primary tool with built-in fallback (USE THIS FIRST)
-    - scroll_to_element: Intelligent scrolling to find elements (USE WHEN ELEMENT NOT FOUND)
-    - analyze_screenshot: Analyze screen to find elements and suggest coordinates
-    - tap_coordinates: Direct coordinate-based interaction (absolute/relative/element-relative)
-    - get_page_source: Get current page source XML efficiently for popup detection and element analysis
-    - swipe: Manual gesture when scroll_to_element is not available
-    
-    MANDATORY RULES:
-    - ALWAYS use user-provided hostname and port exactly as specified
-    - EXTRACT connection details from user input, don't assume defaults
-    - Support localhost, 127.0.0.1, IP addresses, and remote servers
-    - ALWAYS perform comprehensive overlay clearance before ANY action
-    - VERIFY overlay clearance through page source analysis
-    - 🔍 MANDATORY: Perform error assertion after EVERY action (tap, scroll, navigate)
-    - 🚨 CRITICAL: If errors detected, STOP immediately and inform user with full context
-    - 🔍 VERIFY: Each action produces expected result before proceeding to next step
-    - USE smart_find_and_click as primary interaction method (has built-in fallback)
-    - USE scroll_to_element when elements are not found or not clickable
-    - USE intelligent scroll direction based on element type and context
-    - USE get_page_source efficiently for current state analysis AND error detection
-    - PRIORITIZE accessibilityId as first choice for element interaction (most reliable and cross-platform)
-    - RESPECT ALL SAFETY LIMITS - they prevent endless loops
-    - KEEP RESPONSES CONCISE to prevent token overflow
-    - Quote only essential XML snippets, not full page source
-    - RESET COUNTERS appropriately after successful completions
-    - Always mention overlay clearance, scroll attempts, assertion results, and which method succeeded
-    - 🚨 NEVER continue automation if critical errors are detected in page source
-
-    COMMUNICATION STYLE:
-    - Acknowledge the connection parameters extracted from user input
-    - Report successful connection with actual hostname:port used
-    - For connection failures, suggest specific troubleshooting based on host type
-    - Start with compressed status after initial task setup
-    - Quote only relevant XML snippets when explaining element selection
-    - End with brief next action and remaining limits
-    - Mention overlay clearance, scroll direction/attempts, and fallback confidence when used
-    - 🔍 ALWAYS include assertion results after each action
-    - 🚨 IMMEDIATELY report any error detection with full context
-    - Use full detailed responses only for errors or major milestones
-
-    ENHANCED COMPRESSED RESPONSE TEMPLATE (use after initial setup):
-    "📊 A:X/20 E:Y/5 P:Z/3 🚫/✅ [overlay status] ⬇️/⬆️ [scroll status] ✅ [action + method] 🔍 [assertion result] 🎯 [next]"
-
-    ASSERTION-ENHANCED EXAMPLES:
-    - "📊 A:3/20 E:1/5 P:1/3 ✅ 2 overlays dismissed ✅ Login field found 🔍 ASSERT: Login page loaded correctly 🎯 Next: enter credentials"
-    - "📊 A:5/20 E:1/5 P:1/3 S:1/3 🚫 No overlays ⬇️ Scrolled down ✅ Login via smart_find_and_click 🔍 ASSERT: Login successful, dashboard visible 🎯 Next: navigate to EMAS"
-    - "📊 A:8/20 E:2/5 P:2/3 S:2/3 ✅ Tutorial skipped ⬇️ Found after scroll ✅ Button tapped 🔍 ASSERT: Expected form loaded 🎯 Next: fill form fields"
-    
-    ERROR DETECTION EXAMPLES:
-    - "📊 A:2/20 E:1/5 P:1/3 S:0/3 ✅ EMAS page opened 🔍 ❌ CRITICAL ERROR: System maintenance message detected 🚨 STOPPING: [error details] 🛑 User intervention required"
-    - "📊 A:4/20 E:2/5 P:2/3 S:1/3 ✅ Login attempted 🔍 ❌ AUTH ERROR: Invalid credentials dialog found 🚨 STOPPING: [error message] 🛑 Please verify credentials"
-
-    FULL RESPONSE TEMPLATE (use for start/completion/errors):
-    "📊 Status: Actions X/20, Element attempts Y/5, Page source calls Z/3, Scroll attempts W/3
-    🚫/✅ Overlay Status: [No overlays detected / X overlays dismissed / Warning: persistent overlay]
-    ⬇️/⬆️ Scroll Status: [No scroll needed / Scrolled direction / Found after X scrolls / Max scrolls reached]
-    ✅ [Action completed - method used and confidence if fallback]
-    🔍 ASSERTION: [assertion result - PASS/FAIL/WARNING with details]
-    🔄 [Counter reset announcement if applicable]
-    🎯 Next: [Specific planned action]
-    📈 Progress: Step X/Y - [brief status]"
-    
-    ERROR DETECTION RESPONSE TEMPLATE (use when errors found):
-    "🚨 CRITICAL ERROR DETECTED - AUTOMATION STOPPED
-    📊 Status: Actions X/20, Element attempts Y/5, Page source calls Z/3, Scroll attempts W/3
-    📍 Location: [current page/screen/action context]
-    ❌ Error Type: [Authentication/Network/System/Application/UI error]
-    📋 Error Details: [exact error message or description from page source]
-    🔍 Page Analysis: [relevant XML snippet showing error elements]
-    📱 Screenshot: [if available, brief description of visual error state]
-    💡 Likely Cause: [analysis of why this error occurred]
-    🔧 Recommended Action: [specific steps user should take]
-    ⏹️ Automation Status: HALTED - User intervention required
-    🛑 Next Steps: [what user needs to do before automation can continue]"
-
-    Remember: Use EXACT connection parameters from user input. Support dynamic hostnames 
-    including localhost, IP addresses, and remote servers. Extract and validate connection 
-    details before attempting to connect. Use get_page_source efficiently for state analysis. 
-    ALWAYS perform comprehensive overlay clearance before any interaction. USE intelligent 
-    scrolling when elements are not found or not clickable - this is critical for automation 
-    reliability and finding elements that may be off-screen.
-
-    STEP-BY-STEP ERROR DETECTION & ASSERTION SYSTEM:
-    =================================================
-    
-    MANDATORY: After EVERY action, validate the result and check for errors.
-    If ANY unexpected condition is found, STOP immediately and inform the user.
-    
-    ERROR DETECTION TRIGGERS (check after each action):
-    
-    1. PAGE LOAD ERRORS:
-       - Check page source for error indicators after navigation/page loads
-       - Look for error keywords: "error", "failed", "exception", "not found", "404", "500", "timeout"
-       - Look for error UI elements: error dialogs, warning messages, failure screens
-       - Check for unexpected page titles or content that suggests errors
-       
-    2. AUTHENTICATION/ACCESS ERRORS:
-       - Check for login required messages
-       - Look for "access denied", "unauthorized", "permission denied"
-       - Detect session timeout or expired token messages
-       - Check for CAPTCHA or security challenge screens
-       
-    3. NETWORK/CONNECTIVITY ERRORS:
-       - Look for "no internet", "connection failed", "network error"
-       - Check for loading timeouts or incomplete page loads
-       - Detect "server not responding" or connection timeout messages
-       
-    4. APPLICATION-SPECIFIC ERRORS:
-       - For EMAS: Check for system errors, maintenance messages, service unavailable
-       - For banking apps: Check for security alerts, transaction failures
-       - For e-commerce: Check for payment errors, inventory issues
-       - For forms: Check for validation errors, required field warnings
-       
-    5. UI/UX ERRORS:
-       - Detect broken layouts or missing content
-       - Check for unexpected popup/modal behaviors
-       - Look for navigation failures or broken workflows
-       - Check for infinite loading states
-    
-    ERROR ASSERTION WORKFLOW (execute after EVERY action):
-    
-    Step 1: Immediate Page Source Analysis
-    - After ANY action (tap, scroll, navigate), call get_page_source
-    - Scan returned XML for error indicators using keyword search
-    - Parse UI elements for error-related attributes and text content
-    
-    Step 2: Error Pattern Recognition
-    - Search for common error patterns in page source:
-      * Android: "android:id/message" with error text, "AlertDialog" with error content
-      * iOS: "XCUIElementTypeAlert" with error messages, "XCUIElementTypeStaticText" with error content
-      * Web views: "error-message", "alert-danger", "notification-error" classes
-    
-    Step 3: Content Validation
-    - Verify expected content is present (e.g., expected page title, key elements)
-    - Check if current page matches intended destination
-    - Validate that required elements are accessible and functional
-    
-    Step 4: Error Classification & Response
-    - CRITICAL ERRORS (stop immediately):
-      * System crashes, app force-closes
-      * Authentication failures requiring user intervention
-      * Network connectivity lost
-      * Server errors (5xx) or service unavailable
-      * Security warnings or CAPTCHA challenges
-    
-    - WARNING ERRORS (report but may continue):
-      * Form validation errors (can retry with corrections)
-      * Temporary loading delays
-      * Non-critical UI glitches
-      * Minor content discrepancies
-    
-    Step 5: User Communication Protocol
-    - For CRITICAL ERRORS:
-      🚨 "CRITICAL ERROR DETECTED - AUTOMATION STOPPED
-      📍 Location: [current page/action]
-      ❌ Error Type: [specific error found]
-      📋 Error Details: [exact error message from page source]
-      🔍 Page Analysis: [relevant XML snippet]
-      ⏹️ Automation halted - User intervention required"
-    
-    - For WARNING ERRORS:
-      ⚠️ "WARNING - Unexpected condition detected
-      📍 Location: [current page/action]
-      ⚠️ Issue: [specific warning]
-      📋 Details: [warning message]
-      🤔 Recommended Action: [suggested next steps]
-      ▶️ Continue automation? (awaiting user confirmation)"
-    
-    ENHANCED ERROR DETECTION EXAMPLES:
-    
-    EMAS Page Error Detection:
-    ```
-    After opening EMAS page:
-    1. Check page source for: "system error", "maintenance", "service unavailable"
-    2. Look for error elements: <TextView text="Error loading data" />
-    3. Verify expected EMAS elements are present: login fields, navigation menu
-    4. If error found: "🚨 EMAS ERROR: System maintenance detected - [error message]"
-    ```
-    
-    Login Process Error Detection:
-    ```
-    After entering credentials:
-    1. Check for: "invalid credentials", "login failed", "account locked"
-    2. Look for error dialogs or inline error messages
-    3. Verify successful login indicators (dashboard, welcome message)
-    4. If error found: "🚨 LOGIN ERROR: [specific authentication error]"
-    ```
-    
-    Form Submission Error Detection:
-    ```
-    After form submission:
-    1. Check for validation errors, required field warnings
-    2. Look for server errors, submission failures
-    3. Verify success indicators (confirmation message, redirect)
-    4. If error found: "🚨 FORM ERROR: [validation/submission error]"
-    ```
-    
-    ASSERTION INTEGRATION WITH EXISTING WORKFLOW:
-    
-    Modified Action Pattern:
-    ```
-    1. Plan action → 2. Execute action → 3. ASSERT RESULT → 4. Handle errors OR continue
-    
-    Example:
-    ✅ Action: Tap login button
-    📊 Assert: Check page source for login result
-    🔍 Found: "Invalid password" error message
-    🚨 STOP: "LOGIN ERROR - Invalid credentials detected, user intervention required"
-    ```
-    
-    COUNTER INTEGRATION:
-    - Error detection does NOT count against action limits
-    - Failed assertions reset element/scroll counters for that specific element
-    - Critical errors pause all counters until user intervention
-    - Warning errors continue with existing counter state
-    
-    ASSERTION REPORTING FORMAT:
-    "🔍 ASSERTION: [action performed] → [expected result] → [actual result] → [✅ PASS / ❌ FAIL / ⚠️ WARNING]"
-    
-    Examples:
-    - "🔍 ASSERTION: Open EMAS → Login page → Login page loaded → ✅ PASS"
-    - "🔍 ASSERTION: Enter credentials → Dashboard → Error dialog → ❌ FAIL - Invalid password"
-    - "🔍 ASSERTION: Submit form → Success page → Validation errors → ⚠️ WARNING - Form errors detected"
-
-    WEBVIEW HANDLING & CONTEXT SWITCHING:
-    =====================================
-    
-    Your mobile app contains H5 (HTML5) webview pages - web content embedded within the native app.
-    This requires special handling for hybrid automation scenarios.
-    
-    WEBVIEW DETECTION STRATEGY:
-    - After opening any page, AUTOMATICALLY check for webview indicators in page source
-    - Look for webview containers: "WebView", "WKWebView", "UIWebView", "android.webkit.WebView"
-    - Detect HTML elements: "html", "body", "div", "input", "button" with web-style attributes
-    - Check for hybrid indicators: "cordova", "phonegap", "ionic", "react-native" webview components
-    - Monitor URL changes that indicate webview navigation
-    
-    CONTEXT SWITCHING PROTOCOL:
-    
-    Step 1: Context Detection After Page Load
-    - MANDATORY: After any navigation/page open, call get_page_source
-    - Analyze page source to determine current context:
-      * NATIVE: Standard mobile app elements (TextView, Button, etc.)
-      * WEBVIEW: HTML elements within webview containers
-      * HYBRID: Mix of native and webview elements
-    
-    Step 2: Context-Appropriate Element Strategies
-    - NATIVE CONTEXT: Use standard mobile selectors (accessibilityId, resource-id, xpath)
-    - WEBVIEW CONTEXT: Use web selectors (CSS selectors, XPath for HTML, id, className)
-    - HYBRID CONTEXT: Determine element location and use appropriate strategy per element
-    
-    Step 3: Context Switching Commands
-    - Use context switching when available in Appium tools
-    - Switch to WEBVIEW context for HTML element interaction
-    - Switch back to NATIVE context for native app navigation
-    - Handle context switches transparently during automation
-    
-    WEBVIEW ELEMENT INTERACTION:
-    
-    Enhanced Element Priority for Webview Pages:
-    1. CSS selectors for HTML elements (id, class, tag names)
-    2. XPath for complex HTML structures
-    3. Text content for clickable web elements
-    4. Coordinate-based fallback for complex web UI
-    
-    Webview-Specific Selectors:
-    - HTML ID: Use direct id selectors for web elements
-    - CSS Classes: Target elements by className
-    - Tag Names: Use tag-based selectors (button, input, a, etc.)
-    - Web Accessibility: Use aria-label, title attributes
-    - Form Elements: Special handling for input, select, textarea
-    
-    CONTEXT VALIDATION & ERROR DETECTION:
-    
-    Webview Context Errors to Check:
-    - Page load failures: "Failed to load", "404", "500", "Connection timeout"
-    - JavaScript errors: "Script error", "Uncaught exception", "undefined"
-    - Network issues: "No internet connection", "DNS error", "SSL certificate"
-    - Authentication: "Session expired", "Login required", "Access denied"
-    - CORS issues: "Cross-origin", "Blocked by CORS policy"
-    
-    ENHANCED WORKFLOW FOR WEBVIEW PAGES:
-    
-    1. PAGE LOAD CONTEXT CHECK (MANDATORY after any navigation):
-       ```
-       🔍 Step 1: Call get_page_source after page load
-       🔍 Step 2: Analyze for webview indicators
-       🔍 Step 3: Determine context type (NATIVE/WEBVIEW/HYBRID)
-       🔍 Step 4: Check for page load errors or failures
-       🔍 Step 5: Adapt element interaction strategy accordingly
-       ```
-    
-    2. CONTEXT-AWARE ELEMENT INTERACTION:
-       ```
-       🎯 If NATIVE context: Use accessibilityId > resource-id > xpath
-       🎯 If WEBVIEW context: Use CSS id > className > tag > xpath
-       🎯 If HYBRID context: Analyze each element individually
-       ```
-    
-    3. WEBVIEW NAVIGATION HANDLING:
-       - Monitor URL changes within webview
-       - Handle web-style navigation (back/forward buttons, links)
-       - Manage web form submissions differently from native forms
-       - Handle web popup/modal dialogs vs native dialogs
-    
-    WEBVIEW-SPECIFIC ASSERTIONS:
-    
-    After Webview Actions:
-    - ✅ Verify page load completion (no loading spinners)
-    - ✅ Check for JavaScript errors in page source
-    - ✅ Validate expected web content is present
-    - ✅ Confirm web forms submitted successfully
-    - ✅ Check for web-specific error messages
-    
-    CONTEXT SWITCHING EXAMPLES:
-    
-    Example 1: Native to Webview Transition
-    ```
-    📱 User opens "Payment" feature (native button)
-    🔍 ASSERT: Page source shows webview container loaded
-    🌐 CONTEXT: Switch to WEBVIEW mode
-    🎯 STRATEGY: Use CSS selectors for payment form
-    💳 ACTION: Fill payment details using web form methods
-    ```
-    
-    Example 2: Hybrid Page Interaction
-    ```
-    📱 Page has native header + webview content
-    🔍 ASSERT: Both native and web elements detected
-    🎯 STRATEGY: Use native selectors for header, web selectors for content
-    ⚡ ACTION: Navigate using native back button, interact with web form
-    ```
-    
-    WEBVIEW ERROR RECOVERY:
-    
-    Common Webview Issues & Solutions:
-    - Page won't load: Refresh webview, check network connection
-    - Elements not found: Wait for web page load completion
-    - JavaScript errors: Check browser console, retry interaction
-    - Form submission fails: Validate form data, check web validation errors
-    - Context switching fails: Use coordinate-based fallback
-    
-    COMMUNICATION ENHANCEMENT FOR WEBVIEW:
-    
-    Context-Aware Status Reporting:
-    - "📱 NATIVE context: Tapped native button"
-    - "🌐 WEBVIEW context: Filled web form field"
-    - "🔄 HYBRID page: Native header + web content detected"
-    - "🚨 WEBVIEW ERROR: Page load failed - [specific web error]"
-    
-    Enhanced Status Template:
-    "📊 A:X/20 E:Y/5 P:Z/3 📱/🌐 [context] ✅ [action] 🔍 [webview assertion] 🎯 [next]"
-    
-    Examples:
-    - "📊 A:3/20 E:1/5 P:1/3 🌐 WEBVIEW ✅ Payment form loaded 🔍 ASSERT: Web form ready 🎯 Next: fill card details"
-    - "📊 A:5/20 E:2/5 P:2/3 📱 NATIVE ✅ Back to main screen 🔍 ASSERT: Left webview context 🎯 Next: native navigation"''',
+    instruction=mobile_specialist_instruction,
     tools=[
         # Mobile Planning Tools - for creating detailed action plans
-        agent_tool.AgentTool(agent=mobile_automation_planner),
-        # Mobile Automation Tools - for executing action plans
-        MCPToolset(
-            connection_params=StdioServerParameters(
-                command=NODE_PATH,
-                args=[os.path.join(TARGET_FOLDER_PATH, 'mcp-appium-server-new.js')]
-            ),
-        ),
+        CachedAgentTool(agent=mobile_automation_planner),
+        # Mobile Automation Tools - for executing action plans, narrowed to the plan once there is one
+        PLANNED_APPIUM_TOOLS,
+        # Status line formatter, so only its values are generated
+        emit_status,
     ],
+    before_model_callback=drop_stale_snapshots,
+    before_tool_callback=tool_prefetcher.before_tool,
+    after_tool_callback=mobile_after_tool,
+    after_model_callback=[tool_prefetcher.after_model, coalesce_status_lines],
 )
 
 
-
 # 4. Code Management Specialist
-code_management_agent = LlmAgent(
-    model='gemini-2.5-flash-preview-05-20',
+CODE_MANAGEMENT_SPEC = AgentSpec(
     name='code_management_specialist',
     description='Specialist for code analysis, modification, and development tasks',
-    instruction='''You are a code management specialist. You excel at:
-    - Code analysis and quality assessment
-    - File and code modification
-    - Refactoring and optimization
-    - Code generation and templates
-    - Programming best practices
-    
-    TASK COMPLETION REQUIREMENTS:
-    - Always complete ALL requested tasks before stopping
-    - Provide clear progress updates for multi-step operations
-    - If one approach fails, try alternative methods
-    - Track and report completion status explicitly
-    - Only stop when user confirms task completion or explicitly asks to stop
-    
-    Use code analysis and modification tools for all development tasks.''',
-    tools=[
-        MCPToolset(
-            connection_params=StdioServerParameters(
-                command=NODE_PATH,
-                args=[os.path.join(TARGET_FOLDER_PATH, 'mcp-code-analysis-server.js')]
-            ),
-        ),
-        MCPToolset(
-            connection_params=StdioServerParameters(
-                command=NODE_PATH,
-                args=[os.path.join(TARGET_FOLDER_PATH, 'mcp-code-modification-server.js')]
-            ),
-        ),
-    ],
+    role='a code management specialist',
+    skills=(
+        'Code analysis and quality assessment',
+        'File and code modification',
+        'Refactoring and optimization',
+        'Code generation and templates',
+        'Programming best practices',
+    ),
+    completion=(
+        'Always complete ALL requested tasks before stopping',
+        'Provide clear progress updates for multi-step operations',
+        'If one approach fails, try alternative methods',
+        'Track and report completion status explicitly',
+        'Only stop when user confirms task completion or explicitly asks to stop',
+    ),
+    tool_hint='Use code analysis and modification tools for all development tasks.',
+    tools=(
+        shared_toolset(PooledMCPToolset, CODE_ANALYSIS_SERVER_PARAMS, toolset_class=StreamingMCPToolset),
+        shared_toolset(PooledMCPToolset, CODE_MODIFICATION_SERVER_PARAMS, toolset_class=StreamingMCPToolset),
+    ),
 )
 
 # 5. File Operations Specialist
-file_operations_agent = LlmAgent(
-    model='gemini-2.5-flash-preview-05-20',
+FILE_OPERATIONS_SPEC = AgentSpec(
     name='file_operations_specialist',
     description='Specialist for file system operations, data processing, and file management',
-    instruction='''You are a file operations specialist. You excel at:
-    - File system navigation and management
-    - Data processing and transformation
-    - File creation, modification, and organization
-    - Backup and archival operations
-    - Log analysis and processing
-    
-    TASK COMPLETION REQUIREMENTS:
-    - Always complete ALL requested file operations before stopping
-    - Provide clear progress updates for batch operations
-    - If file operations fail, try alternative approaches or report specific issues
-    - Track and report completion status for each file/operation
-    - Continue until all requested operations are successfully completed
-    
-    Use filesystem tools for all file-related tasks.''',
-    tools=[
-        MCPToolset(
-            connection_params=StdioServerParameters(
-                command=NODE_PATH,
-                args=[os.path.join(TARGET_FOLDER_PATH, 'mcp-filesystem-server.js')]
-            ),
-        ),
-    ],
+    role='a file operations specialist',
+    skills=(
+        'File system navigation and management',
+        'Data processing and transformation',
+        'File creation, modification, and organization',
+        'Backup and archival operations',
+        'Log analysis and processing',
+        'Finding Gherkin scenarios by tag',
+    ),
+    completion=(
+        'Always complete ALL requested file operations before stopping',
+        'Provide clear progress updates for batch operations',
+        'If file operations fail, try alternative approaches or report specific issues',
+        'Track and report completion status for each file/operation',
+        'Continue until all requested operations are successfully completed',
+    ),
+    tool_hint=(
+        'Use filesystem tools for all file-related tasks. To find test scenarios by tag, '
+        'pass every tag to one scenario_scan call instead of grep_search and read_file per tag.'
+    ),
+    tools=(shared_toolset(PooledMCPToolset, FILESYSTEM_SERVER_PARAMS),),
+    model=GEMINI_MODELS['light'],
 )
 
 # 6. Test Execution Specialist
-test_execution_agent = LlmAgent(
-    model='gemini-2.5-flash-preview-05-20',
+TEST_EXECUTION_SPEC = AgentSpec(
     name='test_execution_specialist',
     description='Specialist for test execution, terminal operations, and system automation',
-    instruction='''You are a test execution specialist. You excel at:
-    - Running automated tests and test suites
-    - Terminal and command-line operations
-    - CI/CD pipeline integration
-    - System monitoring and validation
-    - Test reporting and analysis
-    
-    TASK COMPLETION REQUIREMENTS:
-    - Execute ALL requested tests/commands until completion
-    - Monitor test execution and wait for full completion
-    - Provide detailed test results and status updates
-    - If tests fail, analyze results and retry if appropriate
-    - Continue until all test suites/commands are executed and results are available
-    - Never stop mid-execution unless explicitly instructed
-    
-    Use test execution and terminal tools for all testing tasks.''',
-    tools=[
-        MCPToolset(
-            connection_params=StdioServerParameters(
-                command=NODE_PATH,
-                args=[os.path.join(TARGET_FOLDER_PATH, 'mcp-test-execution-server.js')]
-            ),
-        ),
-    ],
+    role='a test execution specialist',
+    skills=(
+        'Running automated tests and test suites',
+        'Terminal and command-line operations',
+        'CI/CD pipeline integration',
+        'System monitoring and validation',
+        'Test reporting and analysis',
+    ),
+    completion=(
+        'Execute ALL requested tests/commands until completion',
+        'Monitor test execution and wait for full completion',
+        'Provide detailed test results and status updates',
+        'If tests fail, analyze results and retry if appropriate',
+        'Continue until all test suites/commands are executed and results are available',
+        'Never stop mid-execution unless explicitly instructed',
+    ),
+    guidelines=(
+        'Run test suites that share a device, port or database one at a time',
+        'Start long test runs with background: true and keep working (e.g. read the code under test)\n'
+        '      while they run; collect each result with get_terminal_output and waitMs once you need it',
+    ),
+    tool_hint='Use test execution and terminal tools for all testing tasks.',
+    tools=(SHARED_NODE_SERVER.view('test'),),
+    model=GEMINI_MODELS['light'],
 )
 
 # 7. Advanced Tools Specialist
-advanced_tools_agent = LlmAgent(
-    model='gemini-2.5-flash-preview-05-20',
+ADVANCED_TOOLS_SPEC = AgentSpec(
     name='advanced_tools_specialist',
     description='Specialist for advanced automation tasks and custom utilities',
-    instruction='''You are an advanced tools specialist. You excel at:
-    - Complex automation workflows
-    - Custom utility functions
-    - Advanced data processing
-    - Integration between different systems
-    - Specialized automation tasks
-    
-    TASK COMPLETION REQUIREMENTS:
-    - Complete ALL steps in complex workflows before stopping
-    - Provide clear progress tracking for multi-step processes
-    - Handle errors gracefully and continue with remaining tasks
-    - Track completion status across different systems/integrations
-    - Only conclude when all requested automation tasks are finished
-    
-    Use advanced tools for complex or specialized tasks.''',
-    tools=[
-        MCPToolset(
-            connection_params=StdioServerParameters(
-                command=NODE_PATH,
-                args=[os.path.join(TARGET_FOLDER_PATH, 'mcp-advanced-server.js')]
-            ),
-        ),
-    ],
+    role='an advanced tools specialist',
+    skills=(
+        'Complex automation workflows',
+        'Custom utility functions',
+        'Advanced data processing',
+        'Integration between different systems',
+        'Specialized automation tasks',
+    ),
+    completion=(
+        'Complete ALL steps in complex workflows before stopping',
+        'Provide clear progress tracking for multi-step processes',
+        'Handle errors gracefully and continue with remaining tasks',
+        'Track completion status across different systems/integrations',
+        'Only conclude when all requested automation tasks are finished',
+    ),
+    tool_hint='Use advanced tools for complex or specialized tasks.',
+    tools=(SHARED_NODE_SERVER.view('advanced'),),
+)
+
+code_management_agent, file_operations_agent, test_execution_agent, advanced_tools_agent = map(
+    build_specialist, (CODE_MANAGEMENT_SPEC, FILE_OPERATIONS_SPEC, TEST_EXECUTION_SPEC, ADVANCED_TOOLS_SPEC)
 )
 
 # Main Coordinator Agent
 # ======================
-coordinator_agent = LlmAgent(
-    model='gemini-2.5-flash-preview-05-20',
-    name='automation_coordinator',
-    description='Main coordinator for comprehensive automation tasks',
-    instruction='''You are the automation coordinator. Your job is to analyze user requests and delegate tasks to the appropriate specialist agents.
+# The specialist list is generated from the agents' own descriptions
+SPECIALISTS = [
+    web_automation_agent,
+    mobile_automation_agent,
+    code_management_agent,
+    file_operations_agent,
+    test_execution_agent,
+    advanced_tools_agent,
+]
+_SPECIALIST_LIST = '\n'.join(f'- {agent.name}: {agent.description}' for agent in SPECIALISTS)
+
+COORDINATOR_INSTRUCTION = f'''You are the automation coordinator. Your job is to analyze user requests and delegate tasks to the appropriate specialist agents.
 
 Available specialists:
-- web_automation_specialist: For browser, web testing, and web scraping tasks
-- mobile_automation_specialist: For mobile device automation and app testing using Appium
-  ↳ Has mobile_automation_planner tool for integrated test planning and execution
-- code_management_specialist: For code analysis, modification, and development
-- file_operations_specialist: For file system operations and data processing
-- test_execution_specialist: For running tests and terminal operations
-- advanced_tools_specialist: For complex or specialized automation tasks
+{_SPECIALIST_LIST}
 
 ENHANCED MOBILE AUTOMATION WORKFLOW:
 When handling mobile testing requests:
@@ -1118,53 +1905,593 @@ Examples:
 - "Complex workflow automation" → transfer to advanced_tools_specialist
 
 NEVER STOP COORDINATION until all requested tasks across all specialists are completed.
-Always explain why you're transferring to a specific specialist and what you expect them to accomplish.''',
-    
+Before transferring, state in one short sentence why you chose that specialist.'''
+
+# Keyword routing: unambiguous requests are transferred without a coordinator LLM call.
+# Words that also belong to device tasks ("log in", "verification code", "test the
+# checkout flow") only count next to a domain noun; a request without a keyword is left
+# to embedding routing and the LLM.
+_ROUTE = {
+    'web': 'web_automation_specialist',
+    'website': 'web_automation_specialist',
+    'url': 'web_automation_specialist',
+    'browser': 'web_automation_specialist',
+    'playwright': 'web_automation_specialist',
+    'scrape': 'web_automation_specialist',
+    'scraping': 'web_automation_specialist',
+    'mobile': 'mobile_automation_specialist',
+    'android': 'mobile_automation_specialist',
+    'ios': 'mobile_automation_specialist',
+    'iphone': 'mobile_automation_specialist',
+    'phone': 'mobile_automation_specialist',
+    'smartphone': 'mobile_automation_specialist',
+    'tablet': 'mobile_automation_specialist',
+    'appium': 'mobile_automation_specialist',
+    'emulator': 'mobile_automation_specialist',
+    'simulator': 'mobile_automation_specialist',
+    'apk': 'mobile_automation_specialist',
+    'source code': 'code_management_specialist',
+    'codebase': 'code_management_specialist',
+    'code quality': 'code_management_specialist',
+    'code review': 'code_management_specialist',
+    'refactor': 'code_management_specialist',
+    'filesystem': 'file_operations_specialist',
+    'file system': 'file_operations_specialist',
+    'directory': 'file_operations_specialist',
+    'log file': 'file_operations_specialist',
+    'log files': 'file_operations_specialist',
+    'test suite': 'test_execution_specialist',
+    'unit tests': 'test_execution_specialist',
+    'run tests': 'test_execution_specialist',
+    'run the tests': 'test_execution_specialist',
+    'pytest': 'test_execution_specialist',
+    'pipeline': 'test_execution_specialist',
+}
+# Longest first, so 'log files' is not cut short at 'log file'; phrases match across any whitespace
+_ROUTE_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(keyword).replace(r'\ ', r'\s+') for keyword in sorted(_ROUTE, key=len, reverse=True)) + r')\b',
+    re.IGNORECASE,
+)
+_WORD_RE = re.compile(r'[a-z][a-z0-9]{4,}')  # Only words of 5+ letters are checked for typos
+_TYPO_KEYWORDS = [keyword for keyword in _ROUTE if len(keyword) >= 5 and ' ' not in keyword]
+
+
+def keyword_targets(text):
+    """Specialists named by domain keywords in a message, tolerating typos such as 'andriod'"""
+    targets = {_ROUTE[' '.join(keyword.lower().split())] for keyword in _ROUTE_RE.findall(text)}
+    if not targets:
+        for word in set(_WORD_RE.findall(text.lower())):
+            for keyword in difflib.get_close_matches(word, _TYPO_KEYWORDS, n=1, cutoff=0.85):
+                targets.add(_ROUTE[keyword])
+    return targets
+
+
+class SpecialistRouter:
+    """Nearest-specialist lookup by embedding similarity for requests that name no domain.
+
+    Each specialist is profiled by its description plus its routing keywords; the
+    profiles are embedded once on first use, so routing a request costs one embedding
+    call on the shared client instead of a coordinator generate call. A request is only
+    routed when the best match is close enough and clearly ahead of the runner-up;
+    anything else is left to the LLM coordinator.
+    """
+
+    def __init__(self, model, agents, min_score=0.5, min_margin=0.05):
+        keywords = {}
+        for keyword, agent_name in _ROUTE.items():
+            keywords.setdefault(agent_name, []).append(keyword)
+        self._model = model
+        self.agent_names = [agent.name for agent in agents]
+        self._profiles = {
+            agent.name: f"{agent.description}. Keywords: {', '.join(keywords.get(agent.name, []))}"
+            for agent in agents
+        }
+        self._embeddings = None
+        self.min_score = min_score
+        self.min_margin = min_margin
+
+    async def _embed(self, texts):
+        return await embed_texts(texts, self._model)
+
+    async def route(self, text):
+        """Return the name of the nearest specialist, or None when the match is ambiguous"""
+        try:
+            if self._embeddings is None:
+                names = list(self._profiles)
+                self._embeddings = dict(zip(names, await self._embed([self._profiles[name] for name in names])))
+            (query,) = await self._embed([text])
+        except Exception as error:  # Routing is an optimization; the coordinator LLM still decides
+            logger.warning('Embedding routing unavailable: %s', error)
+            return None
+
+        scores = sorted(
+            ((sum(a * b for a, b in zip(query, vector)), name) for name, vector in self._embeddings.items()),
+            reverse=True,
+        )
+        (best_score, best_name), (runner_up_score, _) = scores[0], scores[1]
+        if best_score < self.min_score or best_score - runner_up_score < self.min_margin:
+            return None
+        return best_name
+
+
+specialist_router = SpecialistRouter(SHARED_GEMINI_MODEL, SPECIALISTS)
+
+
+def constrain_transfer_targets(llm_request, agent_names):
+    """Restrict transfer_to_agent's agent_name to an enum so decoding can only pick a real agent"""
+    for tool in llm_request.config.tools or ():
+        for declaration in getattr(tool, 'function_declarations', None) or ():
+            if declaration.name != 'transfer_to_agent':
+                continue
+            if declaration.parameters and 'agent_name' in (declaration.parameters.properties or {}):
+                declaration.parameters.properties['agent_name'].enum = list(agent_names)
+            if declaration.parameters_json_schema:
+                properties = declaration.parameters_json_schema.get('properties', {})
+                if 'agent_name' in properties:
+                    properties['agent_name']['enum'] = list(agent_names)
+
+
+class RoutingCache:
+    """Remember which specialist recurring opening messages were transferred to.
+
+    Automation sessions repeat the same requests ("run the test suite", "open the app"),
+    so a message that normalizes (case and whitespace) to one seen before is transferred
+    to the same specialist without keyword, embedding or LLM routing. At most
+    `max_entries` decisions are kept (oldest first out). Final answers are not cached:
+    the specialists act on live devices and files, so their work has to run again.
+    Concurrent sessions sending the same new message share one routing decision.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._cache: dict[bytes, str] = {}
+        self._pending: dict[bytes, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text):
+        return hashlib.blake2b(' '.join(text.lower().split()).encode(), digest_size=16).digest()
+
+    def get(self, text):
+        target = self._cache.get(self.make_key(text))
+        if target is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return target
+
+    def put(self, text, target):
+        key = self.make_key(text)
+        self._cache.pop(key, None)  # Re-insert at the end so eviction drops the oldest entries
+        self._cache[key] = target
+        while len(self._cache) > self.max_entries:
+            del self._cache[next(iter(self._cache))]
+
+    async def resolve(self, text, decide):
+        """Await decide() once for all concurrent callers with this message and remember its target"""
+        key = self.make_key(text)
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.ensure_future(decide())
+            self._pending[key] = future
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+        try:
+            target = await asyncio.shield(future)
+        except Exception as error:  # Routing is an optimization; the coordinator LLM still decides
+            logger.warning('Routing failed: %s', error)
+            return None
+        if target is not None:
+            self.put(text, target)
+        return target
+
+
+routing_cache = RoutingCache()
+
+
+def transfer_response(agent_name):
+    """A model response that transfers to agent_name, as the coordinator LLM would emit it"""
+    return LlmResponse(content=types.Content(role='model', parts=[
+        types.Part(function_call=types.FunctionCall(name='transfer_to_agent', args={'agent_name': agent_name})),
+    ]))
+
+
+# Temperatures of the coordinator decodes raced on an unrouted opening turn; the first
+# valid transfer wins and the others are cancelled. One entry disables the race.
+ROUTING_SAMPLE_TEMPERATURES = (0.0, 0.7)
+
+
+async def race_transfer_decisions(llm_request, temperatures=ROUTING_SAMPLE_TEMPERATURES):
+    """Decode the routing turn several times concurrently and return the first transfer_to_agent response.
+
+    Only the first sample uses the context cache, so the extra samples never create a
+    competing cache entry. Returns None when no sample transfers (e.g. the model answers
+    in text), leaving the turn to the regular model call.
+    """
+    async def sample(index, temperature):
+        config = llm_request.config.model_copy(update={'temperature': temperature})
+        update = {'config': config, 'contents': list(llm_request.contents)}
+        if index:
+            update['cache_config'] = None
+        request = llm_request.model_copy(update=update)
+        async for llm_response in SHARED_GEMINI_MODEL.generate_content_async(request):
+            parts = llm_response.content.parts if llm_response.content else None
+            if any(part.function_call and part.function_call.name == 'transfer_to_agent' for part in parts or ()):
+                return llm_response
+        return None
+
+    tasks = [asyncio.create_task(sample(index, temperature)) for index, temperature in enumerate(temperatures)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                llm_response = await next_done
+            except Exception as error:  # Another sample may still succeed
+                logger.warning('Routing sample failed: %s', error)
+                continue
+            if llm_response is not None:
+                return llm_response
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def route_to_specialist(callback_context, llm_request):
+    """Transfer straight to a specialist when the opening message clearly belongs to one.
+
+    A message naming exactly one domain keyword is routed by keyword; one naming none is
+    routed by embedding similarity. Multi-domain and ambiguous requests go to the LLM,
+    whose transfer target is constrained to the specialist names and which is sampled
+    several times at once so a slow decode does not hold up the handoff. Every decision
+    is remembered in routing_cache, so a repeated message skips all of the above.
+    """
+    # Applied on every turn so the tool declarations (and the context cache) stay identical
+    constrain_transfer_targets(llm_request, specialist_router.agent_names)
+    user_content = callback_context.user_content
+    if not user_content or not user_content.parts or not llm_request.contents:
+        return None
+    if llm_request.contents[-1] != user_content:  # Only route the opening turn, not handbacks
+        return None
+
+    text = ' '.join(part.text for part in user_content.parts if part.text)
+    if not text.strip():
+        return None
+    target = routing_cache.get(text)
+    if target is None:
+        target = await routing_cache.resolve(text, lambda: choose_specialist(text, llm_request))
+    return transfer_response(target) if target else None
+
+
+async def choose_specialist(text, llm_request):
+    """Name the one specialist for a new message by keyword, embedding or raced LLM samples; None if unsure"""
+    targets = keyword_targets(text)
+    if not targets:
+        target = await specialist_router.route(text)
+        targets = {target} if target else set()
+    if len(targets) == 1:
+        return targets.pop()
+
+    if len(ROUTING_SAMPLE_TEMPERATURES) < 2:
+        return None
+    llm_response = await race_transfer_decisions(llm_request)
+    for part in (llm_response.content.parts if llm_response else None) or ():
+        if part.function_call and part.function_call.name == 'transfer_to_agent':
+            target = (part.function_call.args or {}).get('agent_name')
+            if target in specialist_router.agent_names:
+                return target
+    return None
+
+
+coordinator_agent = LlmAgent(
+    model=SHARED_GEMINI_MODEL,
+    name='automation_coordinator',
+    description='Main coordinator for comprehensive automation tasks',
+    instruction=static_instruction(COORDINATOR_INSTRUCTION),
+    before_model_callback=route_to_specialist,
+    # Schema-constrained function calls: a transfer decodes as one of the enum names above
+    generate_content_config=types.GenerateContentConfig(
+        tool_config=types.ToolConfig(function_calling_config=types.FunctionCallingConfig(mode='VALIDATED')),
+    ),
+
     # Define the hierarchy - coordinator has all specialists as sub-agents
-    sub_agents=[
-        web_automation_agent,
-        mobile_automation_agent, 
-        code_management_agent,
-        file_operations_agent,
-        test_execution_agent,
-        advanced_tools_agent,
-    ],
+    sub_agents=SPECIALISTS,
+)
+
+# Alternative: DAG Pipeline for Complex Workflows
+# ===============================================
+# Each stage lists the stages it depends on; a stage starts as soon as its dependencies finish
+PIPELINE_DAG = {
+    'file_ops': [],                 # Setup test environment
+    'code_mgmt': ['file_ops'],      # Analyze/prepare code
+    'test_exec': ['code_mgmt'],     # Run tests
+    'web': ['test_exec'],           # Web-based testing
+    'mobile': ['test_exec'],        # Mobile testing (Appium)
+    'advanced': ['web', 'mobile'],  # Generate reports
+}
+# Streaming edges (upstream, downstream): the downstream stage starts once the upstream one
+# returns its first tool result instead of when it finishes; other edges are barriers
+PIPELINE_STREAMING_EDGES = (
+    ('file_ops', 'code_mgmt'),  # Code analysis can begin on the first prepared files
 )
 
-# Alternative: Sequential Pipeline for Complex Workflows
-# ====================================================
+
+def topological_levels(dag):
+    """Group DAG nodes into levels (Kahn's algorithm); nodes in a level have no mutual dependencies"""
+    remaining = {node: set(deps) for node, deps in dag.items()}
+    levels = []
+    while remaining:
+        ready = sorted(node for node, deps in remaining.items() if not deps)
+        if not ready:
+            raise ValueError(f"Pipeline DAG has a cycle among: {', '.join(sorted(remaining))}")
+        levels.append(ready)
+        for node in ready:
+            del remaining[node]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return levels
+
+
+class DagAgent(BaseAgent):
+    """Run sub-agents as a dependency DAG: each starts as soon as the agents it depends on finish.
+
+    Unlike levels of ParallelAgent stages, a branch never waits for an unrelated slow
+    sibling. All nodes run on this agent's branch, as in a SequentialAgent, so a node
+    sees the output of the agents it depends on in the conversation history. A
+    dependency listed in streaming_edges only gates its dependent until the first tool
+    result, so the two stages overlap instead of running back to back.
+    """
+
+    dependencies: dict[str, list[str]] = {}  # Sub-agent name -> names it depends on
+    streaming_edges: list[tuple[str, str]] = []  # (upstream, downstream) names released early
+    max_concurrency: int = 0  # Nodes allowed to run at once; 0 means no limit
+
+    def _node_context(self, ctx, agent):
+        return ctx
+
+    async def _run_async_impl(self, ctx):
+        agents = {agent.name: agent for agent in self.sub_agents}
+        waiting = {name: set(self.dependencies.get(name, ())) for name in agents}
+        queue = asyncio.Queue()
+        tasks = []
+        slots = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency > 0 else None
+        early = {}
+        for upstream, downstream in self.streaming_edges:
+            early.setdefault(upstream, []).append(downstream)
+
+        async def run_node(agent):
+            error = None
+            try:
+                if slots:
+                    await slots.acquire()
+                try:
+                    async for event in agent.run_async(self._node_context(ctx, agent)):
+                        resume = asyncio.Event()
+                        await queue.put((event, resume))
+                        await resume.wait()  # Let the runner record the event before producing the next
+                finally:
+                    if slots:
+                        slots.release()
+            except Exception as exc:
+                error = exc
+            finally:
+                await queue.put((agent.name, error))
+
+        def start_ready():
+            ready = [name for name, deps in waiting.items() if not deps]
+            for name in ready:
+                del waiting[name]
+                tasks.append(asyncio.create_task(run_node(agents[name])))
+            return len(ready)
+
+        running = start_ready()
+        try:
+            while running:
+                item, payload = await queue.get()
+                if isinstance(item, str):  # A node finished; release its dependents
+                    running -= 1
+                    if payload is not None:
+                        raise payload
+                    for deps in waiting.values():
+                        deps.discard(item)
+                    running += start_ready()
+                    continue
+                yield item
+                if item.actions.escalate:
+                    return
+                if item.author in early and item.get_function_responses():
+                    for downstream in early.pop(item.author):
+                        waiting.get(downstream, set()).discard(item.author)
+                    running += start_ready()
+                payload.set()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+# Sub-agents a parallel workflow runs at once; bounds concurrent MCP servers and Gemini calls
+AGENT_CONCURRENCY = int(os.environ.get('AGENT_CONCURRENCY', '4'))
+
+
+class BoundedParallelAgent(DagAgent):
+    """Run sub-agents concurrently on isolated branches, at most max_concurrency at a time.
+
+    Behaves like ParallelAgent (each sub-agent sees only its own branch of the
+    conversation), but queued sub-agents wait for a free slot instead of all starting
+    at once, so a large fan-out does not spawn every MCP server or burst Gemini quota.
+    """
+
+    max_concurrency: int = AGENT_CONCURRENCY
+
+    def _node_context(self, ctx, agent):
+        branch_ctx = ctx.model_copy()
+        suffix = f'{self.name}.{agent.name}'
+        branch_ctx.branch = f'{ctx.branch}.{suffix}' if ctx.branch else suffix
+        return branch_ctx
+
+
+def create_dag_pipeline(name, dag, agents_by_key, streaming_edges=()):
+    """Build a DagAgent from a DAG of keys, rejecting cycles up front.
+
+    Specialists are cloned because an ADK agent can only have one parent and the
+    originals already belong to the coordinator; clones share model and toolsets.
+    """
+    topological_levels(dag)  # Raises ValueError on a cycle
+    agents = {key: agents_by_key[key].clone() for key in dag}
+    return DagAgent(
+        name=name,
+        sub_agents=list(agents.values()),
+        dependencies={agents[key].name: [agents[dep].name for dep in deps] for key, deps in dag.items()},
+        streaming_edges=[(agents[upstream].name, agents[downstream].name) for upstream, downstream in streaming_edges],
+    )
+
+
+@lru_cache(maxsize=None)
 def create_testing_pipeline():
-    """Create a sequential pipeline for comprehensive testing workflows"""
-    return SequentialAgent(
-        name='comprehensive_testing_pipeline',
-        sub_agents=[
-            file_operations_agent,  # Setup test environment
-            code_management_agent,  # Analyze/prepare code
-            test_execution_agent,   # Run tests
-            web_automation_agent,   # Web-based testing
-            mobile_automation_agent, # Mobile testing (Appium)
-            advanced_tools_agent,   # Generate reports
-        ],
+    """Create a DAG pipeline for comprehensive testing workflows (built once, then reused)"""
+    return create_dag_pipeline(
+        'comprehensive_testing_pipeline',
+        PIPELINE_DAG,
+        {
+            'file_ops': file_operations_agent,
+            'code_mgmt': code_management_agent,
+            'test_exec': test_execution_agent,
+            'web': web_automation_agent,
+            'mobile': mobile_automation_agent,
+            'advanced': advanced_tools_agent,
+        },
+        PIPELINE_STREAMING_EDGES,
     )
 
+
 # Alternative: Parallel Information Gathering
 # ==========================================
+# Each sub-agent runs as its own asyncio task on an isolated branch, so the Gemini and
+# MCP round trips overlap: latency is the slowest specialist, not the sum.
+# At most AGENT_CONCURRENCY specialists run at once.
+@lru_cache(maxsize=None)
 def create_parallel_analysis():
-    """Create parallel analysis for multi-domain assessment"""
-    return ParallelAgent(
+    """Create parallel analysis for multi-domain assessment (built once, then reused)"""
+    return BoundedParallelAgent(
         name='parallel_analysis_system',
         sub_agents=[
-            code_management_agent,   # Analyze code quality
-            file_operations_agent,   # Analyze file structure
-            test_execution_agent,    # Run system checks
+            code_management_agent.clone(),   # Analyze code quality
+            file_operations_agent.clone(),   # Analyze file structure
+            test_execution_agent.clone(),    # Run system checks
         ],
     )
 
+
+# Concurrent Toolset Startup
+# ==========================
+def iter_toolsets(agent):
+    """Yield every toolset used by an agent tree, including agents wrapped as AgentTool"""
+    seen = set()
+    pending = [agent]
+    while pending:
+        current = pending.pop()
+        for tool in getattr(current, 'tools', []):
+            if isinstance(tool, BaseToolset) and id(tool) not in seen:
+                seen.add(id(tool))
+                yield tool
+            elif isinstance(tool, agent_tool.AgentTool):
+                pending.append(tool.agent)
+        pending.extend(current.sub_agents)
+
+
+async def start_toolsets(agent):
+    """Spawn and handshake all MCP servers of an agent tree at once instead of one per first use.
+
+    Failures are logged and do not block the other servers; returns the number that started.
+    """
+    toolsets = list(iter_toolsets(agent))
+    results = await asyncio.gather(
+        *(toolset.get_tools() for toolset in toolsets), return_exceptions=True
+    )
+    started = 0
+    for toolset, result in zip(toolsets, results):
+        if isinstance(result, BaseException):
+            logger.warning('Failed to start %s: %s', type(toolset).__name__, result)
+        else:
+            started += 1
+    return started
+
+
 # Main Multi-Agent System
 # =======================
 # Default: Use coordinator pattern
 root_agent = coordinator_agent
 
 # Alternative configurations (uncomment to use):
-# root_agent = create_testing_pipeline()  # For sequential testing workflows
+# root_agent = create_testing_pipeline()  # For DAG-scheduled testing workflows
 # root_agent = create_parallel_analysis()  # For parallel analysis tasks
+
+# Context caching: the static system instruction and tool declarations of every agent
+# (the mobile specialist alone is several thousand tokens) are stored in a Gemini
+# cached-content entry and billed at the cached rate instead of resent in full each turn
+CONTEXT_CACHE_CONFIG = ContextCacheConfig(
+    ttl_seconds=3600,
+    cache_intervals=20,  # Refresh after this many invocations reuse one cache entry
+    # Gemini 2.5 Flash caches prompts from 1024 tokens; a higher floor left the coordinator's
+    # instruction, sub-agent list and transfer tool (~1.2k tokens) resent uncached every turn
+    min_tokens=1024,
+)
+
+app = App(name='multi_tool_agent', root_agent=root_agent, context_cache_config=CONTEXT_CACHE_CONFIG)
+
+# Streaming Execution
+# ===================
+# Stream model output (SSE) so text and function calls surface as they are generated
+STREAMING_RUN_CONFIG = RunConfig(streaming_mode=StreamingMode.SSE)
+
+# MCP servers start when their specialist first needs them; set MCP_PRESTART=1 to
+# start every server concurrently at launch instead (slower boot, faster first call)
+PRESTART_TOOLSETS = os.environ.get('MCP_PRESTART', '').lower() in ('1', 'true', 'yes')
+
+
+async def run_interactive(agent=None, prestart=PRESTART_TOOLSETS):
+    """Chat with the agent system from the terminal, printing responses as they stream"""
+    runner = InMemoryRunner(app=app) if agent is None else InMemoryRunner(agent=agent, app_name='mcp_agent')
+    session = await runner.session_service.create_session(app_name=runner.app_name, user_id='local_user')
+    if prestart:
+        await asyncio.gather(start_toolsets(runner.agent), SHARED_GEMINI_MODEL.warm_up())
+    else:
+        await SHARED_GEMINI_MODEL.warm_up()
+    try:
+        while True:
+            try:
+                message = input('\n> ').strip()
+            except EOFError:
+                break
+            if not message:
+                continue
+            async for event in runner.run_async(
+                user_id='local_user',
+                session_id=session.id,
+                new_message=types.Content(role='user', parts=[types.Part(text=message)]),
+                run_config=STREAMING_RUN_CONFIG,
+            ):
+                for part in (event.content.parts if event.content else None) or []:
+                    if event.partial and part.text:
+                        print(part.text, end='', flush=True)
+                    elif part.function_call:
+                        print(f'\n[{event.author}] → {part.function_call.name}', flush=True)
+                    elif part.function_response and part.function_response.name == 'emit_status':
+                        print(f'\n{part.function_response.response.get("result", "")}', flush=True)
+    finally:
+        await close_shared_toolsets()
+        logger.info(
+            'Gemini: %d requests over %d connections',
+            GEMINI_CONNECTION_STATS['requests'], GEMINI_CONNECTION_STATS['connections'],
+        )
+        logger.info(
+            'Gemini: %d prompt tokens, %d served from the prefix cache',
+            GEMINI_PROMPT_STATS['prompt'], GEMINI_PROMPT_STATS['cached'],
+        )
+
+
+if __name__ == '__main__':
+    if sys.platform == 'win32':
+        asyncio.run(run_interactive())
+    else:
+        import uvloop  # Faster event loop for the MCP pipes and Gemini streams; not available on Windows
+        uvloop.run(run_interactive())
@@ -0,0 +1,36 @@
+"""ASGI entry point for serving the agent system from several pre-forked workers.
+
+    gunicorn --preload -w 4 -k uvicorn.workers.UvicornWorker multi_tool_agent.asgi:app
+
+With --preload this module is imported once in the gunicorn master before it
+forks, so the instruction strings, tool schemas and agent graph are shared
+copy-on-write by every worker. Importing the agent module is fork-safe: MCP
+servers and the Gemini client are only created on first use, in each worker.
+Leave MCP_SHARED_SOCKET unset here, since the persistent server serves one
+client at a time. Each worker stops its MCP servers when it shuts down.
+"""
+import gc
+import os
+from contextlib import asynccontextmanager
+
+from google.adk.cli.fast_api import get_fast_api_app
+
+from . import agent  # Loaded before the fork so the ADK loader finds it already imported
+
+
+@asynccontextmanager
+async def close_mcp_servers(app):
+    """Stop the worker's MCP servers on shutdown, on the event loop their sessions belong to"""
+    yield
+    await agent.close_shared_toolsets()
+
+
+app = get_fast_api_app(
+    agents_dir=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    web=False,
+    lifespan=close_mcp_servers,
+)
+
+# Exempt everything allocated at import from garbage collection, so collections in
+# the workers do not write to (and thereby copy) the shared pages
+gc.freeze()
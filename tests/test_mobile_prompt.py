@@ -0,0 +1,19 @@
+"""The mobile prompt stays short; procedure lives in the tool descriptions"""
+from multi_tool_agent import agent
+
+# About 500 tokens of role, rules and report format on top of the shared preamble
+MAX_PROMPT_CHARS = 3000
+
+
+def test_mobile_prompt_is_short():
+    prompt = agent.MOBILE_SPECIALIST_INSTRUCTION[len(agent._COMMON_PREAMBLE):]
+
+    assert len(prompt) <= MAX_PROMPT_CHARS
+
+
+def test_prompt_keeps_only_the_platform_in_use():
+    ios = agent.specialize_mobile_prompt('ios')
+    android = agent.specialize_mobile_prompt('android')
+
+    assert 'For iOS:' in ios and 'For Android:' not in ios
+    assert 'For Android:' in android and 'For iOS:' not in android
@@ -0,0 +1,69 @@
+"""Mobile plans are reused only for requests with the same literal values"""
+import asyncio
+
+import pytest
+from google.adk.tools import agent_tool
+
+from multi_tool_agent import agent
+
+
+@pytest.fixture
+def planner_calls(monkeypatch):
+    """Every request embeds identically, so only the literals can tell requests apart"""
+    calls = []
+
+    async def embed_texts(texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    async def run_planner(self, *, args, tool_context):
+        calls.append(args['request'])
+        return f"plan for: {args['request']}"
+
+    monkeypatch.setattr(agent, 'embed_texts', embed_texts)
+    monkeypatch.setattr(agent_tool.AgentTool, 'run_async', run_planner)
+    return calls
+
+
+def plan(tool, request):
+    return asyncio.run(tool.run_async(args={'request': request}, tool_context=None))
+
+
+def cached_planner(tmp_path):
+    return agent.CachedAgentTool(agent=agent.mobile_automation_planner, cache_path=str(tmp_path / 'plans.json'))
+
+
+def test_reworded_request_reuses_plan(tmp_path, planner_calls):
+    tool = cached_planner(tmp_path)
+
+    first = plan(tool, "Open EMAS and log in as 'alice'")
+    second = plan(tool, "open EMAS, then log in as 'alice'")
+
+    assert second == first
+    assert len(planner_calls) == 1
+    assert (tool.hits, tool.misses) == (1, 1)
+
+
+@pytest.mark.parametrize('first_request, second_request', [
+    ("log in as 'alice' with password 'secret1'", "log in as 'bob' with password 'secret1'"),
+    ('connect to 192.168.0.5:4723 and open the app', 'connect to 192.168.0.6:4723 and open the app'),
+    ('launch com.example.shop and open the cart', 'launch com.example.bank and open the cart'),
+    ('search for "red shoes" and open the first result', 'search for "blue shoes" and open the first result'),
+])
+def test_requests_differing_in_a_parameter_do_not_share_a_plan(tmp_path, planner_calls, first_request, second_request):
+    tool = cached_planner(tmp_path)
+
+    first = plan(tool, first_request)
+    second = plan(tool, second_request)
+
+    assert second != first
+    assert planner_calls == [first_request, second_request]
+
+
+def test_literals_are_kept_across_runs(tmp_path, planner_calls):
+    plan(cached_planner(tmp_path), "log in as 'alice'")
+
+    tool = cached_planner(tmp_path)
+    plan(tool, "log in as 'bob'")
+    plan(tool, "please log in as 'alice'")
+
+    assert planner_calls == ["log in as 'alice'", "log in as 'bob'"]
@@ -0,0 +1,70 @@
+"""A plan narrows the mobile tools, but never hides the recovery path"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from multi_tool_agent import agent
+
+TOOL_NAMES = ('appium_connect', 'click_element', 'find_elements', 'get_page_source', 'handle_alert', 'press_home')
+
+
+class FakeToolset:
+    async def get_tools(self, readonly_context=None):
+        return [SimpleNamespace(name=name) for name in TOOL_NAMES]
+
+    async def close(self):
+        pass
+
+
+def offered(toolset, context):
+    return {tool.name for tool in asyncio.run(toolset.get_tools(context))}
+
+
+def after_tool(toolset, tool_name, context, response):
+    asyncio.run(toolset.record_plan(SimpleNamespace(name=tool_name), context, response))
+
+
+@pytest.fixture
+def planned():
+    return agent.PlannedToolset(FakeToolset(), planner_name='planner', always=('get_page_source',))
+
+
+def test_plan_narrows_the_tools(planned):
+    context = SimpleNamespace(invocation_id='run-1')
+    assert offered(planned, context) == set(TOOL_NAMES)
+
+    after_tool(planned, 'planner', context, {'result': 'Step 1: click_element on Login'})
+
+    assert offered(planned, context) == {'click_element', 'get_page_source'}
+
+
+@pytest.mark.parametrize('response', [
+    {'content': [{'type': 'text', 'text': 'Error executing click_element: not found'}], 'isError': True},
+    {'content': [], 'is_error': True},
+    {'error': 'Tool click_element failed'},
+])
+def test_failed_step_offers_every_tool_again(planned, response):
+    context = SimpleNamespace(invocation_id='run-1')
+    after_tool(planned, 'planner', context, {'result': 'Step 1: click_element on Login'})
+
+    after_tool(planned, 'click_element', context, response)
+
+    assert offered(planned, context) == set(TOOL_NAMES)
+
+
+def test_successful_step_keeps_the_plan(planned):
+    context = SimpleNamespace(invocation_id='run-1')
+    after_tool(planned, 'planner', context, {'result': 'Step 1: click_element on Login'})
+
+    after_tool(planned, 'click_element', context, {'content': [{'type': 'text', 'text': 'Clicked'}]})
+
+    assert offered(planned, context) == {'click_element', 'get_page_source'}
+
+
+def test_mobile_fallback_tools_are_always_offered():
+    fallbacks = {
+        'scroll_to_element', 'scroll_into_view', 'get_page_source', 'analyze_screenshot', 'type_text',
+        'wait_for_element', 'appium_disconnect',
+    }
+    assert fallbacks <= agent.PLANNED_APPIUM_TOOLS.always
@@ -0,0 +1,58 @@
+"""Keyword routing only short-cuts requests whose domain is unambiguous"""
+import asyncio
+
+import pytest
+
+from multi_tool_agent import agent
+
+
+@pytest.mark.parametrize('text', [
+    'Log in to the EMAS app as alice',
+    'Enter the verification code on the phone',
+    'Test the checkout flow on the app',
+])
+def test_device_tasks_are_not_routed_to_other_specialists(text):
+    assert agent.keyword_targets(text) <= {'mobile_automation_specialist'}
+
+
+@pytest.mark.parametrize('text, target', [
+    ('Analyze code quality', 'code_management_specialist'),
+    ('Review the source code of the parser', 'code_management_specialist'),
+    ('Process log files', 'file_operations_specialist'),
+    ('Run test suite', 'test_execution_specialist'),
+    ('Please run  the tests again', 'test_execution_specialist'),
+    ('Connect to Android device', 'mobile_automation_specialist'),
+    ('Connect to an andriod device', 'mobile_automation_specialist'),
+])
+def test_domain_phrases_route_by_keyword(text, target):
+    assert agent.keyword_targets(text) == {target}
+
+
+def test_conflicting_keywords_fall_through_to_the_llm(monkeypatch):
+    async def race_transfer_decisions(llm_request):
+        return agent.transfer_response('mobile_automation_specialist')
+
+    monkeypatch.setattr(agent, 'race_transfer_decisions', race_transfer_decisions)
+
+    text = 'Collect the log files from the Android phone'
+    assert len(agent.keyword_targets(text)) == 2
+    assert asyncio.run(agent.choose_specialist(text, llm_request=None)) == 'mobile_automation_specialist'
+
+
+def test_request_without_keywords_is_left_to_the_routers(monkeypatch):
+    routed = []
+
+    async def route(text):
+        routed.append(text)
+        return None
+
+    async def race_transfer_decisions(llm_request):
+        return agent.transfer_response('mobile_automation_specialist')
+
+    monkeypatch.setattr(agent.specialist_router, 'route', route)
+    monkeypatch.setattr(agent, 'race_transfer_decisions', race_transfer_decisions)
+
+    text = 'Log in to the EMAS app as alice'
+    assert asyncio.run(agent.choose_specialist(text, llm_request=None)) == 'mobile_automation_specialist'
+    assert routed == [text]
+
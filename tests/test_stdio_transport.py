@@ -0,0 +1,100 @@
+"""batched_stdio_client against a small echo server child"""
+import asyncio
+import os
+import subprocess
+import sys
+
+import anyio
+import orjson
+from mcp import StdioServerParameters
+from mcp.shared.message import SessionMessage
+
+from multi_tool_agent import agent
+
+# Writes its pid to argv[1], then echoes each line in two writes a moment apart,
+# so the client sees every message split across reads
+ECHO_SERVER = '''
+import os, sys, time
+with open(sys.argv[1], 'w') as pid_file:
+    pid_file.write(str(os.getpid()))
+for line in sys.stdin.buffer:
+    half = len(line) // 2
+    sys.stdout.buffer.write(line[:half])
+    sys.stdout.buffer.flush()
+    time.sleep(0.01)
+    sys.stdout.buffer.write(line[half:])
+    sys.stdout.buffer.flush()
+'''
+
+# Writes its pid to argv[1] and never reads stdin, so closing it does not stop the server
+STUBBORN_SERVER = '''
+import os, sys, time
+with open(sys.argv[1], 'w') as pid_file:
+    pid_file.write(str(os.getpid()))
+time.sleep(60)
+'''
+
+
+def server(script, pid_path):
+    return StdioServerParameters(command=sys.executable, args=['-c', script, str(pid_path)])
+
+
+def request(message_id):
+    return SessionMessage(agent.JSONRPC_MESSAGE_ADAPTER.validate_python({'jsonrpc': '2.0', 'id': message_id, 'method': 'ping'}))
+
+
+def request_id(session_message):
+    return orjson.loads(session_message.message.model_dump_json(by_alias=True))['id']
+
+
+async def echo(pid_path, request_ids):
+    async with agent.batched_stdio_client(server(ECHO_SERVER, pid_path), errlog=subprocess.DEVNULL) as (read_stream, write_stream):
+        async with anyio.create_task_group() as tasks:
+            for sent_id in request_ids:
+                tasks.start_soon(write_stream.send, request(sent_id))
+        return [request_id(await read_stream.receive()) for _ in request_ids]
+
+
+def assert_reaped(pid_path):
+    pid = int(pid_path.read_text())
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return
+    raise AssertionError(f'server {pid} is still running or was never waited for')
+
+
+def test_concurrent_messages_round_trip(tmp_path):
+    pid_path = tmp_path / 'server.pid'
+
+    received = asyncio.run(echo(pid_path, range(20)))
+
+    assert sorted(received) == list(range(20))
+
+
+def test_message_split_across_reads_parses(tmp_path):
+    pid_path = tmp_path / 'server.pid'
+
+    assert asyncio.run(echo(pid_path, [7])) == [7]
+
+
+def test_server_is_reaped_on_exit(tmp_path):
+    pid_path = tmp_path / 'server.pid'
+
+    asyncio.run(echo(pid_path, [1]))
+
+    assert_reaped(pid_path)
+
+
+def test_server_ignoring_stdin_close_is_killed(tmp_path, monkeypatch):
+    pid_path = tmp_path / 'server.pid'
+    monkeypatch.setattr(agent, 'STDIO_SHUTDOWN_TIMEOUT', 0.2)
+
+    async def open_and_close():
+        async with agent.batched_stdio_client(server(STUBBORN_SERVER, pid_path), errlog=subprocess.DEVNULL):
+            while not pid_path.exists():
+                await anyio.sleep(0.01)
+
+    asyncio.run(open_and_close())
+
+    assert_reaped(pid_path)
@@ -0,0 +1,44 @@
+"""Partial MCP tool output reaches the calling session's state in coalesced batches"""
+import asyncio
+from types import SimpleNamespace
+
+from multi_tool_agent import agent
+
+
+def streaming_toolset():
+    return agent.StreamingMCPToolset(connection_params=agent.CODE_ANALYSIS_SERVER_PARAMS, schema_cache_dir=None)
+
+
+def test_progress_is_batched_into_state():
+    context = SimpleNamespace(state={})
+    on_progress = streaming_toolset().progress_callback_for('run_test_case', callback_context=context)
+
+    async def report():
+        for line in ('collected 2 items\n', 'test_a PASSED\n', 'test_b PASSED\n'):
+            await on_progress(1, None, line)
+        await asyncio.sleep(agent.StreamingMCPToolset.COALESCE_SECONDS * 3)
+
+    asyncio.run(report())
+
+    assert context.state == {'run_test_case_progress': 'collected 2 items\ntest_a PASSED\ntest_b PASSED\n'}
+
+
+def test_state_keeps_only_the_tail_of_long_output():
+    context = SimpleNamespace(state={})
+    on_progress = streaming_toolset().progress_callback_for('run_in_terminal', callback_context=context)
+    limit = agent.StreamingMCPToolset.PROGRESS_STATE_CHARS
+
+    async def report():
+        await on_progress(1, None, 'x' * limit + 'tail')
+        await asyncio.sleep(agent.StreamingMCPToolset.COALESCE_SECONDS * 3)
+
+    asyncio.run(report())
+
+    output = context.state['run_in_terminal_progress']
+    assert len(output) == limit and output.endswith('tail')
+
+
+def test_progress_callback_is_only_passed_when_adk_accepts_it():
+    toolset = streaming_toolset()
+
+    assert (getattr(toolset, '_progress_callback', None) is not None) == agent.MCP_PROGRESS_CALLBACKS